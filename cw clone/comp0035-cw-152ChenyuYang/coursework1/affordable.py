@@ -1,29 +1,22 @@
-import pandas as pd
-from pathlib import Path
-
-
-base_dir = Path(__file__).parent 
-file_path = base_dir / 'data' / 'dclg-affordable-housing-borough.xlsx'
-
-
-if not file_path.exists():
-    raise FileNotFoundError(f"Data file not found: {file_path.resolve()}")
-
-
-data_df = pd.read_excel(file_path, sheet_name=1)
-
-
-data_df = data_df.iloc[:, 1:]  
-
-
-data_df.columns = [col.split('-')[0].strip() if '-' in str(col) else col for col in data_df.columns]
-
-
-cleaned_data_df = data_df.dropna(how='any').reset_index(drop=True)
-
-
-cleaned_file_path = base_dir / 'output' / 'cleaned_data_second_sheet_updated_years.xlsx'
-cleaned_file_path.parent.mkdir(exist_ok=True)  
-cleaned_data_df.to_excel(cleaned_file_path, index=False)
-
-print(f"Cleaned file saved to: {cleaned_file_path.resolve()}")
+import argparse
+import sys
+from pathlib import Path
+
+
+# Allow running as a script: python coursework1/affordable.py
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from coursework1.cleaning import DATASETS, get_cache_path, get_file_hash, load_cleaned_dataset
+
+
+parser = argparse.ArgumentParser(description="Clean the affordable housing workbook")
+parser.add_argument("--excel-output", action="store_true",
+                    help="also write the cleaned data to output/ as .xlsx")
+args = parser.parse_args()
+
+source_hash = get_file_hash(DATASETS['affordable'][0])
+cleaned_data_df = load_cleaned_dataset('affordable', source_hash, excel_output=args.excel_output)
+
+print(f"Cleaned data cached at: {get_cache_path('affordable', source_hash).resolve()}")
+if args.excel_output:
+    print(f"Cleaned file saved to: {(Path(__file__).parent / 'output' / DATASETS['affordable'][2]).resolve()}")
@@ -0,0 +1,169 @@
+import hashlib
+import os
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from pyarrow import feather
+
+
+base_dir = Path(__file__).parent
+affordable_source_path = base_dir / 'data' / 'dclg-affordable-housing-borough.xlsx'
+waiting_list_source_path = base_dir / 'data' / 'households-on-local-authority-waiting-list.xlsx'
+output_dir = base_dir / 'output'
+cache_dir = output_dir / 'cache'
+
+# Part of every cache key: bump it whenever the cleaning functions change, so frames
+# cleaned by the old code are not reused for an unchanged source file
+CLEANING_VERSION = 1
+
+
+def get_file_hash(path):
+    """Return the SHA-256 hex digest of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Step 1: Clean the source workbooks
+
+def to_whole_numbers(df):
+    """
+    Turn the year columns of a cleaned frame into int64. The missing values that made
+    them float are gone after dropna; the old Excel round trip did the same implicitly.
+    """
+    year_columns = df.columns[2:]
+    return df.astype({col: 'int64' for col in year_columns})
+
+
+def clean_affordable_data(file_path=affordable_source_path):
+    """
+    Clean the second sheet of the affordable housing workbook.
+    :param file_path: Path to dclg-affordable-housing-borough.xlsx
+    :return: Wide DataFrame with one row per area and one column per year
+    """
+    if not file_path.exists():
+        raise FileNotFoundError(f"Data file not found: {file_path.resolve()}")
+
+    data_df = pd.read_excel(file_path, sheet_name=1)
+    data_df = data_df.iloc[:, 1:]
+    data_df.columns = [col.split('-')[0].strip() if '-' in str(col) else col for col in data_df.columns]
+    return to_whole_numbers(data_df.dropna(how='any').reset_index(drop=True))
+
+
+def clean_waiting_list_data(file_path=waiting_list_source_path):
+    """
+    Clean the second sheet of the waiting list workbook.
+    :param file_path: Path to households-on-local-authority-waiting-list.xlsx
+    :return: Wide DataFrame with one row per area and one column per year
+    """
+    if not file_path.exists():
+        raise FileNotFoundError(f"Data file not found: {file_path.resolve()}")
+
+    data_df = pd.read_excel(file_path, sheet_name=1)
+    data_df = data_df.iloc[:, 1:]
+    data_df.iloc[0, 0] = "Current ONS Code"
+    data_df.iloc[0, 1] = "Area name"
+    data_df.columns = [int(col) if isinstance(col, float) else col for col in data_df.iloc[0]]
+    data_df = data_df[1:].reset_index(drop=True)
+    return to_whole_numbers(data_df.dropna(how='any').reset_index(drop=True))
+
+
+# Dataset name -> (source workbook, cleaning function, optional Excel export file name)
+DATASETS = {
+    'affordable': (affordable_source_path, clean_affordable_data,
+                   'cleaned_data_second_sheet_updated_years.xlsx'),
+    'waiting_list': (waiting_list_source_path, clean_waiting_list_data,
+                     'cleaned_final_result_waiting_list.xlsx'),
+}
+
+
+# Step 2: Columnar cache of the cleaned frames
+
+def get_cache_path(name, source_hash):
+    """Return the Arrow IPC cache file for a dataset cleaned by this cleaning version from a source with this hash."""
+    return cache_dir / f"{name}-v{CLEANING_VERSION}-{source_hash[:16]}.arrow"
+
+
+def write_cache(df, name, source_hash):
+    """
+    Write a cleaned frame to the cache as an uncompressed Arrow IPC file, so it can
+    be memory-mapped on read, and remove the entries for older source versions.
+    :return: Path of the cache file
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cache_path = get_cache_path(name, source_hash)
+    # Arrow needs string column names; the year headers become ints again when melted
+    frame = df.copy()
+    frame.columns = [str(col) for col in frame.columns]
+    frame.to_feather(cache_path, compression='uncompressed')
+    for stale_path in cache_dir.glob(f"{name}-*.arrow"):
+        if stale_path != cache_path:
+            stale_path.unlink()
+    return cache_path
+
+
+def read_cache(name, source_hash):
+    """Read a cached frame through a memory map, or return None on a cache miss."""
+    cache_path = get_cache_path(name, source_hash)
+    if not cache_path.exists():
+        return None
+    return feather.read_table(cache_path, memory_map=True).to_pandas()
+
+
+def export_excel(df, name):
+    """Write a cleaned frame to output/ in the layout the coursework1 scripts used to produce."""
+    output_path = output_dir / DATASETS[name][2]
+    output_path.parent.mkdir(exist_ok=True)
+    df.to_excel(output_path, index=False)
+    return output_path
+
+
+def load_cleaned_dataset(name, source_hash=None, excel_output=False):
+    """
+    Return a cleaned dataset, from the cache when the source workbook is unchanged.
+    On a cache miss the workbook is cleaned and the cache is refreshed.
+    :param name: 'affordable' or 'waiting_list'
+    :param source_hash: SHA-256 of the source workbook, if already known
+    :param excel_output: Also write the cleaned frame to output/ as .xlsx
+    :return: Cleaned wide DataFrame (year columns are strings)
+    """
+    source_path, clean, _ = DATASETS[name]
+    if source_hash is None:
+        source_hash = get_file_hash(source_path)
+
+    df = read_cache(name, source_hash)
+    if df is None:
+        write_cache(clean(source_path), name, source_hash)
+        df = read_cache(name, source_hash)
+    if excel_output:
+        export_excel(df, name)
+    return df
+
+
+def refresh_cache(name, source_hash):
+    """Clean a dataset's source workbook into the cache. Runs in a worker process."""
+    source_path, clean, _ = DATASETS[name]
+    return write_cache(clean(source_path), name, source_hash)
+
+
+def load_cleaned_datasets(source_hashes, excel_output=False, workers=None):
+    """
+    Return several cleaned datasets. The ones missing from the cache are cleaned in
+    parallel worker processes; each worker writes its frame to the Arrow cache, so
+    only the cache path travels back and the frames are then memory-mapped here.
+    :param source_hashes: Dict of dataset name -> SHA-256 of its source workbook
+    :param excel_output: Also write the cleaned frames to output/ as .xlsx
+    :param workers: Worker processes; defaults to one per missing dataset, up to the CPU count
+    :return: Dict of dataset name -> cleaned wide DataFrame
+    """
+    missing = [name for name, source_hash in source_hashes.items()
+               if not get_cache_path(name, source_hash).exists()]
+    if workers is None:
+        workers = min(len(missing), os.cpu_count() or 1)
+    if len(missing) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(refresh_cache, missing, [source_hashes[name] for name in missing]))
+    return {name: load_cleaned_dataset(name, source_hash, excel_output)
+            for name, source_hash in source_hashes.items()}
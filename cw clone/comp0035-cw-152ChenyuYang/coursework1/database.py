@@ -1,130 +1,719 @@
-import sqlite3
-import pandas as pd
-from pathlib import Path
-
-
-base_dir = Path(__file__).parent 
-file1_path = base_dir / 'output' / 'cleaned_data_second_sheet_updated_years.xlsx'
-file2_path = base_dir / 'output' / 'cleaned_final_result_waiting_list.xlsx'
-db_path = base_dir / 'database' / 'local_authority_housing.db'
-
-
-db_path.parent.mkdir(exist_ok=True)
-
-def create_database():
-    # Connect to SQLite database (creates a new one if it doesn't exist)
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Step 1: Create the database tables based on the ERD
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Area (
-        area_code TEXT PRIMARY KEY,
-        area_name TEXT NOT NULL
-    )
-    ''')
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Year (
-        year INTEGER PRIMARY KEY
-    )
-    ''')
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Affordable_Housing_Data (
-        area_code TEXT,
-        year INTEGER,
-        housing_units INTEGER NOT NULL,
-        PRIMARY KEY (area_code, year),
-        FOREIGN KEY (area_code) REFERENCES Area(area_code),
-        FOREIGN KEY (year) REFERENCES Year(year)
-    )
-    ''')
-
-    cursor.execute('''
-    CREATE TABLE IF NOT EXISTS Waiting_List_Data (
-        area_code TEXT,
-        year INTEGER,
-        households_count INTEGER NOT NULL,
-        PRIMARY KEY (area_code, year),
-        FOREIGN KEY (area_code) REFERENCES Area(area_code),
-        FOREIGN KEY (year) REFERENCES Year(year)
-    )
-    ''')
-
-    conn.commit()
-
-    # Step 2: Load data from Excel files
-    try:
-        df1 = pd.read_excel(file1_path)
-        df2 = pd.read_excel(file2_path)
-        print(f"Data files loaded successfully:\n  - {file1_path}\n  - {file2_path}")
-    except FileNotFoundError as e:
-        print(f"Error: {e}")
-        return
-    except Exception as e:
-        print(f"Unexpected error while reading files: {e}")
-        return
-
-    # Step 3: Prepare and normalize the data
-    # Normalize Area data
-    area_data = pd.concat([
-        df1[['Current\nONS code', 'Area name']].rename(columns={
-            'Current\nONS code': 'area_code',
-            'Area name': 'area_name'
-        }),
-        df2[['Current ONS Code', 'Area name']].rename(columns={
-            'Current ONS Code': 'area_code',
-            'Area name': 'area_name'
-        })
-    ]).drop_duplicates()
-
-    # Normalize Year data
-    years = pd.concat([
-        pd.melt(df1, id_vars=['Current\nONS code', 'Area name'], var_name='year', value_name='housing_units')['year'],
-        pd.melt(df2, id_vars=['Current ONS Code', 'Area name'], var_name='year', value_name='households_count')['year']
-    ]).drop_duplicates().astype(int)
-
-    # Prepare Affordable Housing Data
-    affordable_housing_data = pd.melt(
-        df1, id_vars=['Current\nONS code', 'Area name'], var_name='year', value_name='housing_units'
-    ).rename(columns={
-        'Current\nONS code': 'area_code',
-        'Area name': 'area_name'
-    }).dropna(subset=['housing_units'])
-
-    # Prepare Waiting List Data
-    waiting_list_data = pd.melt(
-        df2, id_vars=['Current ONS Code', 'Area name'], var_name='year', value_name='households_count'
-    ).rename(columns={
-        'Current ONS Code': 'area_code',
-        'Area name': 'area_name'
-    }).dropna(subset=['households_count'])
-
-    # Step 4: Insert data into the database
-    try:
-        # Insert Area data
-        area_data.to_sql('Area', conn, if_exists='replace', index=False)
-
-        # Insert Year data
-        pd.DataFrame(years, columns=['year']).to_sql('Year', conn, if_exists='replace', index=False)
-
-        # Insert Affordable Housing Data
-        affordable_housing_data[['area_code', 'year', 'housing_units']].to_sql(
-            'Affordable_Housing_Data', conn, if_exists='replace', index=False
-        )
-
-        # Insert Waiting List Data
-        waiting_list_data[['area_code', 'year', 'households_count']].to_sql(
-            'Waiting_List_Data', conn, if_exists='replace', index=False
-        )
-
-        print(f"Database created successfully and data inserted into: {db_path}")
-    except Exception as e:
-        print(f"Error while inserting data into the database: {e}")
-    finally:
-        # Close the connection
-        conn.close()
-
-if __name__ == "__main__":
-    create_database()
+import sqlite3
+import sys
+import pandas as pd
+from pathlib import Path
+
+
+# Allow running as a script: python coursework1/database.py
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from coursework1.cleaning import DATASETS, get_file_hash, load_cleaned_datasets
+
+
+base_dir = Path(__file__).parent 
+file1_path = DATASETS['affordable'][0]
+file2_path = DATASETS['waiting_list'][0]
+db_path = base_dir / 'database' / 'local_authority_housing.db'
+
+
+db_path.parent.mkdir(exist_ok=True)
+
+# Declared schema. The fact tables are clustered on their composite primary key
+# (WITHOUT ROWID), so the table itself is the covering (area_code, year) index.
+# Stored in PRAGMA user_version; a database built with an older schema is rebuilt
+# in full rather than updated incrementally. 2: fact rows cascade on delete.
+# 3: Area_Year_Facts. 4: Fact_Rollup. 5: waiting list count indexes.
+# 6: case-insensitive area name index.
+SCHEMA_VERSION = 6
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS Area (
+    area_code TEXT PRIMARY KEY,
+    area_name TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS Year (
+    year INTEGER PRIMARY KEY
+);
+
+CREATE TABLE IF NOT EXISTS Affordable_Housing_Data (
+    area_code TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    housing_units INTEGER NOT NULL,
+    PRIMARY KEY (area_code, year),
+    FOREIGN KEY (area_code) REFERENCES Area(area_code) ON DELETE CASCADE,
+    FOREIGN KEY (year) REFERENCES Year(year) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS Waiting_List_Data (
+    area_code TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    households_count INTEGER NOT NULL,
+    PRIMARY KEY (area_code, year),
+    FOREIGN KEY (area_code) REFERENCES Area(area_code) ON DELETE CASCADE,
+    FOREIGN KEY (year) REFERENCES Year(year) ON DELETE CASCADE
+) WITHOUT ROWID;
+"""
+
+# Secondary (year, area_code) indexes, covering the value column so year
+# filters never touch the table itself.
+INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_affordable_year_area
+    ON Affordable_Housing_Data (year, area_code, housing_units);
+
+CREATE INDEX IF NOT EXISTS idx_waiting_year_area
+    ON Waiting_List_Data (year, area_code, households_count);
+
+-- Ordered by count (overall and within a year) for the top-k / bottom-k queries;
+-- the primary key columns ride along, so both indexes are covering
+CREATE INDEX IF NOT EXISTS idx_waiting_count
+    ON Waiting_List_Data (households_count);
+
+CREATE INDEX IF NOT EXISTS idx_waiting_year_count
+    ON Waiting_List_Data (year, households_count);
+
+-- Case-insensitive area name lookups (area_name = ? COLLATE NOCASE)
+CREATE INDEX IF NOT EXISTS idx_area_name_nocase
+    ON Area (area_name COLLATE NOCASE);
+"""
+
+# Materialized area x year view of supply and demand: one row per (area_code, year)
+# present in either fact table, with households on the waiting list per affordable
+# home delivered. Triggers on the source tables keep it current on every write.
+FACTS_SQL = """
+CREATE TABLE IF NOT EXISTS Area_Year_Facts (
+    area_code TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    area_name TEXT NOT NULL,
+    housing_units INTEGER,
+    households_count INTEGER,
+    ratio REAL,
+    PRIMARY KEY (area_code, year)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_facts_year_ratio ON Area_Year_Facts (year, ratio);
+"""
+
+# Recompute the Area_Year_Facts row of one (area_code, year) key
+AREA_YEAR_REFRESH_SQL = """
+    DELETE FROM Area_Year_Facts WHERE area_code = {area_code} AND year = {year};
+    INSERT INTO Area_Year_Facts (area_code, year, area_name, housing_units, households_count, ratio)
+    SELECT Area.area_code, {year}, Area.area_name, h.housing_units, w.households_count,
+           CAST(w.households_count AS REAL) / NULLIF(h.housing_units, 0)
+    FROM Area
+    LEFT JOIN Affordable_Housing_Data AS h ON h.area_code = Area.area_code AND h.year = {year}
+    LEFT JOIN Waiting_List_Data AS w ON w.area_code = Area.area_code AND w.year = {year}
+    WHERE Area.area_code = {area_code} AND (h.area_code IS NOT NULL OR w.area_code IS NOT NULL);
+"""
+
+# Rebuild the whole of Area_Year_Facts in one pass
+AREA_YEAR_REBUILD_SQL = """
+DELETE FROM Area_Year_Facts;
+INSERT INTO Area_Year_Facts (area_code, year, area_name, housing_units, households_count, ratio)
+SELECT Area.area_code, keys.year, Area.area_name, h.housing_units, w.households_count,
+       CAST(w.households_count AS REAL) / NULLIF(h.housing_units, 0)
+FROM (SELECT area_code, year FROM Affordable_Housing_Data
+      UNION SELECT area_code, year FROM Waiting_List_Data) AS keys
+JOIN Area ON Area.area_code = keys.area_code
+LEFT JOIN Affordable_Housing_Data AS h ON h.area_code = keys.area_code AND h.year = keys.year
+LEFT JOIN Waiting_List_Data AS w ON w.area_code = keys.area_code AND w.year = keys.year;
+"""
+
+
+def build_facts_triggers():
+    """Return the triggers that keep Area_Year_Facts in step with its source tables."""
+    new_key = AREA_YEAR_REFRESH_SQL.format(area_code="NEW.area_code", year="NEW.year")
+    old_key = AREA_YEAR_REFRESH_SQL.format(area_code="OLD.area_code", year="OLD.year")
+    triggers = []
+    for table, short_name in (("Affordable_Housing_Data", "affordable"), ("Waiting_List_Data", "waiting")):
+        triggers += [
+            f"CREATE TRIGGER IF NOT EXISTS trg_{short_name}_facts_insert "
+            f"AFTER INSERT ON {table} BEGIN{new_key}END;",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{short_name}_facts_update "
+            f"AFTER UPDATE ON {table} BEGIN{old_key}{new_key}END;",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{short_name}_facts_delete "
+            f"AFTER DELETE ON {table} BEGIN{old_key}END;",
+        ]
+    triggers += [
+        "CREATE TRIGGER IF NOT EXISTS trg_area_facts_rename AFTER UPDATE OF area_name ON Area BEGIN\n"
+        "    UPDATE Area_Year_Facts SET area_name = NEW.area_name WHERE area_code = NEW.area_code;\n"
+        "END;",
+        "CREATE TRIGGER IF NOT EXISTS trg_area_facts_delete AFTER DELETE ON Area BEGIN\n"
+        "    DELETE FROM Area_Year_Facts WHERE area_code = OLD.area_code;\n"
+        "END;",
+    ]
+    return "\n\n".join(triggers) + "\n"
+
+
+FACTS_TRIGGER_SQL = build_facts_triggers()
+
+
+# Aggregate rollups of the fact tables: SUM/COUNT/MIN/MAX of the value column per
+# year, per area and overall (scope 'all', scope_key ''), so the aggregate queries
+# read one row instead of scanning. Triggers keep the rows current on every write.
+ROLLUP_SQL = """
+CREATE TABLE IF NOT EXISTS Fact_Rollup (
+    table_name TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    scope_key TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    row_count INTEGER NOT NULL,
+    min_value INTEGER,
+    max_value INTEGER,
+    PRIMARY KEY (table_name, scope, scope_key)
+) WITHOUT ROWID;
+"""
+
+# Rollup scope -> fact column it groups by (None: one overall row)
+ROLLUP_SCOPES = {"year": "year", "area": "area_code", "all": None}
+
+
+def get_rollup_key(scope, row):
+    """Return the scope_key expression of a fact row; years are stored as text, like area codes."""
+    column = ROLLUP_SCOPES[scope]
+    return f"CAST({row}{column} AS TEXT)" if column else "''"
+
+
+def build_rollup_sql():
+    """Return the script rebuilding Fact_Rollup and the triggers that maintain it."""
+    statements = ["DELETE FROM Fact_Rollup;"]
+    triggers = []
+    for table, value_column in FACT_TABLES.items():
+        added, removed = [], []
+        for scope, column in ROLLUP_SCOPES.items():
+            key = get_rollup_key(scope, "")
+            statements.append(f"""
+INSERT INTO Fact_Rollup (table_name, scope, scope_key, total, row_count, min_value, max_value)
+SELECT '{table}', '{scope}', {key}, SUM({value_column}), COUNT(*), MIN({value_column}), MAX({value_column})
+FROM {table} GROUP BY {key};""")
+
+            group = (f"table_name = '{table}' AND scope = '{scope}' "
+                     f"AND scope_key = {get_rollup_key(scope, 'OLD.')}")
+            where = f" WHERE {column} = OLD.{column}" if column else ""
+            added.append(f"""
+    INSERT INTO Fact_Rollup (table_name, scope, scope_key, total, row_count, min_value, max_value)
+    VALUES ('{table}', '{scope}', {get_rollup_key(scope, 'NEW.')}, NEW.{value_column}, 1,
+            NEW.{value_column}, NEW.{value_column})
+    ON CONFLICT (table_name, scope, scope_key) DO UPDATE SET
+        total = total + excluded.total, row_count = row_count + 1,
+        min_value = MIN(min_value, excluded.min_value), max_value = MAX(max_value, excluded.max_value);""")
+            # MIN/MAX only need recomputing when the removed value was the extreme
+            removed.append(f"""
+    UPDATE Fact_Rollup SET total = total - OLD.{value_column}, row_count = row_count - 1
+    WHERE {group};
+    DELETE FROM Fact_Rollup WHERE {group} AND row_count = 0;
+    UPDATE Fact_Rollup SET
+        min_value = (SELECT MIN({value_column}) FROM {table}{where}),
+        max_value = (SELECT MAX({value_column}) FROM {table}{where})
+    WHERE {group} AND (OLD.{value_column} <= min_value OR OLD.{value_column} >= max_value);""")
+
+        short_name = table.split("_")[0].lower()
+        triggers += [
+            f"CREATE TRIGGER IF NOT EXISTS trg_{short_name}_rollup_insert "
+            f"AFTER INSERT ON {table} BEGIN{''.join(added)}\nEND;",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{short_name}_rollup_update "
+            f"AFTER UPDATE OF area_code, year, {value_column} ON {table} BEGIN"
+            f"{''.join(removed)}{''.join(added)}\nEND;",
+            f"CREATE TRIGGER IF NOT EXISTS trg_{short_name}_rollup_delete "
+            f"AFTER DELETE ON {table} BEGIN{''.join(removed)}\nEND;",
+        ]
+    return "\n".join(statements) + "\n\n" + "\n\n".join(triggers) + "\n"
+
+
+# Ingest bookkeeping: the hash of every source file and a digest of every fact
+# row written, so a rerun only touches the rows that actually changed.
+MANIFEST_SQL = """
+CREATE TABLE IF NOT EXISTS Ingest_Manifest (
+    source_file TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    ingested_at TEXT NOT NULL DEFAULT (datetime('now'))
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS Ingest_Row_Digest (
+    table_name TEXT NOT NULL,
+    area_code TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    digest INTEGER NOT NULL,
+    PRIMARY KEY (table_name, area_code, year)
+) WITHOUT ROWID;
+"""
+
+# Tables in dependency order (children first) so they can be dropped safely
+TABLES = ["Affordable_Housing_Data", "Waiting_List_Data", "Area", "Year"]
+MANIFEST_TABLES = ["Ingest_Manifest", "Ingest_Row_Digest"]
+# Tables derived from the ones above
+DERIVED_TABLES = ["Area_Year_Facts", "Fact_Rollup"]
+
+# Value column of each fact table
+FACT_TABLES = {
+    "Affordable_Housing_Data": "housing_units",
+    "Waiting_List_Data": "households_count",
+}
+
+ROLLUP_REBUILD_SQL = build_rollup_sql()
+
+# Representative lookups from coursework2/section3, used for the query-plan report
+HOT_QUERIES = {
+    "waiting_list_by_year":
+        "SELECT area_code, households_count FROM Waiting_List_Data WHERE year = ?;",
+    "housing_data_by_area":
+        "SELECT year, housing_units FROM Affordable_Housing_Data WHERE area_code = ? ORDER BY year ASC;",
+    "area_details_by_year": """
+        SELECT area_name, housing_units, households_count FROM Area_Year_Facts
+        WHERE area_code = ? AND year = ? AND housing_units IS NOT NULL AND households_count IS NOT NULL;
+    """,
+    "area_comparison_by_year":
+        "SELECT area_code, area_name, housing_units, households_count, ratio FROM Area_Year_Facts "
+        "WHERE year = ? ORDER BY ratio DESC;",
+    "filtered_area_and_year": """
+        SELECT Area.area_name, keys.year FROM Area
+        JOIN Area_Year_Facts AS keys ON keys.area_code = Area.area_code
+        WHERE Area.area_name = ? COLLATE NOCASE AND keys.year = ?;
+    """,
+    "total_housing_units_by_year":
+        "SELECT SUM(housing_units) FROM Affordable_Housing_Data WHERE year = ?;",
+    "update_waiting_list":
+        "UPDATE Waiting_List_Data SET households_count = ? WHERE year = ? AND area_code = ?;",
+    "update_housing_data":
+        "UPDATE Affordable_Housing_Data SET housing_units = ? WHERE area_code = ? AND year = ?;",
+    "delete_housing_data_by_area":
+        "DELETE FROM Affordable_Housing_Data WHERE area_code = ?;",
+    "delete_waiting_list_by_year":
+        "DELETE FROM Waiting_List_Data WHERE year = ?;",
+}
+
+
+def create_schema(conn):
+    """
+    Drop the existing tables and recreate them with the declared keys and indexes.
+    The statements run one at a time (executescript would commit first), so they
+    can be part of the caller's transaction. The caller commits.
+    :param conn: SQLite connection
+    """
+    cursor = conn.cursor()
+    for table in TABLES + MANIFEST_TABLES + DERIVED_TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table};")
+    for statement in iter_statements(SCHEMA_SQL + INDEX_SQL + FACTS_SQL + ROLLUP_SQL + MANIFEST_SQL):
+        cursor.execute(statement)
+    cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+
+
+def iter_statements(script):
+    """Split an SQL script into complete statements (trigger bodies stay whole)."""
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ""
+    if statement.strip():
+        yield statement.strip()
+
+
+def build_area_year_facts(conn):
+    """
+    Fill Area_Year_Facts from the loaded tables in one pass, then install the
+    triggers that maintain it. Bulk loads run this once after inserting, rather
+    than letting the triggers fire for every row. The caller commits.
+    :param conn: SQLite connection
+    """
+    for statement in iter_statements(AREA_YEAR_REBUILD_SQL + FACTS_TRIGGER_SQL):
+        conn.execute(statement)
+
+
+def build_fact_rollups(conn):
+    """
+    Fill Fact_Rollup from the fact tables in one pass, then install the triggers
+    that maintain it. The caller commits.
+    :param conn: SQLite connection
+    """
+    for statement in iter_statements(ROLLUP_REBUILD_SQL):
+        conn.execute(statement)
+
+
+def build_derived_tables(conn):
+    """Fill every table in DERIVED_TABLES after a bulk load and install their triggers."""
+    build_area_year_facts(conn)
+    build_fact_rollups(conn)
+
+
+def get_schema_version(conn):
+    """Return the schema version recorded in the database (0 if never set)."""
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def get_declared_types():
+    """
+    Read the declared column types of every table in SCHEMA_SQL.
+    :return: Dict of table name -> {column name: declared type}
+    """
+    scratch = sqlite3.connect(":memory:")
+    try:
+        scratch.executescript(SCHEMA_SQL)
+        return {
+            table: {row[1]: row[2].upper() for row in scratch.execute(f"PRAGMA table_info({table});")}
+            for table in TABLES
+        }
+    finally:
+        scratch.close()
+
+
+def coerce_to_declared_types(df, declared):
+    """
+    Coerce the columns of a frame to their declared SQLite types.
+    Values that cannot be converted are left as they are, so that
+    validate_column_types() rejects the column.
+    :param df: DataFrame to coerce
+    :param declared: Dict of column name -> declared type
+    :return: Coerced copy of the frame
+    """
+    typed = df.copy()
+    for column, declared_type in declared.items():
+        if column not in typed.columns:
+            continue
+        values = typed[column]
+        if declared_type == 'INTEGER':
+            numbers = pd.to_numeric(values, errors='coerce')
+            convertible = numbers.notna() == values.notna()
+            if convertible.all() and (numbers.dropna() % 1 == 0).all():
+                typed[column] = numbers.astype('int64') if numbers.notna().all() else numbers.astype('Int64')
+        elif declared_type == 'TEXT':
+            typed[column] = values.where(values.isna(), values.astype(str).str.strip())
+    return typed
+
+
+def get_value_affinity(value):
+    """Return the SQLite storage class a Python value is written as."""
+    if value is None or (isinstance(value, float) and value != value):
+        return 'NULL'
+    if isinstance(value, (bool, int)) or pd.api.types.is_integer(value):
+        return 'INTEGER'
+    if isinstance(value, float) or pd.api.types.is_float(value):
+        return 'REAL'
+    if isinstance(value, bytes):
+        return 'BLOB'
+    return 'TEXT'
+
+
+def validate_column_types(df, declared, table):
+    """
+    Refuse a frame whose columns would be stored with mixed or undeclared types.
+    :param df: DataFrame about to be written
+    :param declared: Dict of column name -> declared type
+    :param table: Table name, used in the error message
+    :raises ValueError: If any column does not match its declared type
+    """
+    for column, declared_type in declared.items():
+        if column not in df.columns:
+            continue
+        values = df[column]
+        if declared_type == 'INTEGER' and pd.api.types.is_integer_dtype(values):
+            continue
+        affinities = set(values.map(get_value_affinity)) - {'NULL'}
+        if affinities and affinities != {declared_type}:
+            raise ValueError(
+                f"{table}.{column} is declared {declared_type} but would be stored as "
+                f"{', '.join(sorted(affinities))}"
+            )
+
+
+def get_row_digests(frame):
+    """
+    Hash every row of a frame into a signed 64-bit integer (SQLite's INTEGER range).
+    :param frame: DataFrame of the columns that make up a row
+    :return: List of ints, one per row
+    """
+    hashes = pd.util.hash_pandas_object(frame, index=False)
+    return hashes.to_numpy().view('int64').tolist()
+
+
+def to_records(frame):
+    """Convert a frame to a list of tuples of plain Python values for executemany."""
+    return list(zip(*(frame[column].tolist() for column in frame.columns)))
+
+
+def insert_frames(conn, frames):
+    """
+    Insert every frame into the table of the same name. Unlike to_sql, which
+    commits, this leaves the rows in the caller's transaction.
+    :param conn: SQLite connection (the caller commits)
+    :param frames: Dict of table name -> frame with that table's columns
+    """
+    for table, frame in frames.items():
+        columns = ", ".join(frame.columns)
+        placeholders = ", ".join("?" for _ in frame.columns)
+        conn.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders});", to_records(frame))
+
+
+def get_manifest(conn):
+    """
+    Read the source file hashes recorded by the last ingest.
+    :param conn: SQLite connection
+    :return: Dict of source file -> sha256, or None if there is no manifest yet
+    """
+    try:
+        stored = dict(conn.execute("SELECT source_file, sha256 FROM Ingest_Manifest;").fetchall())
+    except sqlite3.OperationalError:
+        return None
+    return stored or None
+
+
+def record_manifest(conn, source_hashes):
+    """Replace the recorded source file hashes."""
+    conn.execute("DELETE FROM Ingest_Manifest;")
+    conn.executemany("INSERT INTO Ingest_Manifest (source_file, sha256) VALUES (?, ?);",
+                     source_hashes.items())
+
+
+def record_row_digests(conn, frames):
+    """Record the digest of every fact row after a full build."""
+    conn.execute("DELETE FROM Ingest_Row_Digest;")
+    for table, value_column in FACT_TABLES.items():
+        frame = frames[table]
+        digests = get_row_digests(frame[['area_code', 'year', value_column]])
+        conn.executemany(
+            "INSERT INTO Ingest_Row_Digest (table_name, area_code, year, digest) VALUES (?, ?, ?, ?);",
+            [(table, area_code, year, digest) for (area_code, year), digest
+             in zip(to_records(frame[['area_code', 'year']]), digests)]
+        )
+
+
+def apply_incremental_changes(conn, frames):
+    """
+    Write only the fact rows whose digest differs from the last ingest.
+    New and changed rows are upserted, rows that disappeared from the source are
+    deleted. Areas are upserted and new years added; neither is ever removed.
+    :param conn: SQLite connection (the caller commits)
+    :param frames: Typed frames keyed by table name
+    :return: Dict of fact table -> (rows upserted, rows deleted)
+    """
+    cursor = conn.cursor()
+    cursor.executemany("""
+        INSERT INTO Area (area_code, area_name) VALUES (?, ?)
+        ON CONFLICT (area_code) DO UPDATE SET area_name = excluded.area_name
+        WHERE area_name <> excluded.area_name;
+    """, to_records(frames['Area']))
+    cursor.executemany("INSERT OR IGNORE INTO Year (year) VALUES (?);", to_records(frames['Year']))
+
+    changes = {}
+    for table, value_column in FACT_TABLES.items():
+        frame = frames[table][['area_code', 'year', value_column]].copy()
+        frame['digest'] = get_row_digests(frame)
+        stored = pd.read_sql_query(
+            "SELECT area_code, year, digest AS stored_digest FROM Ingest_Row_Digest WHERE table_name = ?;",
+            conn, params=(table,)
+        )
+        merged = frame.merge(stored, on=['area_code', 'year'], how='outer', indicator=True)
+        changed = merged[(merged['_merge'] == 'left_only')
+                         | ((merged['_merge'] == 'both') & (merged['digest'] != merged['stored_digest']))]
+        removed = merged[merged['_merge'] == 'right_only']
+
+        changed = changed.astype({value_column: 'int64', 'digest': 'int64'})
+        cursor.executemany(f"""
+            INSERT INTO {table} (area_code, year, {value_column}) VALUES (?, ?, ?)
+            ON CONFLICT (area_code, year) DO UPDATE SET {value_column} = excluded.{value_column};
+        """, to_records(changed[['area_code', 'year', value_column]]))
+        cursor.executemany(f"DELETE FROM {table} WHERE area_code = ? AND year = ?;",
+                           to_records(removed[['area_code', 'year']]))
+
+        cursor.executemany("""
+            INSERT INTO Ingest_Row_Digest (table_name, area_code, year, digest) VALUES (?, ?, ?, ?)
+            ON CONFLICT (table_name, area_code, year) DO UPDATE SET digest = excluded.digest;
+        """, [(table, *row) for row in to_records(changed[['area_code', 'year', 'digest']])])
+        cursor.executemany("DELETE FROM Ingest_Row_Digest WHERE table_name = ? AND area_code = ? AND year = ?;",
+                           [(table, *row) for row in to_records(removed[['area_code', 'year']])])
+        changes[table] = (len(changed), len(removed))
+    return changes
+
+
+def get_query_plans(conn):
+    """
+    Capture EXPLAIN QUERY PLAN output for every query in HOT_QUERIES.
+    :param conn: SQLite connection
+    :return: Dict of query name -> list of plan lines (or the error message)
+    """
+    plans = {}
+    for name, sql in HOT_QUERIES.items():
+        params = (None,) * sql.count("?")
+        try:
+            rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+            plans[name] = [row[-1] for row in rows]
+        except sqlite3.Error as e:
+            plans[name] = [f"error: {e}"]
+    return plans
+
+
+def format_plan_report(before, after):
+    """
+    Format the query plans captured before and after a rebuild side by side.
+    :param before: Plans returned by get_query_plans before the rebuild
+    :param after: Plans returned by get_query_plans after the rebuild
+    :return: Report text
+    """
+    lines = []
+    for name in HOT_QUERIES:
+        lines.append(f"{name}:")
+        for line in before.get(name, ["(no tables)"]):
+            lines.append(f"  before: {line}")
+        for line in after.get(name, ["(no tables)"]):
+            lines.append(f"  after:  {line}")
+    return "\n".join(lines)
+
+
+def create_database(indexed=True, plan_report=False, full_rebuild=False):
+    """
+    Build the database from the cleaned datasets (read from the Arrow cache).
+    An indexed build records the source file hashes and a digest of every fact row.
+    Later runs are incremental: nothing is read when the files are unchanged, and
+    otherwise only the changed rows are written.
+    :param indexed: Load into the declared schema (keys, indexes, WITHOUT ROWID).
+                    When False, use the legacy to_sql(if_exists='replace') load,
+                    which leaves plain tables without keys or indexes.
+    :param plan_report: Print the hot query plans before and after the rebuild
+    :param full_rebuild: Recreate every table even if a manifest exists
+    """
+    # Connect to SQLite database (creates a new one if it doesn't exist)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    before = get_query_plans(conn) if plan_report else None
+
+    # Step 1: Decide between an incremental update and a full build
+    try:
+        source_hashes = {path.name: get_file_hash(path) for path in (file1_path, file2_path)}
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        conn.close()
+        return
+    up_to_date = get_schema_version(conn) == SCHEMA_VERSION
+    manifest = get_manifest(conn) if indexed and up_to_date and not full_rebuild else None
+    incremental = manifest is not None
+    if incremental and manifest == source_hashes:
+        print(f"Source files unchanged since the last ingest, nothing to do: {db_path}")
+        if plan_report:
+            print("\nQuery plans (unchanged, nothing was rebuilt):")
+            print(format_plan_report(before, before))
+        conn.close()
+        return
+
+    # Step 2: Load the cleaned data, from the columnar cache when the sources are unchanged
+    try:
+        # On a cache miss both workbooks are cleaned at the same time, in worker processes
+        datasets = load_cleaned_datasets({'affordable': source_hashes[file1_path.name],
+                                          'waiting_list': source_hashes[file2_path.name]})
+        df1, df2 = datasets['affordable'], datasets['waiting_list']
+        print(f"Data files loaded successfully:\n  - {file1_path}\n  - {file2_path}")
+    except FileNotFoundError as e:
+        print(f"Error: {e}")
+        conn.close()
+        return
+    except Exception as e:
+        print(f"Unexpected error while reading files: {e}")
+        conn.close()
+        return
+
+    # Step 3: Prepare and normalize the data
+    # Normalize Area data
+    area_data = pd.concat([
+        df1[['Current\nONS code', 'Area name']].rename(columns={
+            'Current\nONS code': 'area_code',
+            'Area name': 'area_name'
+        }),
+        df2[['Current ONS Code', 'Area name']].rename(columns={
+            'Current ONS Code': 'area_code',
+            'Area name': 'area_name'
+        })
+    ]).drop_duplicates(subset=['area_code'])
+
+    # Normalize Year data
+    years = pd.concat([
+        pd.melt(df1, id_vars=['Current\nONS code', 'Area name'], var_name='year', value_name='housing_units')['year'],
+        pd.melt(df2, id_vars=['Current ONS Code', 'Area name'], var_name='year', value_name='households_count')['year']
+    ]).astype(int).drop_duplicates()
+
+    # Prepare Affordable Housing Data
+    affordable_housing_data = pd.melt(
+        df1, id_vars=['Current\nONS code', 'Area name'], var_name='year', value_name='housing_units'
+    ).rename(columns={
+        'Current\nONS code': 'area_code',
+        'Area name': 'area_name'
+    }).dropna(subset=['housing_units'])
+
+    # Prepare Waiting List Data
+    waiting_list_data = pd.melt(
+        df2, id_vars=['Current ONS Code', 'Area name'], var_name='year', value_name='households_count'
+    ).rename(columns={
+        'Current ONS Code': 'area_code',
+        'Area name': 'area_name'
+    }).dropna(subset=['households_count'])
+
+    # Step 4: Coerce every column to its declared type and refuse mixed columns
+    frames = {
+        'Area': area_data[['area_code', 'area_name']],
+        'Year': pd.DataFrame({'year': years}),
+        'Affordable_Housing_Data': affordable_housing_data[['area_code', 'year', 'housing_units']],
+        'Waiting_List_Data': waiting_list_data[['area_code', 'year', 'households_count']],
+    }
+    declared_types = get_declared_types()
+    try:
+        for table, frame in frames.items():
+            frames[table] = coerce_to_declared_types(frame, declared_types[table])
+            validate_column_types(frames[table], declared_types[table], table)
+    except ValueError as e:
+        print(f"Refusing to write the database: {e}")
+        conn.close()
+        return
+
+    # Step 5: Insert data into the database
+    # The tables are only recreated once the new data has been read and validated
+    try:
+        if incremental:
+            changes = apply_incremental_changes(conn, frames)
+            record_manifest(conn, source_hashes)
+            conn.commit()
+            print(f"Database updated incrementally: {db_path}")
+            for table, (upserted, deleted) in changes.items():
+                print(f"  - {table}: {upserted} rows upserted, {deleted} rows deleted")
+        else:
+            # Create the database tables based on the ERD
+            if indexed:
+                # One transaction from DROP to manifest: a failure part way through
+                # rolls back to the previous database
+                conn.execute("BEGIN;")
+                create_schema(conn)
+                insert_frames(conn, frames)
+                build_derived_tables(conn)
+                record_row_digests(conn, frames)
+                record_manifest(conn, source_hashes)
+            else:
+                for table in MANIFEST_TABLES + DERIVED_TABLES:
+                    cursor.execute(f"DROP TABLE IF EXISTS {table};")
+                cursor.executescript(SCHEMA_SQL.replace(" WITHOUT ROWID", ""))
+                for table, frame in frames.items():
+                    frame.to_sql(table, conn, if_exists='replace', index=False)
+            conn.commit()
+            print(f"Database created successfully and data inserted into: {db_path}")
+
+        if plan_report:
+            print("\nQuery plans before and after the rebuild:")
+            print(format_plan_report(before, get_query_plans(conn)))
+    except Exception as e:
+        conn.rollback()
+        print(f"Error while inserting data into the database: {e}")
+    finally:
+        # Close the connection
+        conn.close()
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build local_authority_housing.db")
+    parser.add_argument("--legacy", action="store_true",
+                        help="use the old replace-based load without keys or indexes")
+    parser.add_argument("--plan-report", action="store_true",
+                        help="print the hot query plans before and after the rebuild")
+    parser.add_argument("--full", action="store_true",
+                        help="rebuild every table even when the source files are unchanged")
+    args = parser.parse_args()
+
+    create_database(indexed=not args.legacy, plan_report=args.plan_report, full_rebuild=args.full)
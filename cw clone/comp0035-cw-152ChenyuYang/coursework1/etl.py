@@ -0,0 +1,374 @@
+import csv
+import os
+import queue
+import sqlite3
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from multiprocessing import Manager
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from coursework1.database import (SCHEMA_SQL, SCHEMA_VERSION, INDEX_SQL, FACTS_SQL, ROLLUP_SQL, MANIFEST_SQL, TABLES,
+                                  MANIFEST_TABLES, DERIVED_TABLES, build_derived_tables, iter_statements,
+                                  db_path)
+
+
+base_dir = Path(__file__).parent
+affordable_csv_path = base_dir / 'data' / 'dclg-affordable-housing-borough.csv'
+affordable_xlsx_path = base_dir / 'data' / 'dclg-affordable-housing-borough.xlsx'
+waiting_list_xlsx_path = base_dir / 'data' / 'households-on-local-authority-waiting-list.xlsx'
+output_dir = base_dir / 'output'
+
+# Number of rows buffered before each executemany call
+CHUNK_SIZE = 5000
+
+# Batches a parse worker may have waiting for the writer before it blocks, so memory
+# stays bounded by the workers times this many batches whatever the file sizes
+QUEUE_BATCHES = 4
+
+# Layout of the wide DCLG workbooks: data sheet index and the row holding the year headers
+AFFORDABLE_LAYOUT = {'sheet_index': 1, 'header_row': 0}
+WAITING_LIST_LAYOUT = {'sheet_index': 1, 'header_row': 1}
+
+# Fact table -> (value column, code header and file of the Excel export)
+FACT_DATASETS = {
+    'Affordable_Housing_Data': ('housing_units', 'Current\nONS code',
+                                output_dir / 'cleaned_data_second_sheet_updated_years.xlsx'),
+    'Waiting_List_Data': ('households_count', 'Current ONS Code',
+                          output_dir / 'cleaned_final_result_waiting_list.xlsx'),
+}
+
+# One chunk of cleaned rows in columnar form, as sent back by the parse workers:
+# the distinct (area_code, area_name) pairs, then per row an index into them, the
+# year and the value, packed into typed arrays rather than a list of tuples
+RowBatch = namedtuple('RowBatch', ['areas', 'area_index', 'years', 'values'])
+
+
+# Step 1: Stream cleaned rows from the source files
+
+def parse_year(value):
+    """Turn a year header such as '1991-92', 1997 or 1997.0 into an int."""
+    return int(str(value).split('-')[0].strip().split('.')[0])
+
+
+def parse_count(value):
+    """Turn a cell such as 53, 53.0 or '1,260' into an int."""
+    if isinstance(value, str):
+        value = value.replace(',', '').strip()
+    number = float(value)
+    if number % 1 != 0:
+        raise ValueError(f"expected a whole number, got {value!r}")
+    return int(number)
+
+
+def iter_affordable_csv(csv_path=affordable_csv_path):
+    """
+    Stream (area_code, area_name, year, housing_units) rows from the long-format CSV.
+    :param csv_path: Path to dclg-affordable-housing-borough.csv
+    """
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.reader(f)
+        next(reader)  # Code, Area, Year, Affordable Housing Supply
+        for line_number, row in enumerate(reader, start=2):
+            if not row or not row[0].strip() or not row[3].strip():
+                continue
+            try:
+                yield row[0].strip(), row[1].strip(), parse_year(row[2]), parse_count(row[3])
+            except ValueError as e:
+                raise ValueError(f"{csv_path.name} line {line_number}: {e}") from None
+
+
+def iter_wide_workbook(xlsx_path, sheet_index, header_row):
+    """
+    Stream (area_code, area_name, year, value) rows from a wide DCLG workbook.
+    The sheet is read in openpyxl's read-only mode, one row at a time. As in the
+    old cleaning scripts, the former-code column is ignored and any area with a
+    missing year is skipped.
+    :param xlsx_path: Path to the workbook
+    :param sheet_index: Index of the data sheet
+    :param header_row: Zero-based index of the row holding the year headers
+    """
+    workbook = load_workbook(xlsx_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[sheet_index].iter_rows(values_only=True)
+        year_columns = []
+        for row_number, row in enumerate(rows):
+            if row_number < header_row:
+                continue
+            if row_number == header_row:
+                year_columns = [(i, parse_year(value)) for i, value in enumerate(row)
+                                if i >= 3 and value is not None]
+                continue
+            if row[1] is None or row[2] is None:
+                continue
+            if any(row[i] is None for i, _ in year_columns):
+                continue
+            area_code, area_name = str(row[1]).strip(), str(row[2]).strip()
+            try:
+                for i, year in year_columns:
+                    yield area_code, area_name, year, parse_count(row[i])
+            except ValueError as e:
+                raise ValueError(f"{xlsx_path.name} row {row_number + 1}: {e}") from None
+    finally:
+        workbook.close()
+
+
+def iter_chunks(rows, chunk_size):
+    """Group an iterator of rows into lists of at most chunk_size rows."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def to_batch(chunk):
+    """Pack a chunk of (area_code, area_name, year, value) rows into a RowBatch."""
+    areas = {}
+    area_index = array('i', [areas.setdefault((code, name), len(areas)) for code, name, _, _ in chunk])
+    return RowBatch(list(areas), area_index, array('i', [row[2] for row in chunk]),
+                    array('q', [row[3] for row in chunk]))
+
+
+def iter_batch_rows(batch):
+    """Unpack a RowBatch back into (area_code, area_name, year, value) rows."""
+    for index, year, value in zip(batch.area_index, batch.years, batch.values):
+        yield batch.areas[index] + (year, value)
+
+
+def iter_source_rows(source_path, layout):
+    """Stream the rows of a long-format CSV (layout None) or of a wide workbook."""
+    if layout is None:
+        return iter_affordable_csv(source_path)
+    return iter_wide_workbook(source_path, **layout)
+
+
+def iter_source_batches(source_path, layout, chunk_size):
+    """Parse and clean one source file, yielding one RowBatch per chunk of rows."""
+    for chunk in iter_chunks(iter_source_rows(source_path, layout), chunk_size):
+        yield to_batch(chunk)
+
+
+def parse_source(batches, stop, source_path, layout, chunk_size):
+    """
+    Parse one source file into a bounded queue of RowBatches, ending with None.
+    Runs in a worker process, so it only takes picklable values (the queue and the
+    stop event are manager proxies). A full queue blocks the worker until the writer
+    catches up; if the writer gives up (stop is set) the worker stops parsing.
+    Errors are raised from the worker's future once None has been sent.
+    """
+    def put(item):
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for batch in iter_source_batches(source_path, layout, chunk_size):
+            if not put(batch):
+                return
+    finally:
+        put(None)
+
+
+def iter_queue(batches, future):
+    """Yield the batches a worker sends until its final None, then raise its error if any."""
+    while True:
+        batch = batches.get()
+        if batch is None:
+            break
+        yield batch
+    future.result()
+
+
+def parse_sources(sources, chunk_size, workers=None):
+    """
+    Parse every source file, in parallel worker processes when there are several.
+    Batches are streamed back as they are parsed: the writer can load a source's
+    first batches while the rest of it, and the later sources, are still being parsed.
+    :param sources: List of (source_path, layout) pairs
+    :param chunk_size: Rows per RowBatch
+    :param workers: Worker processes; defaults to one per source, up to the CPU count.
+                    0 or 1 parses in this process.
+    :return: Iterator of one batch iterator per source, in the order of `sources`;
+             each must be consumed before the next one
+    """
+    if workers is None:
+        workers = min(len(sources), os.cpu_count() or 1)
+    if workers <= 1:
+        for source_path, layout in sources:
+            yield iter_source_batches(source_path, layout, chunk_size)
+        return
+    with Manager() as manager, ProcessPoolExecutor(max_workers=workers) as executor:
+        stop = manager.Event()
+        # One queue per source, consumed in the order given, so the load order does not
+        # depend on which worker finishes first. The pool starts the sources in the same
+        # order, so the source being consumed is always running or done
+        queues = [manager.Queue(maxsize=QUEUE_BATCHES) for _ in sources]
+        futures = [executor.submit(parse_source, batches, stop, source_path, layout, chunk_size)
+                   for batches, (source_path, layout) in zip(queues, sources)]
+        try:
+            for batches, future in zip(queues, futures):
+                yield iter_queue(batches, future)
+        finally:
+            # Also reached when the writer fails: unblock and cancel the other workers
+            stop.set()
+            for future in futures:
+                future.cancel()
+
+
+# Step 2: Load batches into SQLite
+
+def load_batch(cursor, table, value_column, batch, seen_areas, seen_years):
+    """
+    Insert one batch of fact rows, adding any areas and years it introduces first.
+    :param cursor: SQLite cursor inside the ETL transaction
+    :param table: Fact table name
+    :param value_column: Name of the fact table's value column
+    :param batch: RowBatch of (area_code, area_name, year, value) rows
+    :param seen_areas: Set of area codes already inserted (updated in place)
+    :param seen_years: Set of years already inserted (updated in place)
+    """
+    new_areas = {}
+    for area_code, area_name in batch.areas:
+        if area_code not in seen_areas and area_code not in new_areas:
+            new_areas[area_code] = area_name
+    new_years = set(batch.years) - seen_years
+
+    # The first dataset to name an area wins, as in create_database()
+    cursor.executemany("INSERT OR IGNORE INTO Area (area_code, area_name) VALUES (?, ?);",
+                       new_areas.items())
+    cursor.executemany("INSERT OR IGNORE INTO Year (year) VALUES (?);",
+                       [(year,) for year in sorted(new_years)])
+    area_codes = [area_code for area_code, _ in batch.areas]
+    # Several workbooks for one table may repeat an (area_code, year): the later source wins
+    cursor.executemany(f"""
+        INSERT INTO {table} (area_code, year, {value_column}) VALUES (?, ?, ?)
+        ON CONFLICT (area_code, year) DO UPDATE SET {value_column} = excluded.{value_column};
+        """, zip([area_codes[index] for index in batch.area_index], batch.years, batch.values))
+    seen_areas.update(new_areas)
+    seen_years.update(new_years)
+
+
+def export_excel(rows, value_column, code_header, output_path):
+    """
+    Write cleaned rows back out in the wide layout the old cleaning scripts produced.
+    Only used when the Excel artifacts are asked for, since it holds the dataset in memory.
+    """
+    df = pd.DataFrame(rows, columns=['area_code', 'area_name', 'year', value_column])
+    wide = df.pivot(index=['area_code', 'area_name'], columns='year', values=value_column).reset_index()
+    wide.columns = [code_header, 'Area name'] + list(wide.columns[2:])
+    output_path.parent.mkdir(exist_ok=True)
+    wide.to_excel(output_path, index=False)
+    print(f"Cleaned file saved to: {output_path}")
+
+
+def get_layout(source_path, wide_layout):
+    """Return the layout to parse a source with: None for a long-format CSV."""
+    return None if Path(source_path).suffix.lower() == '.csv' else wide_layout
+
+
+def as_source_list(sources):
+    """Accept a single path or a list of paths."""
+    return [Path(sources)] if isinstance(sources, (str, Path)) else [Path(source) for source in sources]
+
+
+def run_etl(target_path=db_path, affordable_source=affordable_csv_path,
+            waiting_list_source=waiting_list_xlsx_path, chunk_size=CHUNK_SIZE, excel_output=False,
+            workers=None):
+    """
+    Build the database straight from the source files in a single streaming pass.
+    Each source file is parsed and cleaned in its own worker process; this process
+    is the only writer and loads the batches as they arrive, in the order the sources
+    are given. A row repeated by a later source replaces the earlier value. The schema
+    is recreated and every row is inserted inside one transaction, so a failed run
+    leaves the previous database untouched.
+    :param target_path: Path of the SQLite database to build
+    :param affordable_source: Affordable housing CSV or wide workbook, or a list of them
+    :param waiting_list_source: Waiting list wide workbook, or a list of them
+    :param chunk_size: Rows per executemany batch
+    :param excel_output: Also write the cleaned .xlsx files to output/
+    :param workers: Parse worker processes (see parse_sources)
+    :return: Dict of table name -> row count
+    """
+    sources = [('Affordable_Housing_Data', path, get_layout(path, AFFORDABLE_LAYOUT))
+               for path in as_source_list(affordable_source)]
+    sources += [('Waiting_List_Data', path, WAITING_LIST_LAYOUT)
+                for path in as_source_list(waiting_list_source)]
+
+    conn = sqlite3.connect(target_path, isolation_level=None)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN;")
+        # The ingest manifest is recreated empty, so the next create_database() run
+        # does a full build rather than diffing against digests of other data
+        for table in TABLES + MANIFEST_TABLES + DERIVED_TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table};")
+        for statement in iter_statements(SCHEMA_SQL + INDEX_SQL + FACTS_SQL + ROLLUP_SQL + MANIFEST_SQL):
+            cursor.execute(statement)
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+
+        seen_areas, seen_years = set(), set()
+        kept = {table: [] for table in FACT_DATASETS} if excel_output else None
+        # closing() stops the parse workers straight away if a batch fails to load
+        with closing(parse_sources([(path, layout) for _, path, layout in sources], chunk_size,
+                                   workers)) as parsed:
+            for (table, _, _), batches in zip(sources, parsed):
+                value_column = FACT_DATASETS[table][0]
+                for batch in batches:
+                    load_batch(cursor, table, value_column, batch, seen_areas, seen_years)
+                    if kept is not None:
+                        kept[table].extend(iter_batch_rows(batch))
+        if kept is not None:
+            for table, (value_column, code_header, output_path) in FACT_DATASETS.items():
+                export_excel(kept[table], value_column, code_header, output_path)
+        build_derived_tables(conn)
+
+        cursor.execute("COMMIT;")
+        counts = {table: cursor.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0]
+                  for table in TABLES}
+    except (ValueError, sqlite3.Error):
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK;")
+        raise
+    finally:
+        conn.close()
+
+    print(f"ETL finished, data inserted into: {target_path}")
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Stream the source data straight into local_authority_housing.db")
+    parser.add_argument("--db", type=Path, default=db_path, help="database file to build")
+    parser.add_argument("--affordable", type=Path, nargs="+", default=[affordable_csv_path],
+                        help="affordable housing CSV or workbooks")
+    parser.add_argument("--waiting-list", type=Path, nargs="+", default=[waiting_list_xlsx_path],
+                        help="waiting list workbooks")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="rows per insert batch")
+    parser.add_argument("--excel-output", action="store_true",
+                        help="also write the cleaned .xlsx files to output/")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="parse worker processes (default: one per source file, up to the CPU count)")
+    args = parser.parse_args()
+
+    try:
+        counts = run_etl(args.db, args.affordable, args.waiting_list, args.chunk_size, args.excel_output,
+                         args.workers)
+    except (ValueError, sqlite3.Error) as e:
+        print(f"ETL failed, database left unchanged: {e}")
+    else:
+        for table, count in counts.items():
+            print(f"  - {table}: {count} rows")
@@ -1,32 +1,22 @@
-import pandas as pd
-from pathlib import Path
-
-
-base_dir = Path(__file__).parent  
-file_path = base_dir / 'data' / 'households-on-local-authority-waiting-list.xlsx'
-
-
-if not file_path.exists():
-    raise FileNotFoundError(f"Data file not found: {file_path.resolve()}")
-
-
-data_df = pd.read_excel(file_path, sheet_name=1)
-
-
-data_df = data_df.iloc[:, 1:]  
-data_df.iloc[0, 0] = "Current ONS Code" 
-data_df.iloc[0, 1] = "Area name"  
-
-
-data_df.columns = data_df.iloc[0] 
-data_df = data_df[1:].reset_index(drop=True) 
-
-
-cleaned_data_df = data_df.dropna(how='any').reset_index(drop=True)
-
-
-output_path = base_dir / 'output' / 'cleaned_final_result_waiting_list.xlsx'
-output_path.parent.mkdir(exist_ok=True) 
-cleaned_data_df.to_excel(output_path, index=False)
-
-print(f"Cleaned data saved to: {output_path.resolve()}")
+import argparse
+import sys
+from pathlib import Path
+
+
+# Allow running as a script: python "coursework1/waiting list.py"
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from coursework1.cleaning import DATASETS, get_cache_path, get_file_hash, load_cleaned_dataset
+
+
+parser = argparse.ArgumentParser(description="Clean the waiting list workbook")
+parser.add_argument("--excel-output", action="store_true",
+                    help="also write the cleaned data to output/ as .xlsx")
+args = parser.parse_args()
+
+source_hash = get_file_hash(DATASETS['waiting_list'][0])
+cleaned_data_df = load_cleaned_dataset('waiting_list', source_hash, excel_output=args.excel_output)
+
+print(f"Cleaned data cached at: {get_cache_path('waiting_list', source_hash).resolve()}")
+if args.excel_output:
+    print(f"Cleaned data saved to: {(Path(__file__).parent / 'output' / DATASETS['waiting_list'][2]).resolve()}")
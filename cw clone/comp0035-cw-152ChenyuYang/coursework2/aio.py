@@ -0,0 +1,183 @@
+import asyncio
+import functools
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Allow running as a script: python coursework2/aio.py
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from coursework2 import connection
+from coursework2.section3 import queries_aggregate, queries_join, queries_select
+
+
+# Step 1: Reader settings
+# Reader threads per database file; each keeps one read-only connection open
+READER_THREADS = 4
+
+
+# Step 2: Pool of reader threads
+class QueryReader:
+    """
+    Runs the blocking section3 query functions on a bounded pool of reader threads,
+    so async code can await them and run independent queries in parallel.
+    Each thread opens its own read-only connection (configured like the shared
+    pool's, see coursework2/connection.py) when it starts and keeps it until close().
+    One connection is opened up front, so a database that cannot be opened fails here
+    with its sqlite3 error; a thread that fails to connect later raises it on each call.
+    """
+
+    def __init__(self, db_path=connection.db_path, threads=READER_THREADS):
+        """
+        :param db_path: Path to the SQLite database
+        :param threads: Maximum number of reader threads (and connections)
+        :raise sqlite3.Error: If the database cannot be opened
+        """
+        self.db_path = Path(db_path)
+        self._pool = connection.ConnectionPool(db_path, size=threads, read_only=True)
+        try:
+            # The first reader thread takes this connection back from the pool
+            self._pool.acquire().close()
+        except Exception:
+            self._pool.close()
+            raise
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="query-reader",
+                                            initializer=self._open_connection)
+
+    def _open_connection(self):
+        """
+        Thread initializer: borrow this thread's connection for its lifetime.
+        A failure is kept for _call to raise: an initializer that raises would break the
+        executor, and every later call would fail with BrokenThreadPool instead.
+        """
+        try:
+            conn = self._pool.acquire()
+        except Exception as e:
+            self._local.error = e
+            return
+        self._local.conn = conn
+        with self._lock:
+            self._connections.append(conn)
+
+    def _call(self, func, args, kwargs):
+        """Run func(cursor, *args, **kwargs) on the calling reader thread's connection."""
+        if not hasattr(self._local, "conn"):
+            raise self._local.error
+        cursor = self._local.conn.cursor()
+        try:
+            return func(cursor, *args, **kwargs)
+        finally:
+            cursor.close()
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Await a query function taking (cursor, *args, **kwargs) on a reader thread.
+        :return: Whatever the function returns
+        """
+        if kwargs.get("stream"):
+            # The iterator would read from another thread's connection after returning
+            raise ValueError("stream=True is not supported by the async API")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(self._call, func, args, kwargs))
+
+    def close(self):
+        """Wait for running queries, stop the threads and close their connections."""
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._pool.close()
+
+
+# Step 3: Shared readers, one per database file
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def get_reader(db_path=connection.db_path):
+    """Return the shared reader for a database file, creating it on first use."""
+    key = str(Path(db_path).resolve())
+    with _readers_lock:
+        reader = _readers.get(key)
+        if reader is None:
+            reader = _readers[key] = QueryReader(db_path)
+        return reader
+
+
+def close_readers():
+    """Close every shared reader."""
+    with _readers_lock:
+        for reader in _readers.values():
+            reader.close()
+        _readers.clear()
+
+
+async def fan_out(**queries):
+    """
+    Await several independent queries at once.
+    Example: await fan_out(areas=get_all_areas(), years=get_unique_years())
+    :return: Dict of name -> result, in the order given
+    """
+    results = await asyncio.gather(*queries.values())
+    return dict(zip(queries, results))
+
+
+# Step 4: Async mirrors of the section3 query functions
+# Each takes the same arguments without the cursor, plus an optional db_path
+def mirror(func):
+    @functools.wraps(func)
+    async def wrapper(*args, db_path=connection.db_path, **kwargs):
+        return await get_reader(db_path).run(func, *args, **kwargs)
+    return wrapper
+
+
+# queries_select
+get_all_areas = mirror(queries_select.get_all_areas)
+get_waiting_list_by_year = mirror(queries_select.get_waiting_list_by_year)
+get_housing_data_by_area = mirror(queries_select.get_housing_data_by_area)
+get_area_details_by_year = mirror(queries_select.get_area_details_by_year)
+get_unique_years = mirror(queries_select.get_unique_years)
+get_areas_with_large_waiting_lists = mirror(queries_select.get_areas_with_large_waiting_lists)
+get_area_comparison_by_year = mirror(queries_select.get_area_comparison_by_year)
+
+# queries_aggregate
+get_total_housing_units_by_year = mirror(queries_aggregate.get_total_housing_units_by_year)
+get_avg_waiting_list = mirror(queries_aggregate.get_avg_waiting_list)
+get_extreme_waiting_lists = mirror(queries_aggregate.get_extreme_waiting_lists)
+get_top_waiting_lists = mirror(queries_aggregate.get_top_waiting_lists)
+get_bottom_waiting_lists = mirror(queries_aggregate.get_bottom_waiting_lists)
+get_max_waiting_list = mirror(queries_aggregate.get_max_waiting_list)
+get_min_waiting_list = mirror(queries_aggregate.get_min_waiting_list)
+get_housing_units_statistics = mirror(queries_aggregate.get_housing_units_statistics)
+
+# queries_join
+get_filtered_area_and_year = mirror(queries_join.get_filtered_area_and_year)
+
+
+# Step 5: Main program execution
+async def load_dashboard():
+    """The queries behind the dashboard page, issued in parallel."""
+    return await fan_out(
+        areas=get_all_areas(),
+        years=get_unique_years(),
+        statistics=get_housing_units_statistics(),
+        top_waiting_lists=get_top_waiting_lists(k=5),
+    )
+
+
+if __name__ == "__main__":
+    if not connection.db_path.exists():
+        print(f"Database not found: {connection.db_path}")
+    else:
+        try:
+            for name, rows in asyncio.run(load_dashboard()).items():
+                print(f"\n{name}:")
+                for row in rows or []:
+                    print(row)
+        finally:
+            close_readers()
@@ -0,0 +1,319 @@
+import contextlib
+import io
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Allow running as a script: python coursework2/benchmark/runner.py
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from coursework2 import connection, instrumentation, results
+from coursework2.benchmark import synthetic
+from coursework2.section3 import (queries_aggregate, queries_delete, queries_insert, queries_join,
+                                  queries_select, queries_update)
+
+
+# Step 1: Benchmark settings
+# Timed runs per function, after the untimed warm-up runs
+REPEAT = 20
+WARMUP = 2
+
+# A p50 this many times the baseline's is reported as a regression
+REGRESSION_THRESHOLD = 1.2
+
+# Instrumented statement kinds whose rowcounts make up a write's rows
+WRITE_KINDS = ("insert", "update", "delete")
+
+# One benchmarked call. `args` and `setup` take the Sample of the database; setup
+# runs inside the same rolled-back transaction as a write, but is not timed.
+Case = namedtuple("Case", ["name", "func", "args", "kind", "setup"], defaults=[None])
+
+# Keys and values picked from the benchmarked database, so every case hits real rows
+Sample = namedtuple("Sample", ["area_code", "area_name", "year", "last_year", "threshold",
+                               "missing_cell", "codes", "cells"])
+
+
+# Step 2: The benchmarked functions
+def uncached(func):
+    """Time the query itself rather than query_cache: use the undecorated function."""
+    return getattr(func, "uncached", func)
+
+
+def new_areas(count):
+    return [(f"N{index:08d}", f"New Area {index}") for index in range(count)]
+
+
+def insert_new_year_rows(cursor, sample):
+    queries_insert.insert_new_year(cursor, sample.last_year + 1)
+
+
+CASES = [
+    # queries_select
+    Case("select.get_all_areas", uncached(queries_select.get_all_areas), lambda s: (), "read"),
+    Case("select.get_waiting_list_by_year", uncached(queries_select.get_waiting_list_by_year),
+         lambda s: (s.year,), "read"),
+    Case("select.get_housing_data_by_area", uncached(queries_select.get_housing_data_by_area),
+         lambda s: (s.area_code,), "read"),
+    Case("select.get_area_details_by_year", uncached(queries_select.get_area_details_by_year),
+         lambda s: (s.area_code, s.year), "read"),
+    Case("select.get_unique_years", uncached(queries_select.get_unique_years), lambda s: (), "read"),
+    Case("select.get_areas_with_large_waiting_lists", uncached(queries_select.get_areas_with_large_waiting_lists),
+         lambda s: (s.threshold,), "read"),
+    Case("select.get_area_comparison_by_year", uncached(queries_select.get_area_comparison_by_year),
+         lambda s: (s.year,), "read"),
+    # queries_aggregate
+    Case("aggregate.get_total_housing_units_by_year", queries_aggregate.get_total_housing_units_by_year,
+         lambda s: (s.year,), "read"),
+    Case("aggregate.get_avg_waiting_list", queries_aggregate.get_avg_waiting_list, lambda s: (), "read"),
+    Case("aggregate.get_top_waiting_lists", queries_aggregate.get_top_waiting_lists, lambda s: (10,), "read"),
+    Case("aggregate.get_bottom_waiting_lists", queries_aggregate.get_bottom_waiting_lists,
+         lambda s: (10, s.year), "read"),
+    Case("aggregate.get_top_waiting_lists[per_year]", queries_aggregate.get_top_waiting_lists,
+         lambda s: (10, None, True), "read"),
+    Case("aggregate.get_max_waiting_list", queries_aggregate.get_max_waiting_list, lambda s: (), "read"),
+    Case("aggregate.get_min_waiting_list", queries_aggregate.get_min_waiting_list, lambda s: (), "read"),
+    Case("aggregate.get_housing_units_statistics", queries_aggregate.get_housing_units_statistics,
+         lambda s: (), "read"),
+    Case("aggregate.verify_rollups", queries_aggregate.verify_rollups, lambda s: (), "read"),
+    # queries_join
+    Case("join.get_filtered_area_and_year[area]", queries_join.get_filtered_area_and_year,
+         lambda s: (s.area_name,), "read"),
+    Case("join.get_filtered_area_and_year[year]", queries_join.get_filtered_area_and_year,
+         lambda s: (None, s.year), "read"),
+    Case("join.get_filtered_area_and_year[all]", queries_join.get_filtered_area_and_year, lambda s: (), "read"),
+    # queries_insert
+    Case("insert.insert_new_area", queries_insert.insert_new_area, lambda s: ("N00000000", "New Area"), "write"),
+    Case("insert.insert_new_year", queries_insert.insert_new_year, lambda s: (s.last_year + 1,), "write"),
+    Case("insert.insert_housing_data", queries_insert.insert_housing_data, lambda s: s.missing_cell + (10,),
+         "write"),
+    Case("insert.insert_waiting_list_data", queries_insert.insert_waiting_list_data,
+         lambda s: (s.area_code, s.last_year + 1, 10), "write", insert_new_year_rows),
+    Case("insert.insert_new_areas_many", queries_insert.insert_new_areas_many, lambda s: (new_areas(1000),),
+         "write"),
+    Case("insert.insert_new_years_many", queries_insert.insert_new_years_many,
+         lambda s: ([s.last_year + offset for offset in range(1, 101)],), "write"),
+    Case("insert.insert_housing_data_many", queries_insert.insert_housing_data_many,
+         lambda s: ([(code, s.last_year + 1, 10) for code in s.codes],), "write", insert_new_year_rows),
+    Case("insert.insert_waiting_list_data_many", queries_insert.insert_waiting_list_data_many,
+         lambda s: ([(code, s.last_year + 1, 10) for code in s.codes],), "write", insert_new_year_rows),
+    # queries_update
+    Case("update.update_area_names", queries_update.update_area_names,
+         lambda s: ({code: f"Renamed {code}" for code in s.codes},), "write"),
+    Case("update.update_housing_units", queries_update.update_housing_units,
+         lambda s: ({cell: 1 for cell in s.cells},), "write"),
+    Case("update.update_waiting_list_counts", queries_update.update_waiting_list_counts,
+         lambda s: ({cell: 1 for cell in s.cells},), "write"),
+    # queries_delete
+    Case("delete.delete_area", queries_delete.delete_area, lambda s: (s.area_code,), "write"),
+    Case("delete.delete_year", queries_delete.delete_year, lambda s: (s.year,), "write"),
+    Case("delete.delete_housing_data_by_area", queries_delete.delete_housing_data_by_area,
+         lambda s: (s.area_code,), "write"),
+    Case("delete.delete_waiting_list_by_year", queries_delete.delete_waiting_list_by_year,
+         lambda s: (s.year,), "write"),
+    # VACUUM cannot run inside the rolled-back transaction, so only the truncate is timed
+    Case("delete.clear_all_data", queries_delete.clear_all_data, lambda s: (False,), "write"),
+]
+
+
+def get_sample(cursor, batch_size=1000):
+    """Pick the keys the cases run against: a mid-table area and year, and so on."""
+    codes = [row[0] for row in cursor.execute("SELECT area_code FROM Area ORDER BY area_code;")]
+    years = [row[0] for row in cursor.execute("SELECT year FROM Year ORDER BY year;")]
+    area_code = codes[len(codes) // 2]
+    area_name = cursor.execute("SELECT area_name FROM Area WHERE area_code = ?;", (area_code,)).fetchone()[0]
+    year = years[len(years) // 2]
+    # Count above which about 1% of the waiting list rows lie
+    count = cursor.execute("SELECT COUNT(*) FROM Waiting_List_Data;").fetchone()[0]
+    threshold = cursor.execute("SELECT households_count FROM Waiting_List_Data ORDER BY households_count DESC "
+                               "LIMIT 1 OFFSET ?;", (count // 100,)).fetchone()[0]
+    # An (area, year) cell without affordable housing data, for the single-row insert
+    missing_cell = cursor.execute("""
+        SELECT Area.area_code, Year.year FROM Area, Year
+        WHERE NOT EXISTS (SELECT 1 FROM Affordable_Housing_Data AS h
+                          WHERE h.area_code = Area.area_code AND h.year = Year.year)
+        LIMIT 1;
+    """).fetchone()
+    cells = cursor.execute("SELECT area_code, year FROM Waiting_List_Data WHERE year = ? LIMIT ?;",
+                           (year, batch_size)).fetchall()
+    return Sample(area_code, area_name, year, years[-1], threshold, tuple(missing_cell) if missing_cell else None,
+                  codes[:batch_size], [tuple(cell) for cell in cells])
+
+
+# Step 3: Timing
+class Rollback(Exception):
+    """Raised inside a write's transaction so the database is left unchanged."""
+
+
+def time_case(conn, case, sample):
+    """
+    Call a case once and return (seconds, rows, changes). rows is what the function
+    returned for a read, and for a write the rows its own statements changed (their
+    rowcounts, reported through instrumentation). changes is the conn.total_changes
+    delta of a write, which also counts the rows changed by the Area_Year_Facts and
+    Fact_Rollup triggers and by temp staging tables; None for a read.
+    Writes run in a transaction that is rolled back afterwards.
+    """
+    cursor = conn.cursor()
+    args = case.args(sample)
+    # The write helpers print their outcome on every call
+    with contextlib.redirect_stdout(io.StringIO()):
+        if case.kind == "read":
+            start = time.perf_counter()
+            result = case.func(cursor, *args)
+            return time.perf_counter() - start, results.count_rows(result), None
+        events = []
+        try:
+            with connection.transaction(conn):
+                if case.setup is not None:
+                    case.setup(cursor, sample)
+                changes = conn.total_changes
+                instrumentation.add_hook(events.append)
+                try:
+                    start = time.perf_counter()
+                    case.func(cursor, *args)
+                    elapsed = time.perf_counter() - start
+                finally:
+                    instrumentation.remove_hook(events.append)
+                changes = conn.total_changes - changes
+                raise Rollback
+        except Rollback:
+            return elapsed, sum(event.rows or 0 for event in events if event.kind in WRITE_KINDS), changes
+
+
+def summarize(timings, rows, changes=None):
+    """
+    p50/p95/mean in milliseconds and rows per second at the median.
+    Writes also record `changes`, every row changed including by triggers (see time_case).
+    """
+    timings = sorted(timings)
+    p50 = statistics.median(timings)
+    p95 = timings[min(len(timings) - 1, round(0.95 * (len(timings) - 1)))]
+    summary = {
+        "runs": len(timings),
+        "p50_ms": round(p50 * 1000, 4),
+        "p95_ms": round(p95 * 1000, 4),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 4),
+        "rows": rows,
+        "rows_per_s": round(rows / p50, 1) if p50 > 0 else None,
+    }
+    if changes is not None:
+        summary["changes"] = changes
+    return summary
+
+
+def run_benchmarks(db_path, repeat=REPEAT, warmup=WARMUP, only=None):
+    """
+    Time every case against a database.
+    :param db_path: Database to benchmark; writes are rolled back, so it is left unchanged
+    :param repeat: Timed runs per case
+    :param warmup: Untimed runs per case first (fills the page cache)
+    :param only: Substring a case name must contain to be run
+    :return: Dict of case name -> summary
+    """
+    pool = connection.ConnectionPool(db_path, size=1)
+    conn = pool.acquire()
+    try:
+        sample = get_sample(conn.cursor())
+        summaries = {}
+        for case in CASES:
+            if only and only not in case.name:
+                continue
+            if case.name == "insert.insert_housing_data" and sample.missing_cell is None:
+                continue  # Every cell is filled, nothing to insert into
+            for _ in range(warmup):
+                time_case(conn, case, sample)
+            measured = [time_case(conn, case, sample) for _ in range(repeat)]
+            summaries[case.name] = summarize([seconds for seconds, _, _ in measured], *measured[-1][1:])
+            print(f"{case.name:<50} p50 {summaries[case.name]['p50_ms']:>10.3f} ms"
+                  f"   p95 {summaries[case.name]['p95_ms']:>10.3f} ms   rows {summaries[case.name]['rows']}")
+        return summaries
+    finally:
+        conn.close()
+        pool.close()
+
+
+# Step 4: Results files
+def get_commit():
+    """Current git commit, or None outside a checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path, summaries, scale, repeat):
+    """Write the summaries with enough context to compare runs across commits."""
+    results = {
+        "meta": {
+            "commit": get_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "scale": scale,
+            "repeat": repeat,
+        },
+        "results": summaries,
+    }
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2) + "\n")
+    return results
+
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Compare the p50 of every case present in both result sets.
+    :return: List of (name, baseline p50 ms, current p50 ms, ratio) for the regressions
+    """
+    regressions = []
+    for name, summary in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None or not before["p50_ms"]:
+            continue
+        ratio = summary["p50_ms"] / before["p50_ms"]
+        if ratio > threshold:
+            regressions.append((name, before["p50_ms"], summary["p50_ms"], ratio))
+    return regressions
+
+
+# Step 5: Main program execution
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark the section3 query functions on synthetic data")
+    parser.add_argument("--areas", type=int, default=synthetic.AREAS, help="synthetic areas")
+    parser.add_argument("--years", type=int, default=synthetic.YEARS, help="synthetic years")
+    parser.add_argument("--db", type=Path, help="benchmark this database instead of a synthetic one")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="timed runs per function")
+    parser.add_argument("--only", help="only run cases whose name contains this text")
+    parser.add_argument("--output", type=Path, default=synthetic.output_dir / "results.json",
+                        help="JSON results file")
+    parser.add_argument("--baseline", type=Path, help="earlier results file to compare against")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="p50 ratio reported as a regression")
+    args = parser.parse_args()
+
+    if args.db:
+        db_path, scale = args.db, {"db": str(args.db)}
+    else:
+        db_path = synthetic.get_synthetic_database(args.areas, args.years)
+        scale = {"areas": args.areas, "years": args.years, "density": synthetic.DENSITY, "seed": synthetic.SEED}
+    current = write_results(args.output, run_benchmarks(db_path, args.repeat, only=args.only), scale, args.repeat)
+    print(f"Results written to: {args.output}")
+
+    if args.baseline:
+        regressions = compare_results(json.loads(args.baseline.read_text()), current, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESSION {name}: p50 {before:.3f} ms -> {after:.3f} ms ({ratio:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
@@ -0,0 +1,119 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Allow running as a script: python coursework2/benchmark/synthetic.py
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from coursework1.database import build_derived_tables, create_schema
+
+
+# Step 1: Dataset settings
+base_dir = Path(__file__).resolve().parent
+output_dir = base_dir / "output"
+
+# Default scale: 10k areas x 100 years, about a million rows per fact table
+AREAS = 10000
+YEARS = 100
+FIRST_YEAR = 1925
+# Share of (area, year) cells that have a value; the rest are gaps, as in the real data
+DENSITY = 0.95
+SEED = 35
+
+# Rows per executemany call while loading
+LOAD_BATCH = 50000
+
+
+# Step 2: Generate the rows
+def get_area_code(index):
+    """Synthetic area codes sort like ONS codes and never clash with real ones."""
+    return f"S{index:08d}"
+
+
+def iter_fact_rows(rng, areas, years, density, low, high):
+    """
+    Yield (area_code, year, value) rows for a random `density` share of the cells,
+    area by area, with values drawn uniformly from [low, high).
+    """
+    for area in range(areas):
+        area_code = get_area_code(area)
+        present = rng.random(years) < density
+        values = rng.integers(low, high, size=years)
+        for offset in np.flatnonzero(present):
+            yield area_code, FIRST_YEAR + int(offset), int(values[offset])
+
+
+def iter_batches(rows, batch_size=LOAD_BATCH):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# Step 3: Build the database
+def build_synthetic_database(db_path, areas=AREAS, years=YEARS, density=DENSITY, seed=SEED):
+    """
+    Build a database with the declared schema (keys, indexes, derived tables and
+    triggers, see coursework1/database.py) filled with random data.
+    :param db_path: Path of the database file to (re)create
+    :return: Dict of table name -> row count
+    """
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    if db_path.exists():
+        db_path.unlink()
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(db_path)
+    try:
+        # A throwaway file: no journal or fsync while it is generated
+        conn.execute("PRAGMA journal_mode = OFF;")
+        conn.execute("PRAGMA synchronous = OFF;")
+        create_schema(conn)
+        conn.executemany("INSERT INTO Area (area_code, area_name) VALUES (?, ?);",
+                         ((get_area_code(area), f"Synthetic Area {area}") for area in range(areas)))
+        conn.executemany("INSERT INTO Year (year) VALUES (?);",
+                         ((FIRST_YEAR + offset,) for offset in range(years)))
+        for table, column, low, high in [("Affordable_Housing_Data", "housing_units", 0, 2000),
+                                         ("Waiting_List_Data", "households_count", 0, 40000)]:
+            for batch in iter_batches(iter_fact_rows(rng, areas, years, density, low, high)):
+                conn.executemany(f"INSERT INTO {table} (area_code, year, {column}) VALUES (?, ?, ?);", batch)
+        # Derived tables are filled once after the load, as create_database() does
+        build_derived_tables(conn)
+        conn.commit()
+        return {table: conn.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0]
+                for table in ["Area", "Year", "Affordable_Housing_Data", "Waiting_List_Data"]}
+    finally:
+        conn.close()
+
+
+def get_synthetic_database(areas=AREAS, years=YEARS, density=DENSITY, seed=SEED, regenerate=False):
+    """
+    Return the path of a synthetic database of the given scale, building it the
+    first time. Files are kept in benchmark/output/ and reused across runs.
+    """
+    db_path = output_dir / f"synthetic-{areas}x{years}-{density}-{seed}.db"
+    if regenerate or not db_path.exists():
+        print(f"Generating {areas} areas x {years} years into {db_path} ...")
+        counts = build_synthetic_database(db_path, areas, years, density, seed)
+        for table, count in counts.items():
+            print(f"  - {table}: {count} rows")
+    return db_path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic local_authority_housing database")
+    parser.add_argument("--areas", type=int, default=AREAS, help="number of areas")
+    parser.add_argument("--years", type=int, default=YEARS, help="number of years")
+    parser.add_argument("--density", type=float, default=DENSITY, help="share of area/year cells with data")
+    parser.add_argument("--seed", type=int, default=SEED, help="random seed")
+    args = parser.parse_args()
+
+    get_synthetic_database(args.areas, args.years, args.density, args.seed, regenerate=True)
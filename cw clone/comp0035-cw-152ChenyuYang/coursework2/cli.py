@@ -0,0 +1,354 @@
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import os
+import sqlite3
+import sys
+from collections import namedtuple
+from pathlib import Path
+
+# Allow running as a script: python coursework2/cli.py
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+
+from coursework1 import etl
+from coursework2 import connection, statements
+from coursework2.section3 import queries_aggregate, queries_delete, queries_insert, queries_select, queries_update
+
+
+# Step 1: Settings
+# Buffer of --output files, in bytes
+OUTPUT_BUFFER = 1 << 20
+
+# Fields read as integers from arguments, CSV and NDJSON input; everything else stays text
+INTEGER_FIELDS = {"year", "housing_units", "households_count", "min_households", "k"}
+
+# Input file suffix -> format; stdin is read as NDJSON unless --input-format says otherwise
+INPUT_FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "ndjson"}
+
+
+# Step 2: Read queries
+# A query function, the parameters it takes from the command line and its output columns
+Query = namedtuple("Query", ["func", "params", "columns"])
+
+SELECT_QUERIES = {
+    "areas": Query(queries_select.get_all_areas, (), ("area_name",)),
+    "waiting-list": Query(queries_select.get_waiting_list_by_year, ("year",), ("area_code", "households_count")),
+    "housing": Query(queries_select.get_housing_data_by_area, ("area_code",), ("year", "housing_units")),
+    "details": Query(queries_select.get_area_details_by_year, ("area_code", "year"),
+                     ("area_name", "housing_units", "households_count")),
+    "years": Query(queries_select.get_unique_years, (), ("year",)),
+    "large-waiting-lists": Query(queries_select.get_areas_with_large_waiting_lists, ("min_households",),
+                                 ("area_code", "year", "households_count")),
+    "comparison": Query(queries_select.get_area_comparison_by_year, ("year",),
+                        ("area_code", "area_name", "housing_units", "households_count", "ratio")),
+}
+
+AGGREGATE_QUERIES = {
+    "total-units": Query(queries_aggregate.get_total_housing_units_by_year, ("year",), ("total_units",)),
+    "avg-waiting-list": Query(queries_aggregate.get_avg_waiting_list, (), ("avg_households",)),
+    "top": Query(queries_aggregate.get_top_waiting_lists, ("k",), ("area_code", "year", "households_count")),
+    "bottom": Query(queries_aggregate.get_bottom_waiting_lists, ("k",), ("area_code", "year", "households_count")),
+    "max": Query(queries_aggregate.get_max_waiting_list, (), ("area_code", "year", "households_count")),
+    "min": Query(queries_aggregate.get_min_waiting_list, (), ("area_code", "year", "households_count")),
+    "stats": Query(queries_aggregate.get_housing_units_statistics, (),
+                   ("total_units", "avg_units", "min_units", "max_units")),
+}
+
+
+# Step 3: Write operations
+# Each operation takes the fields of its rows and applies a whole run of rows at once,
+# through the bulk helpers where there is one, and returns the rows it changed
+Operation = namedtuple("Operation", ["fields", "apply"])
+
+
+def insert_many(func):
+    return lambda cursor, rows, options: sum(func(cursor, rows, on_conflict=options.on_conflict))
+
+
+def update_many(func):
+    return lambda cursor, rows, options: func(cursor, rows)["changed"]
+
+
+def purge_many(func):
+    return lambda cursor, rows, options: sum(func(cursor, rows).values())
+
+
+def delete_many(name):
+    return lambda cursor, rows, options: queries_delete.execute_delete_many(cursor, statements.get(name), rows)
+
+
+OPERATIONS = {
+    "insert": {
+        "area": Operation(("area_code", "area_name"), insert_many(queries_insert.insert_new_areas_many)),
+        "year": Operation(("year",), insert_many(queries_insert.insert_new_years_many)),
+        "housing": Operation(("area_code", "year", "housing_units"),
+                             insert_many(queries_insert.insert_housing_data_many)),
+        "waiting-list": Operation(("area_code", "year", "households_count"),
+                                  insert_many(queries_insert.insert_waiting_list_data_many)),
+    },
+    "update": {
+        "area-name": Operation(("area_code", "area_name"), update_many(queries_update.update_area_names)),
+        "housing": Operation(("area_code", "year", "housing_units"),
+                             update_many(queries_update.update_housing_units)),
+        "waiting-list": Operation(("area_code", "year", "households_count"),
+                                  update_many(queries_update.update_waiting_list_counts)),
+    },
+    "delete": {
+        "area": Operation(("area_code",), purge_many(queries_delete.purge_areas)),
+        "year": Operation(("year",), purge_many(queries_delete.purge_years)),
+        "housing-by-area": Operation(("area_code",), delete_many("delete.Affordable_Housing_Data.by_area_code")),
+        "waiting-list-by-year": Operation(("year",), delete_many("delete.Waiting_List_Data.by_year")),
+    },
+}
+
+
+# Step 4: Input
+def parse_value(field, value):
+    """Convert one input value: integers for INTEGER_FIELDS, None for empty values."""
+    if value is None or value == "":
+        return None
+    if field in INTEGER_FIELDS and not isinstance(value, int):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} must be an integer, got {value!r}") from None
+    return value
+
+
+def to_row(record, fields, line=None):
+    """Build the parameter tuple of one input record, naming its line (if any) on errors."""
+    prefix = "" if line is None else f"line {line}: "
+    try:
+        return tuple(parse_value(field, record[field]) for field in fields)
+    except KeyError as e:
+        raise ValueError(f"{prefix}missing field {e.args[0]!r}") from None
+    except ValueError as e:
+        raise ValueError(f"{prefix}{e}") from None
+
+
+def read_records(source, input_format):
+    """
+    Yield (line number, record dict) from an NDJSON or CSV stream, one at a time,
+    so input of any size is never held in memory.
+    """
+    if input_format == "csv":
+        reader = csv.DictReader(source)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line, text in enumerate(source, 1):
+        if text.strip():
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"line {line}: invalid JSON ({e.msg})") from None
+
+
+@contextlib.contextmanager
+def open_input(path, input_format, stdin):
+    """Open an input file ("-" for stdin) and work out its format."""
+    if path == "-":
+        yield stdin, input_format or "ndjson"
+        return
+    path = Path(path)
+    input_format = input_format or INPUT_FORMATS.get(path.suffix.lower())
+    if input_format is None:
+        raise ValueError(f"cannot tell the format of {path}, use --input-format")
+    with open(path, newline="", encoding="utf-8") as source:
+        yield source, input_format
+
+
+# Step 5: Output
+@contextlib.contextmanager
+def open_output(path, stdout):
+    """
+    Open the output stream with a large buffer, so rows are written out in blocks
+    rather than line by line, and flush it at the end.
+    """
+    if path is not None:
+        with open(path, "w", newline="", encoding="utf-8", buffering=OUTPUT_BUFFER) as out:
+            yield out
+        return
+    if getattr(stdout, "buffer", None) is None:
+        # An in-memory stream (tests) has no byte buffer to wrap
+        yield stdout
+        return
+    # sys.stdout flushes every line on a terminal; write through a block-buffered wrapper instead
+    stdout.flush()
+    out = io.TextIOWrapper(stdout.buffer, encoding=stdout.encoding or "utf-8", newline="")
+    try:
+        yield out
+    finally:
+        out.detach().flush()
+
+
+def write_rows(out, output_format, columns, rows):
+    """
+    Write rows as CSV (with a header) or as one JSON object per line, consuming
+    `rows` lazily so streamed results stay streamed.
+    """
+    if output_format == "csv":
+        writer = csv.writer(out, lineterminator="\n")
+        writer.writerow(columns)
+        writer.writerows(rows)
+    else:
+        out.writelines(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows)
+
+
+# Step 6: Commands
+def run_query(conn, query, args, out):
+    """Run a select or aggregate query and write its rows."""
+    if len(args.values) != len(query.params):
+        raise ValueError(f"expected {len(query.params)} value(s): {' '.join(query.params) or '(none)'}")
+    params = [parse_value(field, value) for field, value in zip(query.params, args.values)]
+    options = {}
+    if args.command == "select":
+        # Rows are written as they are fetched
+        options["stream"] = True
+    elif args.year is not None or args.per_year:
+        if args.query not in ("top", "bottom"):
+            raise ValueError("--year and --per-year only apply to top and bottom")
+        options = {"year": args.year, "per_year": args.per_year}
+    rows = query.func(conn.cursor(), *params, **options)
+    if rows is None:
+        raise sqlite3.OperationalError("the query failed (see the message above)")
+    write_rows(out, args.format, query.columns, rows)
+
+
+def iter_operations(args, stdin):
+    """
+    Yield (command, op, rows) runs to apply, from the command line or from input files.
+    Batch files are split into runs of consecutive records with the same command and op.
+    """
+    if args.command != "batch":
+        operation = OPERATIONS[args.command][args.op]
+        if args.file is None:
+            if len(args.values) != len(operation.fields):
+                raise ValueError(f"expected {len(operation.fields)} value(s): {' '.join(operation.fields)}")
+            yield args.command, args.op, [to_row(dict(zip(operation.fields, args.values)), operation.fields)]
+            return
+        with open_input(args.file, args.input_format, stdin) as (source, input_format):
+            records = read_records(source, input_format)
+            yield args.command, args.op, (to_row(record, operation.fields, line) for line, record in records)
+        return
+
+    with open_input(args.file, args.input_format, stdin) as (source, input_format):
+        records = read_records(source, input_format)
+        for (command, op), run in itertools.groupby(records, key=lambda item: (item[1].get("command"),
+                                                                                 item[1].get("op"))):
+            operation = OPERATIONS.get(command, {}).get(op)
+            if operation is None:
+                line = next(run)[0]
+                raise ValueError(f"line {line}: unknown operation {command!r} {op!r}")
+            yield command, op, (to_row(record, operation.fields, line) for line, record in run)
+
+
+def run_writes(conn, args, stdin, out):
+    """
+    Apply every operation inside one transaction: all of them are committed, or none.
+    Writes one summary row per run of operations.
+    """
+    cursor = conn.cursor()
+    summary = []
+    # The write helpers print their outcome on every call: discard it rather than keep it all
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull), connection.transaction(conn):
+        for command, op, rows in iter_operations(args, stdin):
+            changed = OPERATIONS[command][op].apply(cursor, rows, args)
+            summary.append((command, op, changed))
+    write_rows(out, args.format, ("command", "op", "rows"), summary)
+
+
+def run_etl(args, out):
+    """Rebuild the database from the source files (coursework1/etl.py)."""
+    counts = etl.run_etl(args.db, args.affordable or etl.affordable_csv_path,
+                         args.waiting_list or etl.waiting_list_xlsx_path, args.chunk_size, workers=args.workers)
+    write_rows(out, args.format, ("table", "rows"), counts.items())
+
+
+# Step 7: Command line
+def add_write_arguments(parser, operations):
+    parser.add_argument("op", choices=operations, help="what to write")
+    parser.add_argument("values", nargs="*", help="field values for a single operation")
+    parser.add_argument("--file", "-f", help="NDJSON or CSV file of rows (- for stdin)")
+    parser.add_argument("--input-format", choices=("ndjson", "csv"), help="format of --file")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="housing", description="Query and edit the local authority housing database without prompts")
+    parser.add_argument("--db", type=Path, default=connection.db_path, help="database file")
+    parser.add_argument("--format", choices=("csv", "json"), default="csv",
+                        help="output format: CSV with a header, or one JSON object per line")
+    parser.add_argument("--output", "-o", type=Path, help="write to this file instead of stdout")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    select = commands.add_parser("select", help="run a select query, streaming its rows")
+    select.add_argument("query", choices=SELECT_QUERIES)
+    select.add_argument("values", nargs="*", help="query parameters")
+
+    aggregate = commands.add_parser("aggregate", help="run an aggregate query")
+    aggregate.add_argument("query", choices=AGGREGATE_QUERIES)
+    aggregate.add_argument("values", nargs="*", help="query parameters")
+    aggregate.add_argument("--year", type=int, help="top/bottom: rank one year only")
+    aggregate.add_argument("--per-year", action="store_true", help="top/bottom: rank every year separately")
+
+    insert = commands.add_parser("insert", help="insert rows")
+    add_write_arguments(insert, OPERATIONS["insert"])
+    insert.add_argument("--on-conflict", choices=queries_insert.ON_CONFLICT_MODES, default="error",
+                        help="rows whose key already exists: fail, skip or overwrite")
+    add_write_arguments(commands.add_parser("update", help="update rows"), OPERATIONS["update"])
+    add_write_arguments(commands.add_parser("delete", help="delete rows"), OPERATIONS["delete"])
+
+    batch = commands.add_parser("batch", help="apply a file of mixed operations in one transaction")
+    batch.add_argument("file", help='NDJSON or CSV file (- for stdin); each record has "command", "op" '
+                                    "and the fields of that operation")
+    batch.add_argument("--input-format", choices=("ndjson", "csv"), help="format of the file")
+    batch.add_argument("--on-conflict", choices=queries_insert.ON_CONFLICT_MODES, default="error",
+                       help="inserts whose key already exists: fail, skip or overwrite")
+
+    rebuild = commands.add_parser("etl", help="rebuild the database from the source files")
+    rebuild.add_argument("--affordable", type=Path, nargs="+", help="affordable housing CSV or workbooks")
+    rebuild.add_argument("--waiting-list", type=Path, nargs="+", help="waiting list workbooks")
+    rebuild.add_argument("--chunk-size", type=int, default=etl.CHUNK_SIZE, help="rows per insert batch")
+    rebuild.add_argument("--workers", type=int, help="parse worker processes")
+    return parser
+
+
+def main(argv=None, stdin=None, stdout=None):
+    """
+    Entry point of the `housing` command.
+    :return: Exit status: 0 on success, 1 if the command failed (writes are rolled back)
+    """
+    args = build_parser().parse_args(argv)
+    stdin = sys.stdin if stdin is None else stdin
+    stdout = sys.stdout if stdout is None else stdout
+    conn = None
+    try:
+        with open_output(args.output, stdout) as out:
+            if args.command == "etl":
+                run_etl(args, out)
+                return 0
+            if not args.db.exists():
+                raise ValueError(f"database not found: {args.db}")
+            read_only = args.command in ("select", "aggregate")
+            conn = connection.get_pool(args.db, read_only=read_only).acquire()
+            if read_only:
+                queries = SELECT_QUERIES if args.command == "select" else AGGREGATE_QUERIES
+                run_query(conn, queries[args.query], args, out)
+            else:
+                run_writes(conn, args, stdin, out)
+        return 0
+    except (ValueError, OSError, sqlite3.Error) as e:
+        rolled_back = " (nothing was written)" if args.command not in ("select", "aggregate") else ""
+        print(f"housing {args.command}: {e}{rolled_back}", file=sys.stderr)
+        return 1
+    finally:
+        if conn is not None:
+            conn.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from coursework2 import statements
+
+
+# Step 1: Define the database path
+base_dir = Path(__file__).resolve().parent
+db_path = base_dir.parent / "coursework1" / "database" / "local_authority_housing.db"
+
+# Connections kept per pool
+POOL_SIZE = 4
+
+# Per-connection setup, run once when a pooled connection is opened.
+# WAL lets readers carry on while a writer commits; it is a property of the
+# database file, so only read-write connections set it.
+WRITE_PRAGMAS = [
+    "PRAGMA journal_mode = WAL;",
+    "PRAGMA synchronous = NORMAL;",
+]
+COMMON_PRAGMAS = [
+    "PRAGMA foreign_keys = ON;",
+    "PRAGMA mmap_size = 268435456;",  # 256 MiB
+    "PRAGMA cache_size = -16384;",    # 16 MiB
+    "PRAGMA temp_store = MEMORY;",
+    # INSERT OR REPLACE only fires the delete triggers that maintain the
+    # derived tables (Area_Year_Facts, Fact_Rollup) with recursive triggers on
+    "PRAGMA recursive_triggers = ON;",
+]
+
+
+# Step 2: Pooled connections
+class PooledConnection(sqlite3.Connection):
+    """SQLite connection whose close() hands it back to its pool instead of closing it."""
+
+    pool = None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of SQLite connections to one database file.
+    Connections are opened lazily, up to `size`, and configured once when opened.
+    The first connection also checks the registered statements against the schema
+    (see coursework2/statements.py); a mismatch fails it with StatementError.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE, read_only=False, timeout=30.0):
+        """
+        :param db_path: Path to the SQLite database
+        :param size: Maximum number of open connections
+        :param read_only: Open connections with a mode=ro URI
+        :param timeout: Seconds to wait for a free connection (and for SQLite locks)
+        """
+        self.db_path = Path(db_path)
+        self.size = size
+        self.read_only = read_only
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        self._validated = False
+
+    def _connect(self):
+        """Open and configure a new connection."""
+        if self.read_only:
+            uri = self.db_path.resolve().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=self.timeout, factory=PooledConnection,
+                                   check_same_thread=False, cached_statements=statements.STATEMENT_CACHE_SIZE)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, factory=PooledConnection,
+                                   check_same_thread=False, cached_statements=statements.STATEMENT_CACHE_SIZE)
+        try:
+            pragmas = COMMON_PRAGMAS if self.read_only else WRITE_PRAGMAS + COMMON_PRAGMAS
+            for pragma in pragmas:
+                conn.execute(pragma)
+            if not self._validated:
+                statements.validate(conn)
+                self._validated = True
+        except sqlite3.Error:
+            conn.close()
+            raise
+        conn.pool = self
+        return conn
+
+    def acquire(self):
+        """
+        Borrow a connection, opening a new one if the pool is not yet full.
+        :return: PooledConnection; call close() or release() to give it back
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            can_open = self._opened < self.size
+            if can_open:
+                self._opened += 1
+        if can_open:
+            try:
+                return self._connect()
+            except sqlite3.Error:
+                with self._lock:
+                    self._opened -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"No connection available from the pool within {self.timeout} seconds"
+            ) from None
+
+    def release(self, conn):
+        """Return a borrowed connection, rolling back anything left uncommitted."""
+        if conn.in_transaction:
+            conn.rollback()
+        if self._closed:
+            self._discard(conn)
+        else:
+            self._idle.put(conn)
+
+    def _discard(self, conn):
+        conn.pool = None
+        conn.close()
+        with self._lock:
+            self._opened -= 1
+
+    @contextmanager
+    def connection(self):
+        """Context manager that borrows a connection and always gives it back."""
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """Close the idle connections; borrowed ones are closed when released."""
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+# Step 3: Shared pools, one per database file and access mode
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_path=db_path, read_only=False):
+    """
+    Return the shared pool for a database file, creating it on first use.
+    :param db_path: Path to the SQLite database
+    :param read_only: Whether to use the read-only pool
+    """
+    key = (str(Path(db_path).resolve()), read_only)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool._closed:
+            pool = _pools[key] = ConnectionPool(db_path, read_only=read_only)
+        return pool
+
+
+def close_all_pools():
+    """Close every shared pool."""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
+
+
+def get_db_connection(db_path=db_path, read_only=False):
+    """
+    Borrow a connection to the SQLite database from the shared pool.
+    Calling conn.close() hands the connection back to the pool.
+    :param db_path: Path to the SQLite database
+    :param read_only: Use the read-only pool (for SELECT-only callers)
+    :return: (connection, cursor), or (None, None) if the connection failed
+    """
+    try:
+        conn = get_pool(db_path, read_only).acquire()
+        return conn, conn.cursor()
+    except sqlite3.Error as e:
+        print(f"An error occurred while connecting to the database: {e}")
+        return None, None
+
+
+# Step 4: Transactions shared by the insert, update and delete helpers
+# Nesting depth of transaction() per connection, keyed by id(connection)
+_transaction_depth = {}
+
+
+def in_transaction_scope(conn):
+    """Return True while a transaction() block is open on this connection."""
+    return _transaction_depth.get(id(conn), 0) > 0
+
+
+@contextmanager
+def transaction(conn):
+    """
+    Group several writes into one atomic unit with a single commit.
+    The outermost block runs BEGIN ... COMMIT; nested blocks become savepoints,
+    so an inner failure can be rolled back without losing the outer work.
+    The execute_*_query helpers detect an open block and leave committing to it.
+    :param conn: SQLite connection or cursor
+    :return: The connection
+    """
+    conn = getattr(conn, "connection", conn)
+    key = id(conn)
+    depth = _transaction_depth.get(key, 0)
+    savepoint = f"unit_of_work_{depth}"
+    if depth == 0:
+        if not conn.in_transaction:
+            conn.execute("BEGIN;")
+    else:
+        conn.execute(f"SAVEPOINT {savepoint};")
+    _transaction_depth[key] = depth + 1
+    try:
+        yield conn
+    except BaseException:
+        if depth == 0:
+            conn.rollback()
+        else:
+            conn.execute(f"ROLLBACK TO {savepoint};")
+            conn.execute(f"RELEASE {savepoint};")
+        raise
+    else:
+        if depth == 0:
+            conn.commit()
+        else:
+            conn.execute(f"RELEASE {savepoint};")
+    finally:
+        if depth == 0:
+            _transaction_depth.pop(key, None)
+        else:
+            _transaction_depth[key] = depth
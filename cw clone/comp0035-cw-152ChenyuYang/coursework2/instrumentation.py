@@ -0,0 +1,238 @@
+import atexit
+import bisect
+import functools
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import deque, namedtuple
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+# Step 1: Settings
+# Statements taking at least this many seconds have their plan logged (None disables)
+SLOW_QUERY_SECONDS = 0.1
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+# Slow queries kept for get_slow_queries()
+SLOW_QUERY_LOG_SIZE = 100
+
+# Prefix of every exported metric
+METRIC_PREFIX = "housing_query"
+
+# One executed statement, as passed to the hooks
+QueryEvent = namedtuple("QueryEvent", ["kind", "fingerprint", "sql", "params", "seconds", "rows", "error"])
+
+# A statement over the slow-query threshold and its EXPLAIN QUERY PLAN lines
+SlowQuery = namedtuple("SlowQuery", ["event", "plan"])
+
+
+# Step 2: SQL fingerprints
+# Literals become ?, lists of placeholders become (...), whitespace and comments collapse,
+# so every call of a statement shape shares one fingerprint whatever its parameters
+FINGERPRINT_RULES = [
+    (re.compile(r"--[^\n]*"), " "),
+    (re.compile(r"/\*.*?\*/", re.DOTALL), " "),
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql):
+    """Return the normalized form of a statement, used to group its metrics."""
+    for pattern, replacement in FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip().rstrip(";").strip()
+
+
+# Step 3: Metrics, hooks and the slow-query log
+class QueryMetrics:
+    """Counters and a latency histogram per (kind, fingerprint), safe to update from any thread."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}  # (kind, fingerprint) -> dict of counters
+        self.slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+    def add(self, event, slow):
+        with self._lock:
+            series = self._series.get((event.kind, event.fingerprint))
+            if series is None:
+                series = self._series[(event.kind, event.fingerprint)] = {
+                    "count": 0, "seconds": 0.0, "rows": 0, "errors": 0, "slow": 0,
+                    # Per bucket, not cumulative; the last one is +Inf
+                    "buckets": [0] * (len(LATENCY_BUCKETS) + 1),
+                }
+            series["count"] += 1
+            series["seconds"] += event.seconds
+            series["rows"] += event.rows or 0
+            series["errors"] += event.error is not None
+            series["slow"] += slow
+            series["buckets"][bisect.bisect_left(LATENCY_BUCKETS, event.seconds)] += 1
+
+    def snapshot(self):
+        """Return a copy of every series: {(kind, fingerprint): counters}."""
+        with self._lock:
+            return {key: dict(series, buckets=list(series["buckets"])) for key, series in self._series.items()}
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+            self.slow_queries.clear()
+
+
+_metrics = QueryMetrics()
+_hooks = []
+
+
+def add_hook(hook):
+    """Call hook(QueryEvent) after every instrumented statement."""
+    if hook not in _hooks:
+        _hooks.append(hook)
+
+
+def remove_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def set_slow_query_threshold(seconds):
+    """Log the plan of statements taking at least `seconds` (None to stop)."""
+    global SLOW_QUERY_SECONDS
+    SLOW_QUERY_SECONDS = seconds
+
+
+def explain(conn, sql, params):
+    """Return the EXPLAIN QUERY PLAN lines of a statement, or [] if it cannot be explained."""
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", params or ()).fetchall()
+    except sqlite3.Error:
+        return []
+    return [row[3] for row in rows]
+
+
+def record(cursor, event):
+    """Add an event to the metrics, explain it if it was slow, then run the hooks."""
+    slow = (SLOW_QUERY_SECONDS is not None and event.error is None
+            and event.seconds >= SLOW_QUERY_SECONDS)
+    _metrics.add(event, slow)
+    if slow:
+        plan = explain(cursor.connection, event.sql, event.params)
+        _metrics.slow_queries.append(SlowQuery(event, plan))
+        logger.warning("Slow %s query (%.1f ms, %s rows): %s\n  %s", event.kind, event.seconds * 1000,
+                       event.rows, event.fingerprint, "\n  ".join(plan) or "(no plan)")
+    for hook in list(_hooks):
+        try:
+            hook(event)
+        except Exception:
+            # A broken hook must not fail the query it observes
+            logger.exception("Instrumentation hook %r failed", hook)
+
+
+class track:
+    """
+    Context manager timing the statement run inside the block and recording it
+    under `kind` ("select", "aggregate", "insert", ...). Errors are recorded and
+    re-raised. Set .rows on the object it returns to the rows returned or affected.
+    A class rather than a generator, as it wraps every statement.
+    :param cursor: SQLite cursor running the statement
+    :param sql: The SQL query string
+    :param params: Its parameters, used to explain it if it is slow
+    """
+
+    __slots__ = ("cursor", "kind", "sql", "params", "rows", "start")
+
+    def __init__(self, cursor, kind, sql, params=None):
+        self.cursor = cursor
+        self.kind = kind
+        self.sql = sql
+        self.params = params
+        self.rows = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        seconds = time.perf_counter() - self.start
+        record(self.cursor, QueryEvent(self.kind, fingerprint(self.sql), self.sql, self.params, seconds,
+                                       self.rows, None if exc is None else repr(exc)))
+        return False
+
+
+def get_metrics():
+    """Return the counters of every (kind, fingerprint) seen so far."""
+    return _metrics.snapshot()
+
+
+def get_slow_queries():
+    """Return the most recent slow queries (SlowQuery tuples), oldest first."""
+    return list(_metrics.slow_queries)
+
+
+def reset_metrics():
+    """Forget every counter and slow query."""
+    _metrics.reset()
+
+
+# Step 4: Prometheus text export
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_prometheus(snapshot=None):
+    """Render the metrics in the Prometheus text exposition format."""
+    snapshot = get_metrics() if snapshot is None else snapshot
+    counters = [
+        ("total", "count", "Statements executed."),
+        ("rows_total", "rows", "Rows returned or affected."),
+        ("errors_total", "errors", "Statements that raised an error."),
+        ("slow_total", "slow", "Statements over the slow-query threshold."),
+    ]
+    lines = []
+    series = sorted(snapshot.items())
+    for suffix, field, description in counters:
+        name = f"{METRIC_PREFIX}_{suffix}"
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+        for (kind, sql), values in series:
+            lines.append(f'{name}{{kind="{kind}",fingerprint="{escape_label(sql)}"}} {values[field]}')
+
+    name = f"{METRIC_PREFIX}_duration_seconds"
+    lines += [f"# HELP {name} Statement latency.", f"# TYPE {name} histogram"]
+    for (kind, sql), values in series:
+        labels = f'kind="{kind}",fingerprint="{escape_label(sql)}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, values["buckets"]):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {values["count"]}')
+        lines.append(f"{name}_sum{{{labels}}} {values['seconds']:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {values['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def export_prometheus(path):
+    """
+    Write the metrics to a file, e.g. for node_exporter's textfile collector.
+    The file is replaced atomically, so a scrape never sees half of it.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    temp_path.write_text(format_prometheus())
+    os.replace(temp_path, path)
+    return path
+
+
+def export_on_exit(path):
+    """Write the metrics to `path` when the process exits."""
+    atexit.register(export_prometheus, path)
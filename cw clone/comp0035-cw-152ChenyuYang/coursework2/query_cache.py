@@ -0,0 +1,191 @@
+import functools
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from coursework2 import results
+
+
+# Step 1: Cache settings
+# Results kept, and seconds before a cached result is re-queried regardless
+CACHE_SIZE = 512
+CACHE_TTL = 300.0
+
+# Connections whose PRAGMA data_version is tracked
+TRACKED_CONNECTIONS = 64
+
+# Deleting a parent row cascades to the fact tables
+CASCADES = {
+    "Area": ("Affordable_Housing_Data", "Waiting_List_Data"),
+    "Year": ("Affordable_Housing_Data", "Waiting_List_Data"),
+}
+
+# Target table of an INSERT, REPLACE, UPDATE or DELETE statement
+WRITE_TARGET = re.compile(
+    r"^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+(\w+)",
+    re.IGNORECASE,
+)
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
+
+# Step 2: Read-through result cache
+class QueryCache:
+    """
+    LRU cache of SELECT results keyed by (database file, function, params).
+    An entry is served only while it is younger than `ttl` and no table it reads
+    has been written since. Writes are detected two ways:
+    - the insert, update and delete helpers bump a generation counter for each
+      table they write (invalidate_tables / invalidate_sql);
+    - PRAGMA data_version, checked on every lookup, changes when another
+      connection or process commits, which invalidates the whole database file;
+    - conn.total_changes, also checked on every lookup, grows when the same
+      connection writes without the helpers (a raw cursor.execute), which
+      invalidates the whole database file as well.
+    In-memory databases are never cached.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._generations = {}   # (db file, table) -> generation
+        self._epochs = {}        # db file -> generation bumped by unknown writes
+        # id(connection) -> (connection, db file, data_version, total_changes); the
+        # connection is held so its id cannot be reused by another connection while tracked
+        self._connections = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _check_connection(self, conn, written=False):
+        """
+        Return the database file of a connection ('' for in-memory databases),
+        bumping its epoch if the data changed since this connection last looked.
+        :param written: The caller is a helper invalidating its own write, which
+                        bumps the table generations, so its row changes are not
+                        treated as an unknown write
+        """
+        version = conn.execute("PRAGMA data_version;").fetchone()[0]
+        changes = conn.total_changes
+        with self._lock:
+            tracked = self._connections.get(id(conn))
+            if tracked is None:
+                db_file = conn.execute("PRAGMA database_list;").fetchone()[2]
+            else:
+                db_file = tracked[1]
+            # A connection seen for the first time has no baseline, so assume a change
+            if tracked is None or tracked[2] != version or (tracked[3] != changes and not written):
+                self._epochs[db_file] = self._epochs.get(db_file, 0) + 1
+            self._connections[id(conn)] = (conn, db_file, version, changes)
+            self._connections.move_to_end(id(conn))
+            while len(self._connections) > TRACKED_CONNECTIONS:
+                self._connections.popitem(last=False)
+        return db_file
+
+    def _stamp(self, db_file, tables):
+        return (self._epochs.get(db_file, 0),
+                tuple(self._generations.get((db_file, table), 0) for table in tables))
+
+    def call(self, cursor, func, tables, args, kwargs=None):
+        """
+        Return func(cursor, *args, **kwargs), from the cache when the stored result is
+        still valid. Failed queries (None) and results read inside an open transaction
+        are not cached. Row lists, DataFrames and
+        array dicts are copied in and out, so callers cannot alter a cached result.
+        """
+        kwargs = kwargs or {}
+        db_file = self._check_connection(cursor.connection)
+        if not db_file:
+            return func(cursor, *args, **kwargs)
+
+        key = (db_file, func.__qualname__, args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+        with self._lock:
+            stamp = self._stamp(db_file, tables)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == stamp and entry[2] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return results.copy_result(entry[0])
+            self.misses += 1
+
+        result = func(cursor, *args, **kwargs)
+        # A result read inside an open transaction may hold uncommitted rows, which a
+        # rollback would take back, and other connections must not see
+        if result is not None and not cursor.connection.in_transaction:
+            with self._lock:
+                # Only store the result if nothing was written while it was queried
+                if self._stamp(db_file, tables) == stamp:
+                    self._entries[key] = (results.copy_result(result), stamp, now + self.ttl)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, conn, tables):
+        """Bump the generation of every table written, including cascaded ones."""
+        db_file = self._check_connection(conn, written=True)
+        with self._lock:
+            for table in tables:
+                for name in (table,) + CASCADES.get(table, ()):
+                    key = (db_file, name)
+                    self._generations[key] = self._generations.get(key, 0) + 1
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def clear(self):
+        """Drop every cached result and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+# Step 3: Shared cache used by the section3 modules
+_cache = QueryCache()
+
+
+def cached_query(*tables):
+    """
+    Decorator for SELECT functions taking (cursor, *params, **options) and reading `tables`.
+    Keyword options (as_frame, as_arrays, after, ...) are part of the cache key.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(cursor, *args, **kwargs):
+            if kwargs.get("stream"):
+                # An iterator can only be consumed once, so streamed results are never cached
+                return func(cursor, *args, **kwargs)
+            return _cache.call(cursor, func, tables, args, kwargs)
+        wrapper.tables = tables
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def invalidate_tables(cursor, *tables):
+    """
+    Invalidate cached results that read any of `tables`.
+    :param cursor: SQLite cursor or connection that wrote the tables
+    """
+    _cache.invalidate(getattr(cursor, "connection", cursor), tables)
+
+
+def invalidate_sql(cursor, sql):
+    """Invalidate the table written by an INSERT, UPDATE or DELETE statement."""
+    match = WRITE_TARGET.match(sql)
+    if match:
+        invalidate_tables(cursor, match.group(1))
+
+
+def cache_info():
+    """Return the hit and miss counters and the size of the shared cache."""
+    return _cache.info()
+
+
+def cache_clear():
+    """Empty the shared cache."""
+    _cache.clear()
@@ -0,0 +1,190 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+
+# Step 1: Column types
+# Rows fetched per cursor.fetchmany call when filling column arrays
+FETCH_BATCH = 1024
+
+# Known result columns -> dtype; "category" columns are stored as int32 codes
+COLUMN_DTYPES = {
+    "area_code": "category",
+    "area_name": "category",
+    "year": "int32",
+    "housing_units": "int64",
+    "households_count": "int64",
+}
+
+
+# Step 2: Growable typed column buffers
+class ColumnBuffer:
+    """
+    One result column, filled batch by batch into a preallocated NumPy array that
+    doubles when full. Categorical columns keep int32 codes and a category list.
+    A column whose type is not known up front takes it from its first value.
+    """
+
+    def __init__(self, name, capacity=FETCH_BATCH):
+        self.name = name
+        self.dtype = COLUMN_DTYPES.get(name)
+        self.capacity = capacity
+        self.length = 0
+        self.data = None
+        self.categories = {}
+
+    def _infer_dtype(self, values):
+        for value in values:
+            if value is None:
+                continue
+            if isinstance(value, int):
+                return "int64"
+            if isinstance(value, float):
+                return "float64"
+            return "category" if isinstance(value, str) else "object"
+        return None
+
+    def _allocate(self):
+        numpy_dtype = "int32" if self.dtype == "category" else self.dtype
+        self.data = np.empty(self.capacity, dtype=numpy_dtype)
+
+    def _reserve(self, count):
+        if self.length + count > self.capacity:
+            while self.length + count > self.capacity:
+                self.capacity *= 2
+            grown = np.empty(self.capacity, dtype=self.data.dtype)
+            grown[:self.length] = self.data[:self.length]
+            self.data = grown
+
+    def _widen_to_float(self):
+        """Switch an integer column to float64, for NULLs (NaN) or REAL values."""
+        self.dtype = "float64"
+        self.data = self.data.astype("float64")
+
+    def _widen_to_object(self):
+        """Keep a column of mixed values as Python objects."""
+        self.dtype = "object"
+        self.data = self.data.astype(object)
+
+    def extend(self, values):
+        """Append one batch of values (a tuple from zip(*rows))."""
+        if self.dtype is None:
+            self.dtype = self._infer_dtype(values)
+            if self.dtype is None:
+                # All missing so far: keep a float column of NaN
+                self.dtype = "float64"
+        if self.data is None:
+            self._allocate()
+        self._reserve(len(values))
+        end = self.length + len(values)
+        if self.dtype == "category":
+            codes = self.categories
+            self.data[self.length:end] = [-1 if value is None else codes.setdefault(value, len(codes))
+                                          for value in values]
+        elif self.dtype == "object":
+            self.data[self.length:end] = values
+        else:
+            batch = np.array(values)
+            if batch.dtype.kind not in "iuf":
+                # NULLs (or stray text) in a numeric column
+                try:
+                    batch = np.array(values, dtype="float64")
+                except (TypeError, ValueError):
+                    self._widen_to_object()
+                    batch = np.array(values, dtype=object)
+            if batch.dtype.kind == "f" and self.data.dtype.kind in "iu":
+                self._widen_to_float()
+            self.data[self.length:end] = batch
+        self.length = end
+
+    def to_array(self):
+        """Return the filled part as a NumPy array, or a pandas Categorical."""
+        if self.data is None:
+            dtype = self.dtype or "float64"
+            if dtype == "category":
+                return pd.Categorical([])
+            return np.empty(0, dtype=dtype)
+        data = self.data[:self.length]
+        if self.dtype == "category":
+            return pd.Categorical.from_codes(data, categories=list(self.categories))
+        return data
+
+
+# Step 3: Fetch a result set column by column
+def fetch_arrays(cursor, arraysize=FETCH_BATCH):
+    """
+    Read the rest of an executed query into typed column arrays, arraysize rows at a time.
+    :param cursor: SQLite cursor after execute()
+    :param arraysize: Rows per fetchmany call
+    :return: Dict of column name -> NumPy array (pandas Categorical for text columns)
+    """
+    columns = [ColumnBuffer(description[0]) for description in cursor.description]
+    while True:
+        batch = cursor.fetchmany(arraysize)
+        if not batch:
+            break
+        for column, values in zip(columns, zip(*batch)):
+            column.extend(values)
+    return {column.name: column.to_array() for column in columns}
+
+
+def fetch_result(cursor, as_frame=False, as_arrays=False):
+    """
+    Return the rows of an executed query in the requested form.
+    :param as_frame: Return a DataFrame with typed columns
+    :param as_arrays: Return a dict of typed column arrays
+    :return: List of tuples (the default), DataFrame or dict of arrays
+    """
+    if as_frame or as_arrays:
+        arrays = fetch_arrays(cursor)
+        return pd.DataFrame(arrays, copy=False) if as_frame else arrays
+    return cursor.fetchall()
+
+
+def empty_result(columns, as_frame=False, as_arrays=False):
+    """
+    Return a result without rows in the requested form, typed as fetch_result would type it.
+    :param columns: Column names of the result
+    :return: Empty list, DataFrame or dict of arrays
+    """
+    if as_frame or as_arrays:
+        arrays = {name: ColumnBuffer(name).to_array() for name in columns}
+        return pd.DataFrame(arrays, copy=False) if as_frame else arrays
+    return []
+
+
+def iter_rows(cursor, arraysize=FETCH_BATCH):
+    """
+    Yield the rows of an executed query, fetching arraysize rows at a time, so only
+    one batch is held in memory. The cursor is closed when the rows run out.
+    """
+    cursor.arraysize = arraysize
+    try:
+        while True:
+            batch = cursor.fetchmany()
+            if not batch:
+                break
+            yield from batch
+    except sqlite3.Error as e:
+        print(f"An error occurred while streaming: {e}")
+    finally:
+        cursor.close()
+
+
+def count_rows(result):
+    """Rows in a result: list, DataFrame or dict of arrays (None counts as 0)."""
+    if result is None:
+        return 0
+    if isinstance(result, dict):
+        return len(next(iter(result.values()), ()))
+    return len(result)
+
+
+def copy_result(result):
+    """Copy a result so a cached value cannot be changed by its caller."""
+    if isinstance(result, pd.DataFrame):
+        return result.copy()
+    if isinstance(result, dict):
+        return {name: column.copy() for name, column in result.items()}
+    return list(result)
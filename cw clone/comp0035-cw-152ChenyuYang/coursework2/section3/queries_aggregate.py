@@ -1,129 +1,201 @@
-import sqlite3
-from pathlib import Path
-
-
-# Step 1: Define the database path
-base_dir = Path(__file__).resolve().parent
-db_path = base_dir.parents[1] / "coursework1" / "database" / "local_authority_housing.db"
-
-
-# Step 2: Connect to the database
-def get_db_connection(db_path):
-    """Establish connection to the SQLite database."""
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute('PRAGMA foreign_keys = ON;')
-        return conn, cursor
-    except sqlite3.Error as e:
-        print(f"An error occurred: {e}")
-        return None, None
-
-
-# Step 3: Execute aggregate queries
-def execute_aggregate_query(cursor, sql, params=None):
-    """
-    Execute an aggregate query and return the result.
-    :param cursor: SQLite cursor
-    :param sql: The SQL query string
-    :param params: Parameters for the SQL query (optional)
-    :return: Query result
-    """
-    try:
-        if params:
-            cursor.execute(sql, params)
-        else:
-            cursor.execute(sql)
-        return cursor.fetchall()
-    except sqlite3.Error as e:
-        print(f"An error occurred: {e}")
-        return None
-
-
-# Step 4: Define aggregate query functions
-
-# 1. Get the total housing supply for a specific year
-def get_total_housing_units_by_year(cursor, year):
-    sql = """
-    SELECT SUM(housing_units) 
-    FROM Affordable_Housing_Data 
-    WHERE year = ?;
-    """
-    return execute_aggregate_query(cursor, sql, params=(year,))
-
-
-# 2. Get the average waiting list count across all areas
-def get_avg_waiting_list(cursor):
-    sql = "SELECT AVG(households_count) FROM Waiting_List_Data;"
-    return execute_aggregate_query(cursor, sql)
-
-
-# 3. Get the area and year with the highest waiting list count
-def get_max_waiting_list(cursor):
-    sql = """
-    SELECT area_code, year, MAX(households_count) 
-    FROM Waiting_List_Data;
-    """
-    return execute_aggregate_query(cursor, sql)
-
-
-# 4. Get the area and year with the lowest waiting list count
-def get_min_waiting_list(cursor):
-    sql = """
-    SELECT area_code, year, MIN(households_count) 
-    FROM Waiting_List_Data;
-    """
-    return execute_aggregate_query(cursor, sql)
-
-
-# 5. Get statistics for housing supply: total, minimum, maximum, and average
-def get_housing_units_statistics(cursor):
-    sql = """
-    SELECT 
-        SUM(housing_units) AS total_units, 
-        AVG(housing_units) AS avg_units, 
-        MIN(housing_units) AS min_units, 
-        MAX(housing_units) AS max_units 
-    FROM Affordable_Housing_Data;
-    """
-    return execute_aggregate_query(cursor, sql)
-
-
-# Step 5: Main program execution
-if __name__ == "__main__":
-    if not db_path.exists():
-        print(f"Database not found: {db_path}")
-    else:
-        conn, cursor = get_db_connection(db_path)
-
-        try:
-            # 1. Get the total housing supply for a specific year
-            year = int(input("Enter year to calculate total housing units: ").strip())
-            total_units = get_total_housing_units_by_year(cursor, year)
-            print(f"\nTotal housing units for the year {year}: {total_units[0][0]}")
-
-            # 2. Get the average waiting list count across all areas
-            avg_waiting_list = get_avg_waiting_list(cursor)
-            print(f"\nAverage waiting list count: {avg_waiting_list[0][0]:.2f}")
-
-            # 3. Get the area and year with the highest waiting list count
-            max_waiting_list = get_max_waiting_list(cursor)
-            print("\nArea with the highest waiting list:")
-            print(f"Area Code: {max_waiting_list[0][0]}, Year: {max_waiting_list[0][1]}, Households: {max_waiting_list[0][2]}")
-
-            # 4. Get the area and year with the lowest waiting list count
-            min_waiting_list = get_min_waiting_list(cursor)
-            print("\nArea with the lowest waiting list:")
-            print(f"Area Code: {min_waiting_list[0][0]}, Year: {min_waiting_list[0][1]}, Households: {min_waiting_list[0][2]}")
-
-            # 5. Get housing supply statistics
-            housing_stats = get_housing_units_statistics(cursor)
-            print("\nHousing Units Statistics:")
-            print(f"Total Units: {housing_stats[0][0]}, Average Units: {housing_stats[0][1]:.2f}, "
-                  f"Min Units: {housing_stats[0][2]}, Max Units: {housing_stats[0][3]}")
-
-        except ValueError as e:
-            print(f"Invalid input: {e}")
-        finally:
-            # Close the connection
-            conn.close()
+import sqlite3
+import sys
+from pathlib import Path
+
+# Allow running as a script: python coursework2/section3/queries_aggregate.py
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from coursework2 import connection, instrumentation, results, statements
+from coursework2.section3.queries_select import has_table
+
+
+# Step 1: Define the database path
+base_dir = Path(__file__).resolve().parent
+db_path = base_dir.parents[1] / "coursework1" / "database" / "local_authority_housing.db"
+
+
+# Step 2: Connect to the database
+def get_db_connection(db_path):
+    """Borrow a read-only connection from the shared pool; conn.close() hands it back."""
+    return connection.get_db_connection(db_path, read_only=True)
+
+
+# Step 3: Execute aggregate queries
+def execute_aggregate_query(cursor, sql, params=None, as_frame=False, as_arrays=False):
+    """
+    Execute an aggregate query and return the result.
+    :param cursor: SQLite cursor
+    :param sql: The SQL query string
+    :param params: Parameters for the SQL query (optional)
+    :param as_frame: Return a DataFrame with typed columns (see coursework2/results.py)
+    :param as_arrays: Return a dict of typed NumPy column arrays
+    :return: Query result
+    """
+    try:
+        with instrumentation.track(cursor, "aggregate", sql, params) as query:
+            if params:
+                cursor.execute(sql, params)
+            else:
+                cursor.execute(sql)
+            result = results.fetch_result(cursor, as_frame, as_arrays)
+            query.rows = results.count_rows(result)
+        return result
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+        return None
+
+
+# Step 4: Read the precomputed rollups
+# Fact_Rollup (coursework1/database.py) holds SUM/COUNT/MIN/MAX per year, per area
+# and overall; databases built without it fall back to aggregating the fact table
+def read_rollup(cursor, name, params=(), verify=False, as_frame=False, as_arrays=False):
+    """
+    Answer an aggregate from Fact_Rollup, or from the fact table when there is no rollup.
+    :param name: Registered statement reading Fact_Rollup; "<name>.fallback" is the
+                 equivalent aggregate over the fact table (see coursework2/statements.py)
+    :param params: Parameters shared by both queries
+    :param verify: Also recompute from the fact table, report any difference and
+                   return the recomputed result
+    :param as_frame: Return a DataFrame (see execute_aggregate_query)
+    :param as_arrays: Return a dict of NumPy arrays (see execute_aggregate_query)
+    :return: Query result
+    """
+    sql, fallback_sql = statements.get(name), statements.get(f"{name}.fallback")
+    if not has_table(cursor, "Fact_Rollup"):
+        return execute_aggregate_query(cursor, fallback_sql, params, as_frame, as_arrays)
+    if verify:
+        # Compare as rows, then answer from the fact table in the requested form
+        result = execute_aggregate_query(cursor, sql, params)
+        recomputed = execute_aggregate_query(cursor, fallback_sql, params)
+        if recomputed != result:
+            print(f"Rollup mismatch: stored {result}, recomputed {recomputed}")
+        if as_frame or as_arrays:
+            return execute_aggregate_query(cursor, fallback_sql, params, as_frame, as_arrays)
+        return recomputed
+    return execute_aggregate_query(cursor, sql, params, as_frame, as_arrays)
+
+
+def verify_rollups(cursor):
+    """
+    Recompute every Fact_Rollup row from the fact tables, for auditing.
+    :return: List of (table_name, scope, scope_key, stored, recomputed) for the rows
+             that differ; stored/recomputed are (total, row_count, min, max) or None
+    """
+    cursor.execute(statements.get("aggregate.stored_rollups"))
+    stored = {row[:3]: row[3:] for row in cursor.fetchall()}
+    cursor.execute(statements.get("aggregate.recomputed_rollups"))
+    recomputed = {row[:3]: row[3:] for row in cursor.fetchall()}
+    return [(*group, stored.get(group), recomputed.get(group))
+            for group in sorted(stored.keys() | recomputed.keys())
+            if stored.get(group) != recomputed.get(group)]
+
+
+# Step 5: Define aggregate query functions
+
+# 1. Get the total housing supply for a specific year
+def get_total_housing_units_by_year(cursor, year, verify=False, as_frame=False, as_arrays=False):
+    return read_rollup(cursor, "aggregate.total_housing_units_by_year", params=(year,), verify=verify,
+                       as_frame=as_frame, as_arrays=as_arrays)
+
+
+# 2. Get the average waiting list count across all areas
+def get_avg_waiting_list(cursor, verify=False, as_frame=False, as_arrays=False):
+    return read_rollup(cursor, "aggregate.avg_waiting_list", verify=verify, as_frame=as_frame, as_arrays=as_arrays)
+
+
+# 3. Get the k largest or smallest waiting lists, keeping ties with the k-th value
+RANKED_COLUMNS = ("area_code", "year", "households_count")
+
+
+def get_extreme_waiting_lists(cursor, k=1, largest=True, year=None, per_year=False,
+                              as_frame=False, as_arrays=False):
+    """
+    Return the (area_code, year, households_count) rows with the k largest or smallest
+    counts. Rows tied with the k-th count are all returned, so the result can hold
+    more than k rows. The k-th count is found with one seek into the count indexes
+    (idx_waiting_count, idx_waiting_year_count), then only the rows beyond it are read.
+    :param k: Number of rows to rank (before ties)
+    :param largest: True for the top k, False for the bottom k
+    :param year: Only rank the rows of this year
+    :param per_year: Rank every year separately (a leaderboard per year)
+    :return: Query result, ordered by year (for per_year) then by rank
+    """
+    if k < 1:
+        return results.empty_result(RANKED_COLUMNS, as_frame, as_arrays)
+    name = "aggregate.top_waiting_lists" if largest else "aggregate.bottom_waiting_lists"
+    if per_year:
+        return execute_aggregate_query(cursor, statements.get(f"{name}.per_year"), params=(k - 1,),
+                                       as_frame=as_frame, as_arrays=as_arrays)
+    if year is None:
+        return execute_aggregate_query(cursor, statements.get(name), params=(k - 1,),
+                                       as_frame=as_frame, as_arrays=as_arrays)
+    return execute_aggregate_query(cursor, statements.get(f"{name}.year"), params=(year, year, k - 1, year),
+                                   as_frame=as_frame, as_arrays=as_arrays)
+
+
+def get_top_waiting_lists(cursor, k=10, year=None, per_year=False, as_frame=False, as_arrays=False):
+    return get_extreme_waiting_lists(cursor, k, largest=True, year=year, per_year=per_year,
+                                     as_frame=as_frame, as_arrays=as_arrays)
+
+
+def get_bottom_waiting_lists(cursor, k=10, year=None, per_year=False, as_frame=False, as_arrays=False):
+    return get_extreme_waiting_lists(cursor, k, largest=False, year=year, per_year=per_year,
+                                     as_frame=as_frame, as_arrays=as_arrays)
+
+
+# 4. Get the area(s) and year(s) with the highest and lowest waiting list count
+def get_max_waiting_list(cursor, as_frame=False, as_arrays=False):
+    return get_top_waiting_lists(cursor, k=1, as_frame=as_frame, as_arrays=as_arrays)
+
+
+def get_min_waiting_list(cursor, as_frame=False, as_arrays=False):
+    return get_bottom_waiting_lists(cursor, k=1, as_frame=as_frame, as_arrays=as_arrays)
+
+
+# 5. Get statistics for housing supply: total, minimum, maximum, and average
+def get_housing_units_statistics(cursor, verify=False, as_frame=False, as_arrays=False):
+    return read_rollup(cursor, "aggregate.housing_units_statistics", verify=verify,
+                       as_frame=as_frame, as_arrays=as_arrays)
+
+
+# Step 6: Main program execution
+if __name__ == "__main__":
+    if not db_path.exists():
+        print(f"Database not found: {db_path}")
+    else:
+        conn, cursor = get_db_connection(db_path)
+        if conn is None:
+            print("Failed to connect to the database. Program terminated.")
+            sys.exit(1)
+
+        try:
+            # 1. Get the total housing supply for a specific year
+            year = int(input("Enter year to calculate total housing units: ").strip())
+            total_units = get_total_housing_units_by_year(cursor, year)
+            print(f"\nTotal housing units for the year {year}: {total_units[0][0]}")
+
+            # 2. Get the average waiting list count across all areas
+            avg_waiting_list = get_avg_waiting_list(cursor)
+            print(f"\nAverage waiting list count: {avg_waiting_list[0][0]:.2f}")
+
+            # 3. Get the area(s) and year(s) with the highest waiting list count
+            print("\nArea with the highest waiting list:")
+            for area_code, max_year, households in get_max_waiting_list(cursor):
+                print(f"Area Code: {area_code}, Year: {max_year}, Households: {households}")
+
+            # 4. Get the area(s) and year(s) with the lowest waiting list count
+            print("\nArea with the lowest waiting list:")
+            for area_code, min_year, households in get_min_waiting_list(cursor):
+                print(f"Area Code: {area_code}, Year: {min_year}, Households: {households}")
+
+            # 5. Get housing supply statistics
+            housing_stats = get_housing_units_statistics(cursor)
+            print("\nHousing Units Statistics:")
+            print(f"Total Units: {housing_stats[0][0]}, Average Units: {housing_stats[0][1]:.2f}, "
+                  f"Min Units: {housing_stats[0][2]}, Max Units: {housing_stats[0][3]}")
+
+        except ValueError as e:
+            print(f"Invalid input: {e}")
+        finally:
+            # Close the connection
+            conn.close()
@@ -0,0 +1,141 @@
+import sqlite3
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+# Allow running as a script: python coursework2/section3/queries_analytics.py
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from coursework2 import connection, instrumentation, results, statements
+
+
+# Step 1: Define the database path
+base_dir = Path(__file__).resolve().parent
+db_path = base_dir.parents[1] / "coursework1" / "database" / "local_authority_housing.db"
+
+# Column dtypes of the returned frames; nullable integers where LAG leaves gaps
+TREND_DTYPES = {
+    "area_code": "object",
+    "year": "int64",
+    "value": "Int64",
+    "previous_year": "Int64",
+    "previous": "Int64",
+    "yoy_change": "Int64",
+    "yoy_pct": "float64",
+    "rolling_mean": "float64",
+    "cumulative": "Int64",
+    "year_rank": "int64",
+}
+
+
+# Step 2: Connect to the database
+def get_db_connection(db_path):
+    """Borrow a read-only connection from the shared pool; conn.close() hands it back."""
+    return connection.get_db_connection(db_path, read_only=True)
+
+
+# Step 3: Execute windowed queries
+def execute_analytics_query(cursor, sql, params=None, as_arrays=False):
+    """
+    Execute a query and return the result as a typed DataFrame.
+    :param cursor: SQLite cursor
+    :param sql: The SQL query string
+    :param params: Parameters for the SQL query (optional)
+    :param as_arrays: Return a dict of column name -> typed array (see results.fetch_arrays) instead
+    :return: DataFrame (or dict of arrays), or None if the query failed
+    """
+    try:
+        with instrumentation.track(cursor, "analytics", sql, params) as query:
+            if params:
+                cursor.execute(sql, params)
+            else:
+                cursor.execute(sql)
+            arrays = results.fetch_arrays(cursor)
+            query.rows = results.count_rows(arrays)
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+        return None
+    if as_arrays:
+        # The typed arrays of the other helpers (text as Categorical, float with NaN for
+        # the gaps), with the whole-number columns widened to int64
+        return {column: values.astype("int64") if TREND_DTYPES.get(column) == "int64" else values
+                for column, values in arrays.items()}
+    frame = pd.DataFrame(arrays, copy=False)
+    return frame.astype({column: TREND_DTYPES[column] for column in arrays if column in TREND_DTYPES})
+
+
+def get_trend_statement(table, column_set, window=3, area_code=None, year=None):
+    """
+    Return the registered statement computing one set of trend columns for a fact
+    table, and its parameters (see register_trend_statements in coursework2/statements.py).
+    :param column_set: Key of statements.TREND_COLUMN_SETS
+    :param window: Rolling mean window in years, bound as the frame size
+    :return: (sql, params)
+    """
+    if table not in statements.TREND_TABLES:
+        raise ValueError(f"No trends for table {table!r}")
+    if not isinstance(window, int) or window < 1:
+        raise ValueError("window must be a whole number of years, at least 1")
+    columns = statements.TREND_COLUMN_SETS[column_set]
+    params = [window - 1] if "rolling_mean" in columns else []
+    # Matches the order of the filters in the statement: the one run before the windows first
+    filters = [area_code, year] if columns != ("year_rank",) else [year, area_code]
+    params += [value for value in filters if value is not None]
+    name = statements.get_trend_name(column_set, table, area_code is not None, year is not None)
+    return statements.get(name), tuple(params)
+
+
+# Step 4: Define analytics query functions
+
+# 1. Year-over-year change per borough
+def get_year_over_year_change(cursor, table="Waiting_List_Data", area_code=None, as_arrays=False):
+    sql, params = get_trend_statement(table, "yoy", area_code=area_code)
+    return execute_analytics_query(cursor, sql, params, as_arrays)
+
+
+# 2. N-year rolling mean per borough
+def get_rolling_average(cursor, table="Waiting_List_Data", window=3, area_code=None, as_arrays=False):
+    sql, params = get_trend_statement(table, "rolling", window=window, area_code=area_code)
+    return execute_analytics_query(cursor, sql, params, as_arrays)
+
+
+# 3. Cumulative affordable housing supply per borough
+def get_cumulative_supply(cursor, table="Affordable_Housing_Data", area_code=None, as_arrays=False):
+    sql, params = get_trend_statement(table, "cumulative", area_code=area_code)
+    return execute_analytics_query(cursor, sql, params, as_arrays)
+
+
+# 4. Rank of every borough within each year (1 = largest value)
+def get_borough_ranks(cursor, table="Waiting_List_Data", year=None, as_arrays=False):
+    sql, params = get_trend_statement(table, "ranks", year=year)
+    return execute_analytics_query(cursor, sql, params, as_arrays)
+
+
+# 5. All of the above in a single pass
+def get_trends(cursor, table="Waiting_List_Data", window=3, area_code=None, year=None, as_arrays=False):
+    sql, params = get_trend_statement(table, "all", window=window, area_code=area_code, year=year)
+    return execute_analytics_query(cursor, sql, params, as_arrays)
+
+
+# Step 5: Main program execution
+if __name__ == "__main__":
+    if not db_path.exists():
+        print(f"Database not found: {db_path}")
+    else:
+        conn, cursor = get_db_connection(db_path)
+        if conn is None:
+            print("Failed to connect to the database. Program terminated.")
+            sys.exit(1)
+
+        try:
+            area_code = input("Enter area code: ").strip()
+            window = int(input("Enter rolling window in years: ").strip())
+            for table in statements.TREND_TABLES:
+                print(f"\n{table} trends for {area_code}:")
+                print(get_trends(cursor, table, window=window, area_code=area_code).to_string(index=False))
+        except ValueError as e:
+            print(f"Invalid input: {e}")
+        finally:
+            # Close the connection
+            conn.close()
@@ -1,111 +1,323 @@
-import sqlite3
-from pathlib import Path
-
-
-# Step 1: Define the database path
-base_dir = Path(__file__).resolve().parent
-db_path = base_dir.parents[1] / "coursework1" / "database" / "local_authority_housing.db"
-
-
-# Step 2: Connect to the database
-def get_db_connection(db_path):
-    """Establish connection to the SQLite database."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('PRAGMA foreign_keys = ON;')
-    conn.commit()
-    return conn, cursor
-
-
-# Step 3: Execute DELETE queries
-def execute_delete_query(cursor, sql, params=None):
-    """
-    Execute a DELETE query and commit changes.
-    :param cursor: SQLite cursor
-    :param sql: The SQL query string
-    :param params: Parameters for the SQL query (optional)
-    """
-    try:
-        if params:
-            cursor.execute(sql, params)
-        else:
-            cursor.execute(sql)
-        cursor.connection.commit()
-        print("Deletion successful.")
-    except sqlite3.Error as e:
-        print(f"An error occurred: {e}")
-
-
-# Step 4: Define DELETE query functions
-
-# 1. Delete a specific area
-def delete_area(cursor, area_code):
-    sql = "DELETE FROM Area WHERE area_code = ?;"
-    execute_delete_query(cursor, sql, params=(area_code,))
-
-
-# 2. Delete data for a specific year
-def delete_year(cursor, year):
-    sql = "DELETE FROM Year WHERE year = ?;"
-    execute_delete_query(cursor, sql, params=(year,))
-
-
-# 3. Delete housing data for a specific area
-def delete_housing_data_by_area(cursor, area_code):
-    sql = "DELETE FROM Affordable_Housing_Data WHERE area_code = ?;"
-    execute_delete_query(cursor, sql, params=(area_code,))
-
-
-# 4. Delete waiting list data for a specific year
-def delete_waiting_list_by_year(cursor, year):
-    sql = "DELETE FROM Waiting_List_Data WHERE year = ?;"
-    execute_delete_query(cursor, sql, params=(year,))
-
-
-# 5. Clear all data
-def clear_all_data(cursor):
-    tables = ["Affordable_Housing_Data", "Waiting_List_Data", "Area", "Year"]
-    for table in tables:
-        sql = f"DELETE FROM {table};"
-        execute_delete_query(cursor, sql)
-    print("All tables have been cleared.")
-
-
-# Step 5: Main program execution
-if __name__ == "__main__":
-    if not db_path.exists():
-        print(f"Database not found: {db_path}")
-    else:
-        conn, cursor = get_db_connection(db_path)
-
-        try:
-            # 1. Delete a specific area
-            print("\nDelete a specific Area:")
-            area_code = input("Enter area code to delete: ").strip()
-            delete_area(cursor, area_code)
-
-            # 2. Delete data for a specific year
-            print("\nDelete data for a specific Year:")
-            year = int(input("Enter year to delete: ").strip())
-            delete_year(cursor, year)
-
-            # 3. Delete housing data for a specific area
-            print("\nDelete housing data for a specific Area:")
-            area_code = input("Enter area code for housing data to delete: ").strip()
-            delete_housing_data_by_area(cursor, area_code)
-
-            # 4. Delete waiting list data for a specific year
-            print("\nDelete waiting list data for a specific Year:")
-            year = int(input("Enter year for waiting list data to delete: ").strip())
-            delete_waiting_list_by_year(cursor, year)
-
-            # 5. Clear all data
-            confirm = input("\nDo you want to clear all data from all tables? (yes/no): ").strip().lower()
-            if confirm == "yes":
-                clear_all_data(cursor)
-
-        except ValueError as e:
-            print(f"Invalid input: {e}")
-        finally:
-            # Close the connection
-            conn.close()
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+# Allow running as a script: python coursework2/section3/queries_delete.py
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from coursework2 import connection, instrumentation, query_cache, statements
+from coursework2.section3.queries_insert import BATCH_SIZE, iter_batches, iter_rows
+
+
+# Step 1: Define the database path
+base_dir = Path(__file__).resolve().parent
+db_path = base_dir.parents[1] / "coursework1" / "database" / "local_authority_housing.db"
+
+
+# Step 2: Connect to the database
+def get_db_connection(db_path):
+    """Borrow a connection from the shared pool; conn.close() hands it back."""
+    return connection.get_db_connection(db_path)
+
+
+# Step 3: Execute DELETE queries
+def execute_delete_query(cursor, sql, params=None):
+    """
+    Execute a DELETE query and commit changes.
+    Inside a connection.transaction() block the commit is left to the block,
+    and errors are re-raised so the whole block rolls back.
+    :param cursor: SQLite cursor
+    :param sql: The SQL query string
+    :param params: Parameters for the SQL query (optional)
+    """
+    in_scope = connection.in_transaction_scope(cursor.connection)
+    try:
+        with instrumentation.track(cursor, "delete", sql, params) as query:
+            if params:
+                cursor.execute(sql, params)
+            else:
+                cursor.execute(sql)
+            query.rows = cursor.rowcount
+        query_cache.invalidate_sql(cursor, sql)
+        if not in_scope:
+            cursor.connection.commit()
+        print("Deletion successful.")
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+        if in_scope:
+            raise
+
+
+def execute_delete_many(cursor, sql, rows, batch_size=BATCH_SIZE):
+    """
+    Execute a DELETE for many keys in batches, inside one transaction with one commit.
+    If any batch fails, the whole call is rolled back and the error raised. Inside an
+    open connection.transaction() block it runs as a savepoint of that block.
+    :param cursor: SQLite cursor
+    :param sql: The SQL query string
+    :param rows: Iterable of parameter tuples
+    :param batch_size: Rows per executemany call
+    :return: Number of rows deleted
+    """
+    deleted = 0
+    try:
+        with connection.transaction(cursor), instrumentation.track(cursor, "delete", sql) as query:
+            for batch in iter_batches(rows, batch_size):
+                cursor.executemany(sql, batch)
+                deleted += cursor.rowcount
+            query.rows = deleted
+            query_cache.invalidate_sql(cursor, sql)
+        return deleted
+    except sqlite3.Error as e:
+        print(f"An error occurred, bulk delete rolled back: {e}")
+        raise
+
+
+# Step 4: Purge an area or a year together with every row that depends on it
+# Fact tables referencing Area and Year, deleted before their parent row
+DEPENDENT_TABLES = ["Affordable_Housing_Data", "Waiting_List_Data"]
+
+# Tables emptied by clear_all_data (children first), the tables derived from
+# them, and the ingest manifest, which is emptied too so the next
+# create_database() run does a full build
+TABLES = DEPENDENT_TABLES + ["Area", "Year"]
+DERIVED_TABLES = ["Area_Year_Facts", "Fact_Rollup"]
+MANIFEST_TABLES = ["Ingest_Manifest", "Ingest_Row_Digest"]
+
+
+def purge_rows(cursor, parent_table, key_column, key):
+    """
+    Delete one Area or Year row and all fact rows referring to it in one transaction.
+    The schema cascades these deletes already; deleting the dependents explicitly
+    keeps databases built before ON DELETE CASCADE (or with foreign keys off)
+    from being left with orphans. Errors are raised.
+    :return: Dict of table name -> rows deleted
+    """
+    deleted = {}
+    with connection.transaction(cursor):
+        for table in DEPENDENT_TABLES + [parent_table]:
+            sql = statements.get(f"delete.{table}.by_{key_column}")
+            with instrumentation.track(cursor, "delete", sql, (key,)) as query:
+                cursor.execute(sql, (key,))
+                deleted[table] = query.rows = cursor.rowcount
+        query_cache.invalidate_tables(cursor, parent_table)
+    return deleted
+
+
+def purge_area(cursor, area_code):
+    """
+    Delete an area and its affordable housing and waiting list rows.
+    :return: Dict of table name -> rows deleted
+    """
+    return purge_rows(cursor, "Area", "area_code", area_code)
+
+
+def purge_year(cursor, year):
+    """
+    Delete a year and its affordable housing and waiting list rows.
+    :return: Dict of table name -> rows deleted
+    """
+    return purge_rows(cursor, "Year", "year", year)
+
+
+PURGE_STAGING_TABLE = "temp.purge_keys_staging"
+
+
+def build_purge_statements(parent_table, key_column):
+    """
+    Build the statements of one bulk purge, once at import: they read the temp
+    staging table, so they cannot be checked by statements.validate().
+    :return: Dict of step -> SQL string, with one "delete" statement per table
+    """
+    staged = f"SELECT {key_column} FROM {PURGE_STAGING_TABLE}"
+    return {
+        "create": f"CREATE TABLE {PURGE_STAGING_TABLE} ({key_column} PRIMARY KEY);",
+        "stage": f"INSERT OR IGNORE INTO {PURGE_STAGING_TABLE} VALUES (?);",
+        "delete": {table: f"DELETE FROM {table} WHERE {key_column} IN ({staged});"
+                   for table in DEPENDENT_TABLES + [parent_table]},
+    }
+
+
+# (parent table, key column) -> its bulk purge statements
+PURGE_SQL = {(parent_table, key_column): build_purge_statements(parent_table, key_column)
+             for parent_table, key_column in [("Area", "area_code"), ("Year", "year")]}
+DROP_PURGE_STAGING_SQL = f"DROP TABLE IF EXISTS {PURGE_STAGING_TABLE};"
+
+
+def purge_rows_many(cursor, parent_table, key_column, keys, batch_size=BATCH_SIZE):
+    """
+    Delete many Area or Year rows and all fact rows referring to them in one
+    transaction. The keys are streamed once into a temp staging table, batch_size
+    at a time, so they are never all held in memory; each table is then cleared
+    with one DELETE against it. Errors are raised.
+    :param keys: Iterable of keys, (key,) rows or dicts, or a DataFrame
+    :return: Dict of table name -> rows deleted
+    """
+    sql = PURGE_SQL[(parent_table, key_column)]
+    deleted = {}
+    with connection.transaction(cursor):
+        cursor.execute(DROP_PURGE_STAGING_SQL)
+        cursor.execute(sql["create"])
+        try:
+            for batch in iter_batches(iter_rows(keys, (key_column,)), batch_size):
+                cursor.executemany(sql["stage"], batch)
+            for table, delete in sql["delete"].items():
+                with instrumentation.track(cursor, "delete", delete) as query:
+                    cursor.execute(delete)
+                    deleted[table] = query.rows = cursor.rowcount
+            query_cache.invalidate_tables(cursor, parent_table)
+        finally:
+            cursor.execute(DROP_PURGE_STAGING_SQL)
+    return deleted
+
+
+def purge_areas(cursor, area_codes, batch_size=BATCH_SIZE):
+    """
+    Delete many areas and their affordable housing and waiting list rows.
+    :return: Dict of table name -> rows deleted
+    """
+    return purge_rows_many(cursor, "Area", "area_code", area_codes, batch_size)
+
+
+def purge_years(cursor, years, batch_size=BATCH_SIZE):
+    """
+    Delete many years and their affordable housing and waiting list rows.
+    :return: Dict of table name -> rows deleted
+    """
+    return purge_rows_many(cursor, "Year", "year", years, batch_size)
+
+
+def execute_purge(cursor, purge, key):
+    """
+    Run purge_area or purge_year the way execute_delete_query runs a DELETE:
+    print the outcome, and only re-raise errors inside a transaction() block.
+    """
+    in_scope = connection.in_transaction_scope(cursor.connection)
+    try:
+        deleted = purge(cursor, key)
+        print(f"Deletion successful: {sum(deleted.values())} row(s) removed.")
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+        if in_scope:
+            raise
+
+
+# Step 5: Fast truncate of every table
+def get_table_definitions(cursor, tables):
+    """
+    Read the CREATE statements of the given tables and of their indexes and triggers.
+    :return: List of SQL statements, tables first, in the order they were created
+    """
+    cursor.execute(statements.get("delete.table_definitions"), (json.dumps(list(tables)),))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def reclaim_free_space(cursor):
+    """
+    Give the pages freed by a truncate back to the file system.
+    Incremental auto-vacuum databases only release their free list; others are vacuumed.
+    """
+    auto_vacuum = cursor.execute("PRAGMA auto_vacuum;").fetchone()[0]
+    if auto_vacuum == 2:
+        cursor.execute("PRAGMA incremental_vacuum;").fetchall()
+    elif auto_vacuum == 0:
+        cursor.execute("VACUUM;")
+
+
+# Step 6: Define DELETE query functions
+
+# 1. Delete a specific area (with its housing and waiting list data)
+def delete_area(cursor, area_code):
+    execute_purge(cursor, purge_area, area_code)
+
+
+# 2. Delete data for a specific year (with its housing and waiting list data)
+def delete_year(cursor, year):
+    execute_purge(cursor, purge_year, year)
+
+
+# 3. Delete housing data for a specific area
+def delete_housing_data_by_area(cursor, area_code):
+    sql = statements.get("delete.Affordable_Housing_Data.by_area_code")
+    execute_delete_query(cursor, sql, params=(area_code,))
+
+
+# 4. Delete waiting list data for a specific year
+def delete_waiting_list_by_year(cursor, year):
+    sql = statements.get("delete.Waiting_List_Data.by_year")
+    execute_delete_query(cursor, sql, params=(year,))
+
+
+# 5. Clear all data
+def clear_all_data(cursor, vacuum=True):
+    """
+    Empty every table by dropping and recreating it (with its indexes and triggers)
+    instead of deleting row by row, then reclaim the freed space. Inside an outer
+    transaction() block the recreate is part of that block and no vacuum is run.
+    :param cursor: SQLite cursor
+    :param vacuum: Run VACUUM / incremental_vacuum after the commit
+    """
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table';")
+    existing = {row[0] for row in cursor.fetchall()}
+    tables = [table for table in TABLES + DERIVED_TABLES + MANIFEST_TABLES if table in existing]
+    in_scope = connection.in_transaction_scope(cursor.connection)
+    try:
+        # One commit for all the tables
+        with connection.transaction(cursor):
+            definitions = get_table_definitions(cursor, tables)
+            for table in tables:
+                cursor.execute(statements.get(f"delete.drop.{table}"))
+            for sql in definitions:
+                cursor.execute(sql)
+            query_cache.invalidate_tables(cursor, *tables)
+        if vacuum and not in_scope:
+            reclaim_free_space(cursor)
+        print("All tables have been cleared.")
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+        if in_scope:
+            raise
+
+
+# Step 7: Main program execution
+if __name__ == "__main__":
+    if not db_path.exists():
+        print(f"Database not found: {db_path}")
+    else:
+        conn, cursor = get_db_connection(db_path)
+        if conn is None:
+            print("Failed to connect to the database. Program terminated.")
+            sys.exit(1)
+
+        try:
+            # 1. Delete a specific area
+            print("\nDelete a specific Area:")
+            area_code = input("Enter area code to delete: ").strip()
+            delete_area(cursor, area_code)
+
+            # 2. Delete data for a specific year
+            print("\nDelete data for a specific Year:")
+            year = int(input("Enter year to delete: ").strip())
+            delete_year(cursor, year)
+
+            # 3. Delete housing data for a specific area
+            print("\nDelete housing data for a specific Area:")
+            area_code = input("Enter area code for housing data to delete: ").strip()
+            delete_housing_data_by_area(cursor, area_code)
+
+            # 4. Delete waiting list data for a specific year
+            print("\nDelete waiting list data for a specific Year:")
+            year = int(input("Enter year for waiting list data to delete: ").strip())
+            delete_waiting_list_by_year(cursor, year)
+
+            # 5. Clear all data
+            confirm = input("\nDo you want to clear all data from all tables? (yes/no): ").strip().lower()
+            if confirm == "yes":
+                clear_all_data(cursor)
+
+        except ValueError as e:
+            print(f"Invalid input: {e}")
+        finally:
+            # Close the connection
+            conn.close()
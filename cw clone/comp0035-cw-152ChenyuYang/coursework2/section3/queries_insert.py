@@ -1,126 +1,249 @@
-import sqlite3
-from pathlib import Path
-
-
-# Step 1: Define the database path
-base_dir = Path(__file__).resolve().parent
-db_path = base_dir.parents[1] / "coursework1" / "database" / "local_authority_housing.db"
-
-
-# Step 2: Connect to the database
-def get_db_connection(db_path):
-    """Establish connection to the SQLite database."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute('PRAGMA foreign_keys = ON;')  # Ensure foreign key constraints are enabled
-    conn.commit()
-    return conn, cursor
-
-
-# Step 3: Execute INSERT queries
-def execute_insert_query(cursor, sql, params):
-    """
-    Execute an INSERT query and commit changes.
-    :param cursor: SQLite cursor
-    :param sql: The SQL query string
-    :param params: Parameters for the SQL query
-    :return: Last inserted row ID
-    """
-    try:
-        cursor.execute(sql, params)
-        cursor.connection.commit()
-        return cursor.lastrowid
-    except sqlite3.IntegrityError as e:
-        print(f"Integrity error: {e}")
-        raise  # Re-raise exception to ensure calling function can handle it
-    except sqlite3.Error as e:
-        print(f"An error occurred: {e}")
-        raise  # Re-raise generic SQLite errors
-
-
-# Step 4: Define data insertion functions
-
-# 1. Insert new area information
-def insert_new_area(cursor, area_code, area_name):
-    sql = "INSERT INTO Area (area_code, area_name) VALUES (?, ?);"
-    return execute_insert_query(cursor, sql, (area_code, area_name))
-
-
-# 2. Insert new year information
-def insert_new_year(cursor, year):
-    sql = "INSERT INTO Year (year) VALUES (?);"
-    return execute_insert_query(cursor, sql, (year,))
-
-
-# 3. Insert new housing data
-def insert_housing_data(cursor, area_code, year, housing_units):
-    sql = """
-    INSERT INTO Affordable_Housing_Data (area_code, year, housing_units) 
-    VALUES (?, ?, ?);
-    """
-    return execute_insert_query(cursor, sql, (area_code, year, housing_units))
-
-
-# 4. Insert new waiting list data
-def insert_waiting_list_data(cursor, area_code, year, households_count):
-    sql = """
-    INSERT INTO Waiting_List_Data (area_code, year, households_count) 
-    VALUES (?, ?, ?);
-    """
-    return execute_insert_query(cursor, sql, (area_code, year, households_count))
-
-
-# Step 5: Main program execution
-if __name__ == "__main__":
-    if not db_path.exists():
-        print(f"Database not found: {db_path}")
-    else:
-        conn, cursor = get_db_connection(db_path)
-
-        try:
-            # 1. Insert new area information
-            print("\nInsert new Area:")
-            area_code = input("Enter area code: ").strip()
-            area_name = input("Enter area name: ").strip()
-            try:
-                area_id = insert_new_area(cursor, area_code, area_name)
-                print(f"Inserted new Area with code: {area_code}, name: {area_name}")
-            except sqlite3.IntegrityError as e:
-                print(f"Failed to insert area: {e}")
-
-            # 2. Insert new year information
-            print("\nInsert new Year:")
-            year = input("Enter year: ").strip()
-            try:
-                year_id = insert_new_year(cursor, int(year))
-                print(f"Inserted new Year: {year}")
-            except (ValueError, sqlite3.IntegrityError) as e:
-                print(f"Failed to insert year: {e}")
-
-            # 3. Insert new housing data
-            print("\nInsert new Affordable Housing Data:")
-            area_code = input("Enter area code for housing data: ").strip()
-            year = input("Enter year for housing data: ").strip()
-            housing_units = input("Enter housing units: ").strip()
-            try:
-                housing_id = insert_housing_data(cursor, area_code, int(year), int(housing_units))
-                print(f"Inserted new Housing Data for area code {area_code}, year {year}")
-            except (ValueError, sqlite3.IntegrityError) as e:
-                print(f"Failed to insert housing data: {e}")
-
-            # 4. Insert new waiting list data
-            print("\nInsert new Waiting List Data:")
-            area_code = input("Enter area code for waiting list data: ").strip()
-            year = input("Enter year for waiting list data: ").strip()
-            households_count = input("Enter households count: ").strip()
-            try:
-                waiting_list_id = insert_waiting_list_data(cursor, area_code, int(year), int(households_count))
-                print(f"Inserted new Waiting List Data for area code {area_code}, year {year}")
-            except (ValueError, sqlite3.IntegrityError) as e:
-                print(f"Failed to insert waiting list data: {e}")
-
-        except Exception as e:
-            print(f"An unexpected error occurred: {e}")
-        finally:
-            # Close the connection
-            conn.close()
+import sqlite3
+import sys
+from pathlib import Path
+
+# Allow running as a script: python coursework2/section3/queries_insert.py
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from coursework2 import connection, instrumentation, query_cache, statements
+
+
+# Step 1: Define the database path
+base_dir = Path(__file__).resolve().parent
+db_path = base_dir.parents[1] / "coursework1" / "database" / "local_authority_housing.db"
+
+
+# Step 2: Connect to the database
+def get_db_connection(db_path):
+    """Borrow a connection from the shared pool; conn.close() hands it back."""
+    return connection.get_db_connection(db_path)
+
+
+# Step 3: Execute INSERT queries
+def execute_insert_query(cursor, sql, params):
+    """
+    Execute an INSERT query and commit changes.
+    Inside a connection.transaction() block the commit is left to the block.
+    :param cursor: SQLite cursor
+    :param sql: The SQL query string
+    :param params: Parameters for the SQL query
+    :return: Last inserted row ID
+    """
+    try:
+        with instrumentation.track(cursor, "insert", sql, params) as query:
+            cursor.execute(sql, params)
+            query.rows = cursor.rowcount
+        query_cache.invalidate_sql(cursor, sql)
+        if not connection.in_transaction_scope(cursor.connection):
+            cursor.connection.commit()
+        return cursor.lastrowid
+    except sqlite3.IntegrityError as e:
+        print(f"Integrity error: {e}")
+        raise  # Re-raise exception to ensure calling function can handle it
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+        raise  # Re-raise generic SQLite errors
+
+
+# Rows per executemany call in the bulk insert functions
+BATCH_SIZE = 1000
+
+# How the bulk insert functions treat rows whose key already exists
+ON_CONFLICT_MODES = ("error", "ignore", "update")
+
+
+def iter_rows(data, columns):
+    """
+    Yield tuples in column order from a DataFrame, an iterable of dicts or an
+    iterable of tuples. DataFrame columns are converted to plain Python values,
+    which sqlite3 can bind (NumPy integers it cannot).
+    """
+    if hasattr(data, "columns") and hasattr(data, "itertuples"):
+        yield from zip(*(data[column].tolist() for column in columns))
+        return
+    for row in data:
+        if isinstance(row, dict):
+            yield tuple(row[column] for column in columns)
+        elif isinstance(row, (tuple, list)):
+            yield tuple(row)
+        else:
+            yield (row,)
+
+
+def iter_batches(rows, batch_size):
+    """Group an iterator of rows into lists of at most batch_size rows."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def execute_insert_many(cursor, sql, rows, batch_size=BATCH_SIZE):
+    """
+    Execute an INSERT for many rows in batches, inside one transaction with one commit.
+    If any batch fails, the whole call is rolled back. Inside an open
+    connection.transaction() block it runs as a savepoint of that block.
+    :param cursor: SQLite cursor
+    :param sql: The SQL query string
+    :param rows: Iterable of parameter tuples
+    :param batch_size: Rows per executemany call
+    :return: List with the number of rows written by each batch
+    """
+    counts = []
+    try:
+        with connection.transaction(cursor), instrumentation.track(cursor, "insert", sql) as query:
+            for batch in iter_batches(rows, batch_size):
+                cursor.executemany(sql, batch)
+                counts.append(cursor.rowcount)
+            query.rows = sum(counts)
+            query_cache.invalidate_sql(cursor, sql)
+        return counts
+    except sqlite3.Error as e:
+        print(f"An error occurred, bulk insert rolled back: {e}")
+        raise
+
+
+def get_bulk_insert_sql(table, on_conflict):
+    """
+    Pick the registered "insert.many.<table>.<on_conflict>" statement (coursework2/statements.py),
+    rejecting unknown modes. 'update' needs a PRIMARY KEY or UNIQUE constraint on the key columns.
+    """
+    if on_conflict not in ON_CONFLICT_MODES:
+        raise ValueError(f"on_conflict must be one of {ON_CONFLICT_MODES}, got {on_conflict!r}")
+    return statements.get(f"insert.many.{table}.{on_conflict}")
+
+
+# Step 4: Define data insertion functions
+
+# 1. Insert new area information
+def insert_new_area(cursor, area_code, area_name):
+    return execute_insert_query(cursor, statements.get("insert.area"), (area_code, area_name))
+
+
+# 2. Insert new year information
+def insert_new_year(cursor, year):
+    return execute_insert_query(cursor, statements.get("insert.year"), (year,))
+
+
+# 3. Insert new housing data
+def insert_housing_data(cursor, area_code, year, housing_units):
+    return execute_insert_query(cursor, statements.get("insert.housing_data"), (area_code, year, housing_units))
+
+
+# 4. Insert new waiting list data
+def insert_waiting_list_data(cursor, area_code, year, households_count):
+    return execute_insert_query(cursor, statements.get("insert.waiting_list_data"),
+                                (area_code, year, households_count))
+
+
+# 5. Bulk insert areas
+def insert_new_areas_many(cursor, areas, on_conflict="error", batch_size=BATCH_SIZE):
+    """
+    Insert many areas in one transaction.
+    :param areas: DataFrame or iterable of (area_code, area_name) rows or dicts
+    :param on_conflict: 'error', 'ignore' or 'update' (rename existing areas)
+    :return: List of per-batch row counts
+    """
+    sql = get_bulk_insert_sql("Area", on_conflict)
+    return execute_insert_many(cursor, sql, iter_rows(areas, ("area_code", "area_name")), batch_size)
+
+
+# 6. Bulk insert years
+def insert_new_years_many(cursor, years, on_conflict="error", batch_size=BATCH_SIZE):
+    """
+    Insert many years in one transaction.
+    :param years: DataFrame with a year column, or iterable of ints, (year,) rows or dicts
+    :param on_conflict: 'error' or 'ignore' ('update' behaves like 'ignore')
+    :return: List of per-batch row counts
+    """
+    sql = get_bulk_insert_sql("Year", on_conflict)
+    return execute_insert_many(cursor, sql, iter_rows(years, ("year",)), batch_size)
+
+
+# 7. Bulk insert housing data
+def insert_housing_data_many(cursor, rows, on_conflict="error", batch_size=BATCH_SIZE):
+    """
+    Insert many housing data rows in one transaction.
+    :param rows: DataFrame or iterable of (area_code, year, housing_units) rows or dicts
+    :param on_conflict: 'error', 'ignore' or 'update' (overwrite housing_units)
+    :return: List of per-batch row counts
+    """
+    sql = get_bulk_insert_sql("Affordable_Housing_Data", on_conflict)
+    columns = ("area_code", "year", "housing_units")
+    return execute_insert_many(cursor, sql, iter_rows(rows, columns), batch_size)
+
+
+# 8. Bulk insert waiting list data
+def insert_waiting_list_data_many(cursor, rows, on_conflict="error", batch_size=BATCH_SIZE):
+    """
+    Insert many waiting list rows in one transaction.
+    :param rows: DataFrame or iterable of (area_code, year, households_count) rows or dicts
+    :param on_conflict: 'error', 'ignore' or 'update' (overwrite households_count)
+    :return: List of per-batch row counts
+    """
+    sql = get_bulk_insert_sql("Waiting_List_Data", on_conflict)
+    columns = ("area_code", "year", "households_count")
+    return execute_insert_many(cursor, sql, iter_rows(rows, columns), batch_size)
+
+
+# Step 5: Main program execution
+if __name__ == "__main__":
+    if not db_path.exists():
+        print(f"Database not found: {db_path}")
+    else:
+        conn, cursor = get_db_connection(db_path)
+        if conn is None:
+            print("Failed to connect to the database. Program terminated.")
+            sys.exit(1)
+
+        try:
+            # 1. Insert new area information
+            print("\nInsert new Area:")
+            area_code = input("Enter area code: ").strip()
+            area_name = input("Enter area name: ").strip()
+            try:
+                area_id = insert_new_area(cursor, area_code, area_name)
+                print(f"Inserted new Area with code: {area_code}, name: {area_name}")
+            except sqlite3.IntegrityError as e:
+                print(f"Failed to insert area: {e}")
+
+            # 2. Insert new year information
+            print("\nInsert new Year:")
+            year = input("Enter year: ").strip()
+            try:
+                year_id = insert_new_year(cursor, int(year))
+                print(f"Inserted new Year: {year}")
+            except (ValueError, sqlite3.IntegrityError) as e:
+                print(f"Failed to insert year: {e}")
+
+            # 3. Insert new housing data
+            print("\nInsert new Affordable Housing Data:")
+            area_code = input("Enter area code for housing data: ").strip()
+            year = input("Enter year for housing data: ").strip()
+            housing_units = input("Enter housing units: ").strip()
+            try:
+                housing_id = insert_housing_data(cursor, area_code, int(year), int(housing_units))
+                print(f"Inserted new Housing Data for area code {area_code}, year {year}")
+            except (ValueError, sqlite3.IntegrityError) as e:
+                print(f"Failed to insert housing data: {e}")
+
+            # 4. Insert new waiting list data
+            print("\nInsert new Waiting List Data:")
+            area_code = input("Enter area code for waiting list data: ").strip()
+            year = input("Enter year for waiting list data: ").strip()
+            households_count = input("Enter households count: ").strip()
+            try:
+                waiting_list_id = insert_waiting_list_data(cursor, area_code, int(year), int(households_count))
+                print(f"Inserted new Waiting List Data for area code {area_code}, year {year}")
+            except (ValueError, sqlite3.IntegrityError) as e:
+                print(f"Failed to insert waiting list data: {e}")
+
+        except Exception as e:
+            print(f"An unexpected error occurred: {e}")
+        finally:
+            # Close the connection
+            conn.close()
@@ -1,107 +1,113 @@
-import sqlite3
-from pathlib import Path
-
-# Define the database path
-base_dir = Path(__file__).resolve().parent
-db_path = base_dir.parents[1] / "coursework1" / "database" / "local_authority_housing.db"
-
-# Connect to the database
-def get_db_connection(db_path):
-    """Establish a connection to the SQLite database."""
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute('PRAGMA foreign_keys = ON;')
-        return conn, cursor
-    except sqlite3.Error as e:
-        print(f"Failed to connect to the database: {e}")
-        return None, None
-
-# Execute SELECT queries
-def execute_select_query(cursor, sql, params=None):
-    """
-    Execute a SELECT query and return the results.
-    :param cursor: SQLite cursor
-    :param sql: SQL query string
-    :param params: Query parameters
-    :return: Query results
-    """
-    try:
-        if params:
-            cursor.execute(sql, params)
-        else:
-            cursor.execute(sql)
-        return cursor.fetchall()
-    except sqlite3.Error as e:
-        print(f"Query failed: {e}")
-        return None
-
-# Dynamic query function
-def get_filtered_area_and_year(cursor, area_name=None, year=None):
-    """
-    Query dynamically based on area name and year.
-    If a parameter is not provided, it will not filter that field.
-    """
-    base_sql = """
-    SELECT Area.area_name, Year.year
-    FROM Area
-    CROSS JOIN Year
-    """
-    filters = []
-    params = []
-
-    # Dynamically add filter conditions
-    if area_name:
-        filters.append("LOWER(Area.area_name) = LOWER(?)")  # Case-insensitive
-        params.append(area_name)
-    if year:
-        filters.append("Year.year = ?")
-        params.append(year)
-
-    # If there are filters, append them to the SQL statement
-    if filters:
-        base_sql += " WHERE " + " AND ".join(filters)
-
-    base_sql += " ORDER BY Area.area_name, Year.year;"
-
-    # Debugging information
-    print("Executing SQL:", base_sql)
-    print("With Parameters:", params)
-
-    return execute_select_query(cursor, base_sql, params=params)
-
-# Main program
-if __name__ == "__main__":
-    if not db_path.exists():
-        print(f"Database file not found: {db_path}")
-    else:
-        conn, cursor = get_db_connection(db_path)
-        if conn is None or cursor is None:
-            print("Failed to connect to the database. Program terminated.")
-        else:
-            try:
-                # Dynamically input area name and year
-                print("Please enter the area name (leave blank for no filter):")
-                area_name = input("Area name: ").strip()
-                area_name = area_name if area_name else None
-
-                print("Please enter the year (leave blank for no filter):")
-                year_input = input("Year: ").strip()
-                year = int(year_input) if year_input else None
-
-                # Execute the query
-                results = get_filtered_area_and_year(cursor, area_name, year)
-
-                # Output the results
-                if results:
-                    print("\nQuery Results:")
-                    for row in results:
-                        print(row)
-                else:
-                    print("\nNo matching data found.")
-
-            except ValueError as e:
-                print(f"Input error: {e}")
-            finally:
-                # Close the database connection
-                conn.close()
+import logging
+import sqlite3
+import sys
+from pathlib import Path
+
+# Allow running as a script: python coursework2/section3/queries_join.py
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from coursework2 import connection, instrumentation, results, statements
+from coursework2.section3.queries_select import has_table
+
+logger = logging.getLogger(__name__)
+
+# Define the database path
+base_dir = Path(__file__).resolve().parent
+db_path = base_dir.parents[1] / "coursework1" / "database" / "local_authority_housing.db"
+
+# Connect to the database
+def get_db_connection(db_path):
+    """Borrow a read-only connection from the shared pool; conn.close() hands it back."""
+    return connection.get_db_connection(db_path, read_only=True)
+
+# Execute SELECT queries
+def execute_select_query(cursor, sql, params=None, as_frame=False, as_arrays=False, stream=False,
+                         arraysize=results.FETCH_BATCH):
+    """
+    Execute a SELECT query and return the results.
+    :param cursor: SQLite cursor
+    :param sql: SQL query string
+    :param params: Query parameters
+    :param as_frame: Return a DataFrame with typed columns (see coursework2/results.py)
+    :param as_arrays: Return a dict of typed NumPy column arrays
+    :param stream: Return an iterator over the rows, fetched arraysize at a time
+    :param arraysize: Rows per fetch when streaming
+    :return: Query results
+    """
+    if stream and (as_frame or as_arrays):
+        raise ValueError("stream cannot be combined with as_frame or as_arrays")
+    try:
+        if stream:
+            # A cursor of its own, so other queries on `cursor` cannot reset the stream
+            cursor = cursor.connection.cursor()
+        with instrumentation.track(cursor, "join", sql, params) as query:
+            if params:
+                cursor.execute(sql, params)
+            else:
+                cursor.execute(sql)
+            if stream:
+                # Timed up to the first step; rows are not counted
+                return results.iter_rows(cursor, arraysize)
+            result = results.fetch_result(cursor, as_frame, as_arrays)
+            query.rows = results.count_rows(result)
+        return result
+    except sqlite3.Error as e:
+        print(f"Query failed: {e}")
+        return None
+
+# One registered statement per filter shape (coursework2/statements.py), so each
+# shape is prepared once and then reused from sqlite3's statement cache.
+# Area_Year_Facts holds the (area_code, year) pairs that have data; databases built
+# without it fall back to the union of the fact tables.
+def get_filtered_area_and_year(cursor, area_name=None, year=None, **options):
+    """
+    Query the (area name, year) pairs that have data, based on area name and year.
+    If a parameter is not provided, it will not filter that field.
+    `options` (as_frame, as_arrays, stream, arraysize) are passed to execute_select_query.
+    """
+    params = []
+    if area_name:
+        params.append(area_name)
+    if year:
+        params.append(year)
+    name = statements.get_join_name(bool(area_name), bool(year), has_table(cursor, "Area_Year_Facts"))
+    sql = statements.get(name)
+    logger.debug("Executing SQL: %s With Parameters: %s", sql, params)
+    return execute_select_query(cursor, sql, params=params, **options)
+
+# Main program
+if __name__ == "__main__":
+    if not db_path.exists():
+        print(f"Database file not found: {db_path}")
+    else:
+        conn, cursor = get_db_connection(db_path)
+        if conn is None or cursor is None:
+            print("Failed to connect to the database. Program terminated.")
+        else:
+            try:
+                # Dynamically input area name and year
+                print("Please enter the area name (leave blank for no filter):")
+                area_name = input("Area name: ").strip()
+                area_name = area_name if area_name else None
+
+                print("Please enter the year (leave blank for no filter):")
+                year_input = input("Year: ").strip()
+                year = int(year_input) if year_input else None
+
+                # Execute the query, streaming the rows as they are read
+                rows = get_filtered_area_and_year(cursor, area_name, year, stream=True)
+
+                # Output the results
+                print("\nQuery Results:")
+                found = False
+                for row in rows or []:
+                    print(row)
+                    found = True
+                if not found:
+                    print("No matching data found.")
+
+            except ValueError as e:
+                print(f"Input error: {e}")
+            finally:
+                # Close the database connection
+                conn.close()
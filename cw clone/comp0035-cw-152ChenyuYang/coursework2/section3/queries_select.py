@@ -1,153 +1,238 @@
-import sqlite3
-from pathlib import Path
-
-# Step 1: Define the database path
-base_dir = Path(__file__).resolve().parent  # Current script directory (section3)
-db_path = base_dir.parents[1] / "coursework1" / "database" / "local_authority_housing.db"
-
-# Step 2: Connect to the database
-def get_db_connection(db_path):
-    """Establish connection to the SQLite database."""
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    return conn, cursor
-
-# Step 3: Execute SELECT queries
-def execute_select_query(cursor, sql, params=None):
-    """
-    Execute a SELECT query and return results.
-    :param cursor: SQLite cursor
-    :param sql: The SQL query string
-    :param params: Parameters for the SQL query (optional)
-    :return: Query results
-    """
-    try:
-        if params:
-            cursor.execute(sql, params)
-        else:
-            cursor.execute(sql)
-        return cursor.fetchall()
-    except sqlite3.Error as e:
-        print(f"An error occurred: {e}")
-        return None
-
-# Step 4: Define SELECT query functions
-
-# 1. Query all area names
-def get_all_areas(cursor):
-    sql = "SELECT DISTINCT area_name FROM Area ORDER BY area_name ASC;"
-    return execute_select_query(cursor, sql)
-
-# 2. Query waiting list data for a specific year
-def get_waiting_list_by_year(cursor, year):
-    sql = "SELECT area_code, households_count FROM Waiting_List_Data WHERE year = ?;"
-    return execute_select_query(cursor, sql, params=(year,))
-
-# 3. Query housing data for a specific area
-def get_housing_data_by_area(cursor, area_code):
-    sql = """
-    SELECT year, housing_units 
-    FROM Affordable_Housing_Data 
-    WHERE area_code = ? 
-    ORDER BY year ASC;
-    """
-    return execute_select_query(cursor, sql, params=(area_code,))
-
-# 4. Query detailed data for a specific area and year
-def get_area_details_by_year(cursor, area_code, year):
-    sql = """
-    SELECT 
-        Area.area_name, 
-        Affordable_Housing_Data.housing_units, 
-        Waiting_List_Data.households_count 
-    FROM Area
-    LEFT JOIN Affordable_Housing_Data ON Area.area_code = Affordable_Housing_Data.area_code
-    LEFT JOIN Waiting_List_Data ON Area.area_code = Waiting_List_Data.area_code
-    WHERE Area.area_code = ? AND Affordable_Housing_Data.year = ? AND Waiting_List_Data.year = ?;
-    """
-    return execute_select_query(cursor, sql, params=(area_code, year, year))
-
-# 5. Query all unique years
-def get_unique_years(cursor):
-    sql = "SELECT DISTINCT year FROM Year ORDER BY year ASC;"
-    return execute_select_query(cursor, sql)
-
-# 6. Query areas with waiting list data exceeding a specified number
-def get_areas_with_large_waiting_lists(cursor, min_households):
-    sql = """
-    SELECT area_code, year, households_count 
-    FROM Waiting_List_Data 
-    WHERE households_count > ? 
-    ORDER BY households_count DESC;
-    """
-    return execute_select_query(cursor, sql, params=(min_households,))
-
-# Step 5: Main program execution
-if __name__ == "__main__":
-    if not db_path.exists():
-        print(f"Database not found: {db_path}")
-    else:
-        conn, cursor = get_db_connection(db_path)
-
-        while True:
-            print("\nSelect an option:")
-            print("1. Query all areas")
-            print("2. Query waiting list data by year")
-            print("3. Query housing data by area")
-            print("4. Query detailed data by area and year")
-            print("5. Query all unique years")
-            print("6. Query areas with large waiting lists")
-            print("0. Exit")
-
-            choice = input("Enter your choice: ").strip()
-
-            if choice == "1":
-                print("\nAll Areas:")
-                areas = get_all_areas(cursor)
-                for area in areas:
-                    print(area[0])
-
-            elif choice == "2":
-                year = input("Enter the year: ").strip()
-                print(f"\nWaiting List Data for Year {year}:")
-                waiting_list = get_waiting_list_by_year(cursor, year)
-                for row in waiting_list:
-                    print(row)
-
-            elif choice == "3":
-                area_code = input("Enter the area code: ").strip()
-                print(f"\nHousing Data for Area Code {area_code}:")
-                housing_data = get_housing_data_by_area(cursor, area_code)
-                for row in housing_data:
-                    print(row)
-
-            elif choice == "4":
-                area_code = input("Enter the area code: ").strip()
-                year = input("Enter the year: ").strip()
-                print(f"\nDetails for Area {area_code} in Year {year}:")
-                details = get_area_details_by_year(cursor, area_code, year)
-                for row in details:
-                    print(row)
-
-            elif choice == "5":
-                print("\nUnique Years:")
-                unique_years = get_unique_years(cursor)
-                for year in unique_years:
-                    print(year[0])
-
-            elif choice == "6":
-                min_households = input("Enter the minimum number of households: ").strip()
-                print(f"\nAreas with Waiting Lists Greater than {min_households} Households:")
-                large_waiting_lists = get_areas_with_large_waiting_lists(cursor, min_households)
-                for row in large_waiting_lists:
-                    print(row)
-
-            elif choice == "0":
-                print("Exiting program.")
-                break
-
-            else:
-                print("Invalid choice. Please try again.")
-
-        # Close the connection
-        conn.close()
+import sqlite3
+import sys
+from pathlib import Path
+
+# Allow running as a script: python coursework2/section3/queries_select.py
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from coursework2 import connection, instrumentation, query_cache, results, statements
+
+# Step 1: Define the database path
+base_dir = Path(__file__).resolve().parent  # Current script directory (section3)
+db_path = base_dir.parents[1] / "coursework1" / "database" / "local_authority_housing.db"
+
+# Rows per page for iter_pages
+PAGE_SIZE = 1000
+
+# Step 2: Connect to the database
+def get_db_connection(db_path):
+    """Borrow a read-only connection from the shared pool; conn.close() hands it back."""
+    return connection.get_db_connection(db_path, read_only=True)
+
+# Step 3: Execute SELECT queries
+def execute_select_query(cursor, sql, params=None, as_frame=False, as_arrays=False, stream=False,
+                         arraysize=results.FETCH_BATCH):
+    """
+    Execute a SELECT query and return results.
+    :param cursor: SQLite cursor
+    :param sql: The SQL query string
+    :param params: Parameters for the SQL query (optional)
+    :param as_frame: Return a DataFrame with typed columns (see coursework2/results.py)
+    :param as_arrays: Return a dict of typed NumPy column arrays
+    :param stream: Return an iterator over the rows, fetched arraysize at a time, instead of a list
+    :param arraysize: Rows per fetch when streaming
+    :return: Query results
+    """
+    if stream and (as_frame or as_arrays):
+        raise ValueError("stream cannot be combined with as_frame or as_arrays")
+    try:
+        if stream:
+            # A cursor of its own, so other queries on `cursor` cannot reset the stream
+            cursor = cursor.connection.cursor()
+        with instrumentation.track(cursor, "select", sql, params) as query:
+            if params:
+                cursor.execute(sql, params)
+            else:
+                cursor.execute(sql)
+            if stream:
+                # Timed up to the first step; rows are not counted
+                return results.iter_rows(cursor, arraysize)
+            result = results.fetch_result(cursor, as_frame, as_arrays)
+            query.rows = results.count_rows(result)
+        return result
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+        return None
+
+# Keyset pagination. A paged function orders its rows by a unique key made of its
+# own output columns; `after` is the last row of the previous page and the next page
+# starts strictly beyond it, so every page is one index seek however deep it is.
+# The "<name>.after" statements (coursework2/statements.py) hold the key condition.
+def keyset_params(key_positions, after):
+    """
+    Parameters of the key condition selecting the rows after a given row.
+    :param key_positions: Position of each key column (in ORDER BY order) in the result rows
+    :param after: Last row of the previous page, or None for the first page
+    :return: Tuple of key values; empty for the first page
+    """
+    if after is None:
+        return ()
+    return tuple(after[position] for position in key_positions)
+
+def page_limit(page_size):
+    """Parameter for LIMIT ?; -1 means no limit."""
+    return -1 if page_size is None else page_size
+
+def iter_pages(cursor, func, *args, page_size=PAGE_SIZE):
+    """
+    Yield the pages of a paged SELECT function until it runs out, for exports.
+    Each page is a list of at most page_size rows.
+    """
+    after = None
+    while True:
+        page = func(cursor, *args, after=after, page_size=page_size)
+        if not page:
+            return
+        yield page
+        if len(page) < page_size:
+            return
+        after = page[-1]
+
+# Step 4: Define SELECT query functions
+# Results are served from query_cache until a table they read is written; streamed
+# results (stream=True) bypass it. `options` are passed to execute_select_query.
+# Functions taking `after` / `page_size` return one keyset page at a time.
+
+# 1. Query all area names
+@query_cache.cached_query("Area")
+def get_all_areas(cursor, after=None, page_size=None, **options):
+    sql = statements.get_paged("select.all_areas", after)
+    return execute_select_query(cursor, sql, params=keyset_params([0], after) + (page_limit(page_size),),
+                                **options)
+
+# 2. Query waiting list data for a specific year
+@query_cache.cached_query("Waiting_List_Data")
+def get_waiting_list_by_year(cursor, year, after=None, page_size=None, **options):
+    sql = statements.get_paged("select.waiting_list_by_year", after)
+    return execute_select_query(cursor, sql, params=(year,) + keyset_params([0], after) + (page_limit(page_size),),
+                                **options)
+
+# 3. Query housing data for a specific area
+@query_cache.cached_query("Affordable_Housing_Data")
+def get_housing_data_by_area(cursor, area_code, after=None, page_size=None, **options):
+    sql = statements.get_paged("select.housing_data_by_area", after)
+    return execute_select_query(cursor, sql,
+                                params=(area_code,) + keyset_params([0], after) + (page_limit(page_size),),
+                                **options)
+
+# 4. Query detailed data for a specific area and year
+# Area_Year_Facts (coursework1/database.py) holds this join precomputed; databases
+# built without it fall back to joining the source tables
+def has_table(cursor, table):
+    cursor.execute(statements.get("schema.has_table"), (table,))
+    return cursor.fetchone() is not None
+
+@query_cache.cached_query("Area", "Affordable_Housing_Data", "Waiting_List_Data")
+def get_area_details_by_year(cursor, area_code, year, **options):
+    if has_table(cursor, "Area_Year_Facts"):
+        return execute_select_query(cursor, statements.get("select.area_details_by_year"),
+                                    params=(area_code, year), **options)
+    return execute_select_query(cursor, statements.get("select.area_details_by_year.joined"),
+                                params=(area_code, year, year), **options)
+
+# 5. Query all unique years
+@query_cache.cached_query("Year")
+def get_unique_years(cursor, after=None, page_size=None, **options):
+    sql = statements.get_paged("select.unique_years", after)
+    return execute_select_query(cursor, sql, params=keyset_params([0], after) + (page_limit(page_size),),
+                                **options)
+
+# 6. Query areas with waiting list data exceeding a specified number
+# Ties on the count are ordered by (area_code, year), so (households_count, area_code, year)
+# is a unique key; idx_waiting_count carries the primary key and is already in that order
+@query_cache.cached_query("Waiting_List_Data")
+def get_areas_with_large_waiting_lists(cursor, min_households, after=None, page_size=None, **options):
+    sql = statements.get_paged("select.large_waiting_lists", after)
+    return execute_select_query(cursor, sql,
+                                params=(min_households,) + keyset_params([2, 0, 1], after)
+                                + (page_limit(page_size),),
+                                **options)
+
+# 7. Compare every area in a year: supply, demand and households waiting per home delivered
+@query_cache.cached_query("Area", "Affordable_Housing_Data", "Waiting_List_Data")
+def get_area_comparison_by_year(cursor, year, **options):
+    if has_table(cursor, "Area_Year_Facts"):
+        return execute_select_query(cursor, statements.get("select.area_comparison_by_year"),
+                                    params=(year,), **options)
+    return execute_select_query(cursor, statements.get("select.area_comparison_by_year.joined"),
+                                params=(year, year, year, year), **options)
+
+# Step 5: Main program execution
+if __name__ == "__main__":
+    if not db_path.exists():
+        print(f"Database not found: {db_path}")
+    else:
+        conn, cursor = get_db_connection(db_path)
+        if conn is None:
+            print("Failed to connect to the database. Program terminated.")
+            sys.exit(1)
+
+        while True:
+            print("\nSelect an option:")
+            print("1. Query all areas")
+            print("2. Query waiting list data by year")
+            print("3. Query housing data by area")
+            print("4. Query detailed data by area and year")
+            print("5. Query all unique years")
+            print("6. Query areas with large waiting lists")
+            print("7. Compare all areas in a year")
+            print("0. Exit")
+
+            choice = input("Enter your choice: ").strip()
+
+            if choice == "1":
+                print("\nAll Areas:")
+                areas = get_all_areas(cursor, stream=True)
+                for area in areas:
+                    print(area[0])
+
+            elif choice == "2":
+                year = input("Enter the year: ").strip()
+                print(f"\nWaiting List Data for Year {year}:")
+                waiting_list = get_waiting_list_by_year(cursor, year, stream=True)
+                for row in waiting_list:
+                    print(row)
+
+            elif choice == "3":
+                area_code = input("Enter the area code: ").strip()
+                print(f"\nHousing Data for Area Code {area_code}:")
+                housing_data = get_housing_data_by_area(cursor, area_code, stream=True)
+                for row in housing_data:
+                    print(row)
+
+            elif choice == "4":
+                area_code = input("Enter the area code: ").strip()
+                year = input("Enter the year: ").strip()
+                print(f"\nDetails for Area {area_code} in Year {year}:")
+                details = get_area_details_by_year(cursor, area_code, year)
+                for row in details:
+                    print(row)
+
+            elif choice == "5":
+                print("\nUnique Years:")
+                unique_years = get_unique_years(cursor, stream=True)
+                for year in unique_years:
+                    print(year[0])
+
+            elif choice == "6":
+                min_households = input("Enter the minimum number of households: ").strip()
+                print(f"\nAreas with Waiting Lists Greater than {min_households} Households:")
+                large_waiting_lists = get_areas_with_large_waiting_lists(cursor, min_households, stream=True)
+                for row in large_waiting_lists:
+                    print(row)
+
+            elif choice == "7":
+                year = input("Enter the year: ").strip()
+                print(f"\nAreas in Year {year} (area, name, housing units, households waiting, ratio):")
+                for row in get_area_comparison_by_year(cursor, year, stream=True):
+                    print(row)
+
+            elif choice == "0":
+                print("Exiting program.")
+                break
+
+            else:
+                print("Invalid choice. Please try again.")
+
+        # Close the connection
+        conn.close()
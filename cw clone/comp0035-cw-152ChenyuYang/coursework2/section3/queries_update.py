@@ -1,121 +1,256 @@
-import sqlite3
-from pathlib import Path
-
-
-# Step 1: Define the database path
-base_dir = Path(__file__).resolve().parent
-db_path = base_dir.parents[1] / "coursework1" / "database" / "local_authority_housing.db"
-
-
-# Step 2: Connecting to a database
-def get_db_connection(db_path):
-    """Establish connection to the SQLite database."""
-    try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute('PRAGMA foreign_keys = ON;')
-        conn.commit()
-        return conn, cursor
-    except sqlite3.Error as e:
-        print(f"An error occurred while connecting to the database: {e}")
-        return None, None
-
-
-# Step 3: Executing UPDATE queries
-def execute_update_query(cursor, sql, params=None):
-    """
-    Execute an UPDATE query and commit changes.
-    :param cursor: SQLite cursor
-    :param sql: The SQL query string
-    :param params: Parameters for the SQL query (optional)
-    """
-    try:
-        if params:
-            cursor.execute(sql, params)
-        else:
-            cursor.execute(sql)
-        cursor.connection.commit()
-        print("Update successful.")
-    except sqlite3.Error as e:
-        print(f"An error occurred during the update: {e}")
-
-
-# Step 4:UPDATE query function definition
-
-# 1. 更新地区名称
-def update_area_name(cursor):
-    try:
-        area_code = input("Enter area code to update: ").strip()
-        new_name = input("Enter new area name: ").strip()
-        sql = "UPDATE Area SET area_name = ? WHERE area_code = ?;"
-        execute_update_query(cursor, sql, params=(new_name, area_code))
-    except ValueError as e:
-        print(f"Invalid input: {e}")
-
-
-# 2. Update waiting list data for a specified year
-def update_waiting_list_by_year(cursor):
-    try:
-        year = int(input("Enter year: ").strip())
-        area_code = input("Enter area code: ").strip()
-        new_count = int(input("Enter new household count: ").strip())
-        sql = "UPDATE Waiting_List_Data SET households_count = ? WHERE year = ? AND area_code = ?;"
-        execute_update_query(cursor, sql, params=(new_count, year, area_code))
-    except ValueError as e:
-        print(f"Invalid input: {e}")
-
-
-# 3. Update housing data for a specified area
-def update_housing_data(cursor):
-    try:
-        area_code = input("Enter area code: ").strip()
-        year = int(input("Enter year: ").strip())
-        new_units = int(input("Enter new housing units: ").strip())
-        sql = "UPDATE Affordable_Housing_Data SET housing_units = ? WHERE area_code = ? AND year = ?;"
-        execute_update_query(cursor, sql, params=(new_units, area_code, year))
-    except ValueError as e:
-        print(f"Invalid input: {e}")
-
-
-# 4. Bulk update of waiting list data
-def update_all_waiting_lists(cursor):
-    try:
-        increment_by = int(input("Enter the number to increment household counts by: ").strip())
-        sql = "UPDATE Waiting_List_Data SET households_count = households_count + ?;"
-        execute_update_query(cursor, sql, params=(increment_by,))
-    except ValueError as e:
-        print(f"Invalid input: {e}")
-
-
-# Step 5: Main program 
-if __name__ == "__main__":
-    if not db_path.exists():
-        print(f"Database not found: {db_path}")
-    else:
-        conn, cursor = get_db_connection(db_path)
-
-        try:
-            print("\nChoose an operation:")
-            print("1. Update Area Name")
-            print("2. Update Waiting List Data for a Specific Year")
-            print("3. Update Housing Data for a Specific Area and Year")
-            print("4. Batch Update Waiting List Counts")
-
-            choice = int(input("Enter your choice (1-4): ").strip())
-
-            if choice == 1:
-                update_area_name(cursor)
-            elif choice == 2:
-                update_waiting_list_by_year(cursor)
-            elif choice == 3:
-                update_housing_data(cursor)
-            elif choice == 4:
-                update_all_waiting_lists(cursor)
-            else:
-                print("Invalid choice. Please select a number between 1 and 4.")
-
-        except ValueError as e:
-            print(f"Invalid input: {e}")
-        finally:
-            # close
-            conn.close()
+import sqlite3
+import sys
+from collections.abc import Mapping
+from pathlib import Path
+
+# Allow running as a script: python coursework2/section3/queries_update.py
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from coursework2 import connection, instrumentation, query_cache, statements
+from coursework2.section3.queries_insert import iter_rows
+
+
+# Step 1: Define the database path
+base_dir = Path(__file__).resolve().parent
+db_path = base_dir.parents[1] / "coursework1" / "database" / "local_authority_housing.db"
+
+
+# Step 2: Connecting to a database
+def get_db_connection(db_path):
+    """Borrow a connection from the shared pool; conn.close() hands it back."""
+    return connection.get_db_connection(db_path)
+
+
+# Step 3: Executing UPDATE queries
+def execute_update_query(cursor, sql, params=None):
+    """
+    Execute an UPDATE query and commit changes.
+    Inside a connection.transaction() block the commit is left to the block,
+    and errors are re-raised so the whole block rolls back.
+    :param cursor: SQLite cursor
+    :param sql: The SQL query string
+    :param params: Parameters for the SQL query (optional)
+    """
+    in_scope = connection.in_transaction_scope(cursor.connection)
+    try:
+        with instrumentation.track(cursor, "update", sql, params) as query:
+            if params:
+                cursor.execute(sql, params)
+            else:
+                cursor.execute(sql)
+            query.rows = cursor.rowcount
+        query_cache.invalidate_sql(cursor, sql)
+        if not in_scope:
+            cursor.connection.commit()
+        print("Update successful.")
+    except sqlite3.Error as e:
+        print(f"An error occurred during the update: {e}")
+        if in_scope:
+            raise
+
+
+# Step 4: Set-based UPDATE functions
+# Table -> (key columns, value column) for the tables the bulk updates can target
+UPDATE_TARGETS = {
+    "Area": (("area_code",), "area_name"),
+    "Affordable_Housing_Data": (("area_code", "year"), "housing_units"),
+    "Waiting_List_Data": (("area_code", "year"), "households_count"),
+}
+
+# UPDATE ... FROM needs SQLite 3.33; older builds use a correlated subquery instead
+HAS_UPDATE_FROM = sqlite3.sqlite_version_info >= (3, 33, 0)
+
+STAGING_TABLE = "temp.bulk_update_staging"
+
+
+def iter_update_rows(data, columns):
+    """
+    Yield (key..., new value) tuples from a mapping of key -> new value, or from
+    anything iter_rows accepts (DataFrame, dicts or tuples in column order).
+    Mapping keys are area codes or (area_code, year) tuples.
+    """
+    if isinstance(data, Mapping):
+        for key, value in data.items():
+            key = key if isinstance(key, tuple) else (key,)
+            yield (*key, value)
+    else:
+        yield from iter_rows(data, columns)
+
+
+def build_bulk_update_statements(table, key_columns, value_column):
+    """
+    Build the statements of one bulk update target, once at import: they join the
+    temp staging table, so they cannot be checked by statements.validate().
+    :return: Dict of step -> SQL string
+    """
+    columns = key_columns + (value_column,)
+    join = " AND ".join(f"{table}.{col} = s.{col}" for col in key_columns)
+    if HAS_UPDATE_FROM:
+        update = (f"UPDATE {table} SET {value_column} = s.new_value "
+                  f"FROM {STAGING_TABLE} AS s "
+                  f"WHERE {join} AND {table}.{value_column} IS NOT s.new_value;")
+    else:
+        update = (f"UPDATE {table} SET {value_column} = "
+                  f"(SELECT s.new_value FROM {STAGING_TABLE} AS s WHERE {join}) "
+                  f"WHERE EXISTS (SELECT 1 FROM {STAGING_TABLE} AS s "
+                  f"WHERE {join} AND {table}.{value_column} IS NOT s.new_value);")
+    return {
+        "create": (f"CREATE TABLE {STAGING_TABLE} ({', '.join(key_columns + ('new_value',))}, "
+                   f"PRIMARY KEY ({', '.join(key_columns)}));"),
+        "stage": f"INSERT OR REPLACE INTO {STAGING_TABLE} VALUES ({', '.join('?' for _ in columns)});",
+        "match": (f"SELECT COUNT(*) FROM {table} AS t JOIN {STAGING_TABLE} AS s ON "
+                  + " AND ".join(f"t.{col} = s.{col}" for col in key_columns) + ";"),
+        "update": update,
+    }
+
+
+# Table -> its bulk update statements
+BULK_UPDATE_SQL = {table: build_bulk_update_statements(table, key_columns, value_column)
+                   for table, (key_columns, value_column) in UPDATE_TARGETS.items()}
+DROP_STAGING_SQL = f"DROP TABLE IF EXISTS {STAGING_TABLE};"
+
+
+def execute_bulk_update(cursor, table, data):
+    """
+    Set the value column of many rows of a table in one statement.
+    The new values are staged in a temp table (a later value for the same key
+    wins) and applied with a single join; rows that already hold the new value
+    are left alone. Runs inside connection.transaction(), so it joins an open
+    block, and errors are raised rather than printed.
+    :param cursor: SQLite cursor
+    :param table: One of UPDATE_TARGETS
+    :param data: Mapping of key -> new value, DataFrame, or rows of key columns + value
+    :return: Dict with the number of rows "matched" and "changed"
+    """
+    key_columns, value_column = UPDATE_TARGETS[table]
+    sql = BULK_UPDATE_SQL[table]
+
+    with connection.transaction(cursor):
+        cursor.execute(DROP_STAGING_SQL)
+        cursor.execute(sql["create"])
+        try:
+            cursor.executemany(sql["stage"], iter_update_rows(data, key_columns + (value_column,)))
+            matched = cursor.execute(sql["match"]).fetchone()[0]
+            with instrumentation.track(cursor, "update", sql["update"]) as query:
+                cursor.execute(sql["update"])
+                changed = query.rows = cursor.rowcount
+            query_cache.invalidate_tables(cursor, table)
+        finally:
+            cursor.execute(DROP_STAGING_SQL)
+    return {"matched": matched, "changed": changed}
+
+
+def update_area_names(cursor, names):
+    """
+    Rename many areas at once.
+    :param names: Mapping of area_code -> area_name, or (area_code, area_name) rows
+    :return: Dict with the number of rows "matched" and "changed"
+    """
+    return execute_bulk_update(cursor, "Area", names)
+
+
+def update_housing_units(cursor, rows):
+    """
+    Correct many affordable housing figures at once.
+    :param rows: Mapping of (area_code, year) -> housing_units, DataFrame or rows
+    :return: Dict with the number of rows "matched" and "changed"
+    """
+    return execute_bulk_update(cursor, "Affordable_Housing_Data", rows)
+
+
+def update_waiting_list_counts(cursor, rows):
+    """
+    Correct many waiting list counts at once.
+    :param rows: Mapping of (area_code, year) -> households_count, DataFrame or rows
+    :return: Dict with the number of rows "matched" and "changed"
+    """
+    return execute_bulk_update(cursor, "Waiting_List_Data", rows)
+
+
+def report_bulk_update(cursor, update, data):
+    """Run one of the bulk updates for the interactive menu and print its outcome."""
+    try:
+        result = update(cursor, data)
+        print(f"Update successful: {result['matched']} row(s) matched, {result['changed']} changed.")
+    except sqlite3.Error as e:
+        print(f"An error occurred during the update: {e}")
+
+
+# Step 5: Interactive UPDATE functions
+
+# 1. 更新地区名称
+def update_area_name(cursor):
+    try:
+        area_code = input("Enter area code to update: ").strip()
+        new_name = input("Enter new area name: ").strip()
+        report_bulk_update(cursor, update_area_names, {area_code: new_name})
+    except ValueError as e:
+        print(f"Invalid input: {e}")
+
+
+# 2. Update waiting list data for a specified year
+def update_waiting_list_by_year(cursor):
+    try:
+        year = int(input("Enter year: ").strip())
+        area_code = input("Enter area code: ").strip()
+        new_count = int(input("Enter new household count: ").strip())
+        report_bulk_update(cursor, update_waiting_list_counts, {(area_code, year): new_count})
+    except ValueError as e:
+        print(f"Invalid input: {e}")
+
+
+# 3. Update housing data for a specified area
+def update_housing_data(cursor):
+    try:
+        area_code = input("Enter area code: ").strip()
+        year = int(input("Enter year: ").strip())
+        new_units = int(input("Enter new housing units: ").strip())
+        report_bulk_update(cursor, update_housing_units, {(area_code, year): new_units})
+    except ValueError as e:
+        print(f"Invalid input: {e}")
+
+
+# 4. Bulk update of waiting list data
+def update_all_waiting_lists(cursor):
+    try:
+        increment_by = int(input("Enter the number to increment household counts by: ").strip())
+        execute_update_query(cursor, statements.get("update.increment_waiting_lists"), params=(increment_by,))
+    except ValueError as e:
+        print(f"Invalid input: {e}")
+
+
+# Step 6: Main program 
+if __name__ == "__main__":
+    if not db_path.exists():
+        print(f"Database not found: {db_path}")
+    else:
+        conn, cursor = get_db_connection(db_path)
+        if conn is None:
+            print("Failed to connect to the database. Program terminated.")
+            sys.exit(1)
+
+        try:
+            print("\nChoose an operation:")
+            print("1. Update Area Name")
+            print("2. Update Waiting List Data for a Specific Year")
+            print("3. Update Housing Data for a Specific Area and Year")
+            print("4. Batch Update Waiting List Counts")
+
+            choice = int(input("Enter your choice (1-4): ").strip())
+
+            if choice == 1:
+                update_area_name(cursor)
+            elif choice == 2:
+                update_waiting_list_by_year(cursor)
+            elif choice == 3:
+                update_housing_data(cursor)
+            elif choice == 4:
+                update_all_waiting_lists(cursor)
+            else:
+                print("Invalid choice. Please select a number between 1 and 4.")
+
+        except ValueError as e:
+            print(f"Invalid input: {e}")
+        finally:
+            # close
+            conn.close()
@@ -0,0 +1,457 @@
+import sqlite3
+from collections import namedtuple
+
+
+# Step 1: Settings
+# Prepared statements sqlite3 keeps per connection (its default is 128). Every registered
+# statement fits with room to spare for ad-hoc ones, so each is compiled once per
+# connection and reused on every later call
+STATEMENT_CACHE_SIZE = 256
+
+# One named statement. `version` is bumped whenever the SQL changes meaning; `requires`
+# lists the optional tables (derived or manifest) it reads, see validate()
+Statement = namedtuple("Statement", ["name", "version", "sql", "requires"])
+
+# Tables a database may lack: built before they were added, or never built (see the
+# has_table fallbacks in coursework2/section3)
+DERIVED_TABLES = ("Area_Year_Facts", "Fact_Rollup")
+MANIFEST_TABLES = ("Ingest_Manifest", "Ingest_Row_Digest")
+
+
+class StatementError(sqlite3.DatabaseError):
+    """A registered statement does not compile against the database schema."""
+
+
+# Step 2: The registry
+_registry = {}
+
+
+def register(name, sql, version=1, requires=()):
+    """
+    Add a named statement. The SQL text is final: callers bind parameters only,
+    so the same string reaches sqlite3's statement cache on every call.
+    :param name: Unique name, "<module>.<function>[.<variant>]"
+    :param sql: The SQL text
+    :param version: Version of the statement
+    :param requires: Optional tables the statement reads
+    :return: The SQL text
+    """
+    if name in _registry:
+        raise ValueError(f"Statement {name!r} is already registered")
+    _registry[name] = Statement(name, version, sql, tuple(requires))
+    return sql
+
+
+def register_paged(name, sql, keyset, version=1, requires=()):
+    """
+    Register a keyset-paged SELECT twice: `name` for the first page and `name.after`
+    for the later ones, with `keyset` filled in for {keyset}.
+    """
+    register(name, sql.format(keyset=""), version, requires)
+    register(f"{name}.after", sql.format(keyset=keyset), version, requires)
+
+
+def get(name):
+    """Return the SQL text of a registered statement."""
+    return _registry[name].sql
+
+
+def get_paged(name, after):
+    """Return the first-page or later-page SQL of a paged statement."""
+    return _registry[name if after is None else f"{name}.after"].sql
+
+
+def get_statements():
+    """Return every registered statement: {name: Statement}."""
+    return dict(_registry)
+
+
+def validate(conn):
+    """
+    Compile every registered statement against the database schema. EXPLAIN prepares a
+    statement without running it, so writes are checked on read-only connections too.
+    Statements whose optional tables are missing are skipped, as their callers fall back.
+    Databases with user_version 0 were not built by coursework1/database.py and are not checked.
+    :param conn: SQLite connection
+    :return: Number of statements checked
+    :raise StatementError: Listing every statement that does not compile
+    """
+    if conn.execute("PRAGMA user_version;").fetchone()[0] == 0:
+        return 0
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table';")}
+    checked, errors = 0, []
+    for statement in _registry.values():
+        if not tables.issuperset(statement.requires):
+            continue
+        try:
+            conn.execute("EXPLAIN " + statement.sql, (None,) * statement.sql.count("?")).fetchall()
+        except sqlite3.Error as e:
+            errors.append(f"{statement.name} (v{statement.version}): {e}")
+        checked += 1
+    if errors:
+        raise StatementError("Statements do not match the database schema:\n  " + "\n  ".join(errors))
+    return checked
+
+
+# Step 3: SELECT statements (coursework2/section3/queries_select.py)
+# Keyset pages start strictly after the key of the previous page's last row
+register("schema.has_table", "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?;")
+
+register_paged("select.all_areas",
+               "SELECT DISTINCT area_name FROM Area {keyset} ORDER BY area_name ASC LIMIT ?;",
+               keyset="WHERE (area_name) > (?)")
+
+register_paged("select.waiting_list_by_year", """
+    SELECT area_code, households_count
+    FROM Waiting_List_Data
+    WHERE year = ? {keyset}
+    ORDER BY area_code ASC
+    LIMIT ?;
+    """, keyset="AND (area_code) > (?)")
+
+register_paged("select.housing_data_by_area", """
+    SELECT year, housing_units
+    FROM Affordable_Housing_Data
+    WHERE area_code = ? {keyset}
+    ORDER BY year ASC
+    LIMIT ?;
+    """, keyset="AND (year) > (?)")
+
+register("select.area_details_by_year", """
+        SELECT area_name, housing_units, households_count
+        FROM Area_Year_Facts
+        WHERE area_code = ? AND year = ? AND housing_units IS NOT NULL AND households_count IS NOT NULL;
+        """, requires=["Area_Year_Facts"])
+
+register("select.area_details_by_year.joined", """
+    SELECT
+        Area.area_name,
+        Affordable_Housing_Data.housing_units,
+        Waiting_List_Data.households_count
+    FROM Area
+    JOIN Affordable_Housing_Data ON Area.area_code = Affordable_Housing_Data.area_code
+    JOIN Waiting_List_Data ON Area.area_code = Waiting_List_Data.area_code
+    WHERE Area.area_code = ? AND Affordable_Housing_Data.year = ? AND Waiting_List_Data.year = ?;
+    """)
+
+register_paged("select.unique_years",
+               "SELECT DISTINCT year FROM Year {keyset} ORDER BY year ASC LIMIT ?;",
+               keyset="WHERE (year) > (?)")
+
+register_paged("select.large_waiting_lists", """
+    SELECT area_code, year, households_count
+    FROM Waiting_List_Data
+    WHERE households_count > ? {keyset}
+    ORDER BY households_count DESC, area_code DESC, year DESC
+    LIMIT ?;
+    """, keyset="AND (households_count, area_code, year) < (?, ?, ?)")
+
+register("select.area_comparison_by_year", """
+        SELECT area_code, area_name, housing_units, households_count, ratio
+        FROM Area_Year_Facts
+        WHERE year = ?
+        ORDER BY ratio DESC;
+        """, requires=["Area_Year_Facts"])
+
+register("select.area_comparison_by_year.joined", """
+    SELECT keys.area_code, Area.area_name, h.housing_units, w.households_count,
+           CAST(w.households_count AS REAL) / NULLIF(h.housing_units, 0) AS ratio
+    FROM (SELECT area_code FROM Affordable_Housing_Data WHERE year = ?
+          UNION SELECT area_code FROM Waiting_List_Data WHERE year = ?) AS keys
+    JOIN Area ON Area.area_code = keys.area_code
+    LEFT JOIN Affordable_Housing_Data AS h ON h.area_code = keys.area_code AND h.year = ?
+    LEFT JOIN Waiting_List_Data AS w ON w.area_code = keys.area_code AND w.year = ?
+    ORDER BY ratio DESC;
+    """)
+
+
+# Step 4: Aggregate statements (coursework2/section3/queries_aggregate.py)
+# Each rollup read has a `.fallback` aggregating the fact table, for databases without Fact_Rollup
+register("aggregate.total_housing_units_by_year", """
+    SELECT (SELECT total FROM Fact_Rollup
+            WHERE table_name = 'Affordable_Housing_Data' AND scope = 'year' AND scope_key = ?);
+    """, requires=["Fact_Rollup"])
+
+register("aggregate.total_housing_units_by_year.fallback", """
+    SELECT SUM(housing_units)
+    FROM Affordable_Housing_Data
+    WHERE year = ?;
+    """)
+
+register("aggregate.avg_waiting_list", """
+    SELECT (SELECT CAST(total AS REAL) / row_count FROM Fact_Rollup
+            WHERE table_name = 'Waiting_List_Data' AND scope = 'all');
+    """, requires=["Fact_Rollup"])
+
+register("aggregate.avg_waiting_list.fallback", "SELECT AVG(households_count) FROM Waiting_List_Data;")
+
+register("aggregate.housing_units_statistics", """
+    SELECT total, CAST(total AS REAL) / row_count, min_value, max_value
+    FROM (SELECT NULL) LEFT JOIN Fact_Rollup
+        ON table_name = 'Affordable_Housing_Data' AND scope = 'all';
+    """, requires=["Fact_Rollup"])
+
+register("aggregate.housing_units_statistics.fallback", """
+    SELECT
+        SUM(housing_units) AS total_units,
+        AVG(housing_units) AS avg_units,
+        MIN(housing_units) AS min_units,
+        MAX(housing_units) AS max_units
+    FROM Affordable_Housing_Data;
+    """)
+
+# verify_rollups: every stored rollup row, and the same groups recomputed from the fact tables
+register("aggregate.stored_rollups", "SELECT table_name, scope, scope_key, total, row_count, min_value, max_value "
+                                     "FROM Fact_Rollup;", requires=["Fact_Rollup"])
+
+register("aggregate.recomputed_rollups", """
+    SELECT 'Affordable_Housing_Data', 'year', CAST(year AS TEXT),
+           SUM(housing_units), COUNT(*), MIN(housing_units), MAX(housing_units)
+    FROM Affordable_Housing_Data GROUP BY CAST(year AS TEXT)
+    UNION ALL
+    SELECT 'Affordable_Housing_Data', 'area', CAST(area_code AS TEXT),
+           SUM(housing_units), COUNT(*), MIN(housing_units), MAX(housing_units)
+    FROM Affordable_Housing_Data GROUP BY CAST(area_code AS TEXT)
+    UNION ALL
+    SELECT 'Affordable_Housing_Data', 'all', '',
+           SUM(housing_units), COUNT(*), MIN(housing_units), MAX(housing_units)
+    FROM Affordable_Housing_Data GROUP BY ''
+    UNION ALL
+    SELECT 'Waiting_List_Data', 'year', CAST(year AS TEXT),
+           SUM(households_count), COUNT(*), MIN(households_count), MAX(households_count)
+    FROM Waiting_List_Data GROUP BY CAST(year AS TEXT)
+    UNION ALL
+    SELECT 'Waiting_List_Data', 'area', CAST(area_code AS TEXT),
+           SUM(households_count), COUNT(*), MIN(households_count), MAX(households_count)
+    FROM Waiting_List_Data GROUP BY CAST(area_code AS TEXT)
+    UNION ALL
+    SELECT 'Waiting_List_Data', 'all', '',
+           SUM(households_count), COUNT(*), MIN(households_count), MAX(households_count)
+    FROM Waiting_List_Data GROUP BY '';
+    """)
+
+
+# Top-k / bottom-k: "aggregate.top_waiting_lists" for all rows, ".year" for one year and
+# ".per_year" for a leaderboard per year; "aggregate.bottom_waiting_lists..." likewise
+def register_extreme_statements():
+    for largest in (True, False):
+        order, reverse, beyond = ("DESC", "ASC", ">=") if largest else ("ASC", "DESC", "<=")
+        name = "aggregate.top_waiting_lists" if largest else "aggregate.bottom_waiting_lists"
+        for suffix, year_filter in [("", ""), (".year", "AND year = ?")]:
+            register(name + suffix, f"""
+        SELECT area_code, year, households_count
+        FROM Waiting_List_Data
+        WHERE households_count IS NOT NULL {year_filter}
+          AND households_count {beyond} COALESCE(
+              (SELECT households_count FROM Waiting_List_Data
+               WHERE households_count IS NOT NULL {year_filter}
+               ORDER BY households_count {order} LIMIT 1 OFFSET ?),
+              (SELECT households_count FROM Waiting_List_Data
+               WHERE households_count IS NOT NULL {year_filter}
+               ORDER BY households_count {reverse} LIMIT 1))
+        ORDER BY households_count {order}, year, area_code;
+        """)
+        # One cutoff seek per year, materialized so it is not re-run for every row; years with
+        # fewer than k rows fall back to their last row, keeping them all. The years come
+        # from the Year table: DISTINCT over the fact table would scan it
+        register(name + ".per_year", f"""
+            WITH cutoff AS MATERIALIZED (
+                SELECT years.year,
+                       COALESCE(
+                           (SELECT households_count FROM Waiting_List_Data
+                            WHERE year = years.year AND households_count IS NOT NULL
+                            ORDER BY households_count {order} LIMIT 1 OFFSET ?),
+                           (SELECT households_count FROM Waiting_List_Data
+                            WHERE year = years.year AND households_count IS NOT NULL
+                            ORDER BY households_count {reverse} LIMIT 1)) AS value
+                FROM Year AS years
+            )
+            SELECT w.area_code, w.year, w.households_count
+            FROM cutoff
+            CROSS JOIN Waiting_List_Data AS w ON w.year = cutoff.year
+            WHERE w.households_count {beyond} cutoff.value
+            ORDER BY w.year, w.households_count {order}, w.area_code;
+            """)
+
+
+register_extreme_statements()
+
+
+# Step 5: JOIN statements (coursework2/section3/queries_join.py)
+# (area_code, year) pairs that actually have data. Area_Year_Facts holds exactly
+# these; databases built without it fall back to the union of the fact tables.
+# One statement per filter shape: "join.area_and_year[.area][.year][.union]"
+FACT_KEYS_SQL = {
+    True: "Area_Year_Facts",
+    False: "(SELECT area_code, year FROM Affordable_Housing_Data "
+           "UNION SELECT area_code, year FROM Waiting_List_Data)",
+}
+
+
+def get_join_name(by_area_name, by_year, use_facts):
+    """Name of the join statement for one filter shape."""
+    return ("join.area_and_year" + (".area" if by_area_name else "") + (".year" if by_year else "")
+            + ("" if use_facts else ".union"))
+
+
+def register_join_statements():
+    for by_area_name in (False, True):
+        for by_year in (False, True):
+            filters = (["Area.area_name = ? COLLATE NOCASE"] if by_area_name else []) + \
+                      (["keys.year = ?"] if by_year else [])
+            where = f"WHERE {' AND '.join(filters)}" if filters else ""
+            for use_facts in (True, False):
+                register(get_join_name(by_area_name, by_year, use_facts), f"""
+        SELECT Area.area_name, keys.year
+        FROM Area
+        JOIN {FACT_KEYS_SQL[use_facts]} AS keys ON keys.area_code = Area.area_code
+        {where}
+        ORDER BY Area.area_name, keys.year;
+        """, requires=["Area_Year_Facts"] if use_facts else [])
+
+
+register_join_statements()
+
+
+# Step 6: INSERT statements (coursework2/section3/queries_insert.py)
+register("insert.area", "INSERT INTO Area (area_code, area_name) VALUES (?, ?);")
+register("insert.year", "INSERT INTO Year (year) VALUES (?);")
+register("insert.housing_data", """
+    INSERT INTO Affordable_Housing_Data (area_code, year, housing_units)
+    VALUES (?, ?, ?);
+    """)
+register("insert.waiting_list_data", """
+    INSERT INTO Waiting_List_Data (area_code, year, households_count)
+    VALUES (?, ?, ?);
+    """)
+
+# Bulk inserts, "insert.many.<table>.<on_conflict>": table -> (columns, key columns)
+BULK_INSERT_TARGETS = {
+    "Area": (("area_code", "area_name"), ("area_code",)),
+    "Year": (("year",), ("year",)),
+    "Affordable_Housing_Data": (("area_code", "year", "housing_units"), ("area_code", "year")),
+    "Waiting_List_Data": (("area_code", "year", "households_count"), ("area_code", "year")),
+}
+
+
+def register_bulk_insert_statements():
+    for table, (columns, key_columns) in BULK_INSERT_TARGETS.items():
+        # 'update' needs a PRIMARY KEY or UNIQUE constraint on the key columns
+        insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+        value_columns = [column for column in columns if column not in key_columns]
+        if value_columns:
+            update = f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET " + ", ".join(
+                f"{column} = excluded.{column}" for column in value_columns)
+        else:
+            update = "ON CONFLICT DO NOTHING"
+        register(f"insert.many.{table}.error", f"{insert};")
+        register(f"insert.many.{table}.ignore", f"{insert} ON CONFLICT DO NOTHING;")
+        register(f"insert.many.{table}.update", f"{insert} {update};")
+
+
+register_bulk_insert_statements()
+
+
+# Step 7: UPDATE statements (coursework2/section3/queries_update.py)
+# The bulk updates join a per-call temp staging table, so they are built once per
+# target in queries_update.py rather than registered here
+register("update.increment_waiting_lists",
+         "UPDATE Waiting_List_Data SET households_count = households_count + ?;")
+
+
+# Step 8: DELETE statements (coursework2/section3/queries_delete.py)
+# clear_all_data reads the CREATE statements of the tables it empties (a JSON list of names)
+register("delete.table_definitions", """
+    SELECT sql FROM sqlite_master
+    WHERE tbl_name IN (SELECT value FROM json_each(?)) AND sql IS NOT NULL
+    ORDER BY type = 'table' DESC, rowid;
+    """)
+
+
+def register_delete_statements():
+    # "delete.<table>.by_<column>": the purges and the single-table deletes
+    for table, key_column in [("Affordable_Housing_Data", "area_code"), ("Waiting_List_Data", "area_code"),
+                              ("Area", "area_code"), ("Affordable_Housing_Data", "year"),
+                              ("Waiting_List_Data", "year"), ("Year", "year")]:
+        register(f"delete.{table}.by_{key_column}", f"DELETE FROM {table} WHERE {key_column} = ?;")
+    # "delete.drop.<table>": clear_all_data drops every table, then recreates it
+    for table in ("Affordable_Housing_Data", "Waiting_List_Data", "Area", "Year",
+                  *DERIVED_TABLES, *MANIFEST_TABLES):
+        register(f"delete.drop.{table}", f"DROP TABLE {table};", requires=[table])
+
+
+register_delete_statements()
+
+
+# Step 9: Windowed trend statements (coursework2/section3/queries_analytics.py)
+# Fact table -> value column
+TREND_TABLES = {
+    "Affordable_Housing_Data": "housing_units",
+    "Waiting_List_Data": "households_count",
+}
+
+# Trend column -> window expression over the value column {value}.
+# by_area orders each borough's rows by year; the rolling mean uses a RANGE frame
+# on year, so a missing year shortens the window instead of reaching further back.
+# Its frame size (window - 1 years) is the statement's first parameter.
+TREND_COLUMNS = {
+    "previous_year": "LAG(year) OVER by_area",
+    "previous": "LAG({value}) OVER by_area",
+    "yoy_change": "{value} - LAG({value}) OVER by_area",
+    "yoy_pct": "100.0 * ({value} - LAG({value}) OVER by_area) / NULLIF(LAG({value}) OVER by_area, 0)",
+    "rolling_mean": "AVG({value}) OVER (by_area RANGE BETWEEN ? PRECEDING AND CURRENT ROW)",
+    "cumulative": "SUM({value}) OVER (by_area ROWS UNBOUNDED PRECEDING)",
+    "year_rank": "RANK() OVER (PARTITION BY year ORDER BY {value} DESC)",
+}
+
+# year_rank for rows of one borough: the window would need every borough, so count
+# the larger values of the same year instead (a seek per row; values are NOT NULL)
+YEAR_RANK_SEEK = ("1 + (SELECT COUNT(*) FROM {table} AS other "
+                  "WHERE other.year = {table}.year AND other.{value} > {table}.{value})")
+
+# Column set -> trend columns, one per analytics function
+TREND_COLUMN_SETS = {
+    "yoy": ("previous_year", "previous", "yoy_change", "yoy_pct"),
+    "rolling": ("rolling_mean",),
+    "cumulative": ("cumulative",),
+    "ranks": ("year_rank",),
+    "all": tuple(TREND_COLUMNS),
+}
+
+
+def get_trend_name(column_set, table, by_area, by_year):
+    """Name of the trend statement for one column set, table and filter shape."""
+    return f"analytics.{column_set}.{table}" + (".area" if by_area else "") + (".year" if by_year else "")
+
+
+def register_trend_statements():
+    # Each filter runs before the windows it cannot change and after the others: the
+    # by_area windows only read one borough, so the area filter runs first (one primary
+    # key seek), while the year filter runs last so that the first selected year still
+    # has its previous year. The cross-area year_rank is the other way round.
+    for table, value in TREND_TABLES.items():
+        for column_set, columns in TREND_COLUMN_SETS.items():
+            by_area_windows = columns != ("year_rank",)
+            inner, outer = ("area_code", "year") if by_area_windows else ("year", "area_code")
+            for by_area in (False, True):
+                for by_year in (False, True):
+                    expressions = ",\n               ".join(
+                        (YEAR_RANK_SEEK.format(table=table, value=value)
+                         if column == "year_rank" and by_area_windows and by_area
+                         else TREND_COLUMNS[column].format(value=value)) + f" AS {column}"
+                        for column in columns)
+                    inner_filtered, outer_filtered = (by_area, by_year) if by_area_windows else (by_year, by_area)
+                    register(get_trend_name(column_set, table, by_area, by_year), f"""
+    SELECT * FROM (
+        SELECT area_code, year, {value} AS value,
+               {expressions}
+        FROM {table}
+        {f"WHERE {inner} = ?" if inner_filtered else ""}
+        WINDOW by_area AS (PARTITION BY area_code ORDER BY year)
+    )
+    {f"WHERE {outer} = ?" if outer_filtered else ""}
+    ORDER BY area_code, year;
+    """)
+
+
+register_trend_statements()
@@ -1,112 +1,235 @@
-import pytest
-import sqlite3
-from coursework2.section3.queries_aggregate import (
-    get_total_housing_units_by_year,
-    get_avg_waiting_list,
-    get_max_waiting_list,
-    get_min_waiting_list,
-    get_housing_units_statistics,
-)
-
-# Mock database setup
-@pytest.fixture(scope="function")
-def setup_test_database():
-    """
-    Set up an in-memory SQLite database for testing.
-    The database will be fresh for each test.
-    """
-    conn = sqlite3.connect(":memory:")
-    cursor = conn.cursor()
-
-    # Enable foreign key constraints
-    cursor.execute("PRAGMA foreign_keys = ON;")
-
-    # Create mock tables and insert test data
-    cursor.executescript("""
-    CREATE TABLE Affordable_Housing_Data (
-        area_code TEXT,
-        year INTEGER,
-        housing_units INTEGER
-    );
-
-    CREATE TABLE Waiting_List_Data (
-        area_code TEXT,
-        year INTEGER,
-        households_count INTEGER
-    );
-
-    INSERT INTO Affordable_Housing_Data (area_code, year, housing_units) VALUES
-        ('A1', 2020, 100),
-        ('A1', 2021, 150),
-        ('A2', 2020, 200),
-        ('A2', 2021, 250);
-
-    INSERT INTO Waiting_List_Data (area_code, year, households_count) VALUES
-        ('A1', 2020, 50),
-        ('A1', 2021, 60),
-        ('A2', 2020, 30),
-        ('A2', 2021, 80);
-    """)
-
-    yield conn, cursor
-    conn.close()
-
-
-def test_get_total_housing_units_by_year(setup_test_database):
-    """
-    Test the total housing units by year.
-    """
-    conn, cursor = setup_test_database
-
-    # Test for year 2020
-    result = get_total_housing_units_by_year(cursor, 2020)
-    assert result == [(300,)], "The total housing units for 2020 should be 300."
-
-    # Test for year 2021
-    result = get_total_housing_units_by_year(cursor, 2021)
-    assert result == [(400,)], "The total housing units for 2021 should be 400."
-
-
-def test_get_avg_waiting_list(setup_test_database):
-    """
-    Test the average waiting list count.
-    """
-    conn, cursor = setup_test_database
-
-    # Test average calculation
-    result = get_avg_waiting_list(cursor)
-    assert result == [(55.0,)], "The average waiting list count should be 55.0."
-
-
-def test_get_max_waiting_list(setup_test_database):
-    """
-    Test the maximum waiting list count.
-    """
-    conn, cursor = setup_test_database
-
-    # Test maximum waiting list
-    result = get_max_waiting_list(cursor)
-    assert result == [('A2', 2021, 80)], "The area with the max waiting list should be ('A2', 2021, 80)."
-
-
-def test_get_min_waiting_list(setup_test_database):
-    """
-    Test the minimum waiting list count.
-    """
-    conn, cursor = setup_test_database
-
-    # Test minimum waiting list
-    result = get_min_waiting_list(cursor)
-    assert result == [('A2', 2020, 30)], "The area with the min waiting list should be ('A2', 2020, 30)."
-
-
-def test_get_housing_units_statistics(setup_test_database):
-    """
-    Test the housing units statistics.
-    """
-    conn, cursor = setup_test_database
-
-    # Test housing units statistics
-    result = get_housing_units_statistics(cursor)
-    expected = [(700, 175.0, 100, 250)]
-    assert result == expected, f"The housing units statistics should be {expected}."
+import pytest
+import sqlite3
+from coursework2.section3.queries_aggregate import (
+    get_total_housing_units_by_year,
+    get_avg_waiting_list,
+    get_max_waiting_list,
+    get_min_waiting_list,
+    get_housing_units_statistics,
+    get_top_waiting_lists,
+    get_bottom_waiting_lists,
+    verify_rollups,
+)
+from coursework1.database import SCHEMA_SQL, ROLLUP_SQL, build_fact_rollups
+
+# Mock database setup
+@pytest.fixture(scope="function")
+def setup_test_database():
+    """
+    Set up an in-memory SQLite database for testing.
+    The database will be fresh for each test.
+    """
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+
+    # Enable foreign key constraints
+    cursor.execute("PRAGMA foreign_keys = ON;")
+
+    # Create mock tables and insert test data
+    cursor.executescript("""
+    CREATE TABLE Year (
+        year INTEGER PRIMARY KEY
+    );
+
+    CREATE TABLE Affordable_Housing_Data (
+        area_code TEXT,
+        year INTEGER,
+        housing_units INTEGER
+    );
+
+    CREATE TABLE Waiting_List_Data (
+        area_code TEXT,
+        year INTEGER,
+        households_count INTEGER
+    );
+
+    INSERT INTO Year (year) VALUES (2020), (2021);
+
+    INSERT INTO Affordable_Housing_Data (area_code, year, housing_units) VALUES
+        ('A1', 2020, 100),
+        ('A1', 2021, 150),
+        ('A2', 2020, 200),
+        ('A2', 2021, 250);
+
+    INSERT INTO Waiting_List_Data (area_code, year, households_count) VALUES
+        ('A1', 2020, 50),
+        ('A1', 2021, 60),
+        ('A2', 2020, 30),
+        ('A2', 2021, 80);
+    """)
+
+    yield conn, cursor
+    conn.close()
+
+
+def test_get_total_housing_units_by_year(setup_test_database):
+    """
+    Test the total housing units by year.
+    """
+    conn, cursor = setup_test_database
+
+    # Test for year 2020
+    result = get_total_housing_units_by_year(cursor, 2020)
+    assert result == [(300,)], "The total housing units for 2020 should be 300."
+
+    # Test for year 2021
+    result = get_total_housing_units_by_year(cursor, 2021)
+    assert result == [(400,)], "The total housing units for 2021 should be 400."
+
+
+def test_get_avg_waiting_list(setup_test_database):
+    """
+    Test the average waiting list count.
+    """
+    conn, cursor = setup_test_database
+
+    # Test average calculation
+    result = get_avg_waiting_list(cursor)
+    assert result == [(55.0,)], "The average waiting list count should be 55.0."
+
+
+def test_get_max_waiting_list(setup_test_database):
+    """
+    Test the maximum waiting list count.
+    """
+    conn, cursor = setup_test_database
+
+    # Test maximum waiting list
+    result = get_max_waiting_list(cursor)
+    assert result == [('A2', 2021, 80)], "The area with the max waiting list should be ('A2', 2021, 80)."
+
+
+def test_get_min_waiting_list(setup_test_database):
+    """
+    Test the minimum waiting list count.
+    """
+    conn, cursor = setup_test_database
+
+    # Test minimum waiting list
+    result = get_min_waiting_list(cursor)
+    assert result == [('A2', 2020, 30)], "The area with the min waiting list should be ('A2', 2020, 30)."
+
+
+def test_get_max_waiting_list_returns_ties(setup_test_database):
+    """
+    GIVEN two areas tied on the highest waiting list count
+    WHEN calling `get_max_waiting_list`
+    THEN both rows should be returned.
+    """
+    conn, cursor = setup_test_database
+    cursor.execute("INSERT INTO Waiting_List_Data VALUES ('A3', 2020, 80);")
+
+    result = get_max_waiting_list(cursor)
+    assert result == [('A3', 2020, 80), ('A2', 2021, 80)], "Both tied rows should be returned."
+
+
+def test_get_top_and_bottom_waiting_lists(setup_test_database):
+    """
+    GIVEN the waiting list data
+    WHEN asking for the top 2 overall, the bottom 1 of 2021 and the top 1 per year
+    THEN the matching rows should be returned in rank order.
+    """
+    conn, cursor = setup_test_database
+
+    assert get_top_waiting_lists(cursor, k=2) == [('A2', 2021, 80), ('A1', 2021, 60)]
+    assert get_bottom_waiting_lists(cursor, k=1, year=2021) == [('A1', 2021, 60)]
+    assert get_top_waiting_lists(cursor, k=1, per_year=True) == [('A1', 2020, 50), ('A2', 2021, 80)]
+    assert len(get_bottom_waiting_lists(cursor, k=10)) == 4, "Asking for more rows than exist returns them all."
+
+
+def test_top_k_below_one_keeps_the_result_type(setup_test_database):
+    """
+    GIVEN k = 0
+    WHEN asking for the top waiting lists as a list, a DataFrame and arrays
+    THEN each should be empty but of the requested type, with the usual typed columns.
+    """
+    conn, cursor = setup_test_database
+
+    frame = get_top_waiting_lists(cursor, k=0, as_frame=True)
+    typed = get_top_waiting_lists(cursor, k=1, as_frame=True)
+    arrays = get_bottom_waiting_lists(cursor, k=0, as_arrays=True)
+
+    assert get_top_waiting_lists(cursor, k=0) == []
+    assert frame.empty and list(frame.columns) == list(typed.columns)
+    assert [dtype.name for dtype in frame.dtypes] == [dtype.name for dtype in typed.dtypes]
+    assert list(arrays) == ["area_code", "year", "households_count"]
+    assert all(len(column) == 0 for column in arrays.values())
+
+
+def test_get_housing_units_statistics(setup_test_database):
+    """
+    Test the housing units statistics.
+    """
+    conn, cursor = setup_test_database
+
+    # Test housing units statistics
+    result = get_housing_units_statistics(cursor)
+    expected = [(700, 175.0, 100, 250)]
+    assert result == expected, f"The housing units statistics should be {expected}."
+
+
+@pytest.fixture(scope="function")
+def setup_rollup_database():
+    """
+    Set up an in-memory database with the coursework1 schema and the Fact_Rollup table.
+    """
+    conn = sqlite3.connect(":memory:")
+    conn.execute("PRAGMA foreign_keys = ON;")
+    cursor = conn.cursor()
+    cursor.executescript(SCHEMA_SQL + ROLLUP_SQL + """
+    INSERT INTO Area VALUES ('A1', 'Area 1'), ('A2', 'Area 2');
+    INSERT INTO Year VALUES (2020), (2021);
+    INSERT INTO Affordable_Housing_Data VALUES
+        ('A1', 2020, 100), ('A1', 2021, 150), ('A2', 2020, 200), ('A2', 2021, 250);
+    INSERT INTO Waiting_List_Data VALUES
+        ('A1', 2020, 50), ('A1', 2021, 60), ('A2', 2020, 30), ('A2', 2021, 80);
+    """)
+    build_fact_rollups(conn)
+    yield conn, cursor
+    conn.close()
+
+
+def test_rollups_match_table_aggregates(setup_rollup_database):
+    """
+    GIVEN the same data as the plain tables above, with rollups built
+    WHEN the aggregate functions read the rollups
+    THEN they should return the same results as aggregating the tables.
+    """
+    conn, cursor = setup_rollup_database
+
+    assert get_total_housing_units_by_year(cursor, 2020) == [(300,)]
+    assert get_total_housing_units_by_year(cursor, 1999) == [(None,)]
+    assert get_avg_waiting_list(cursor) == [(55.0,)]
+    assert get_housing_units_statistics(cursor) == [(700, 175.0, 100, 250)]
+
+
+def test_rollups_follow_writes(setup_rollup_database):
+    """
+    GIVEN rollups maintained by triggers
+    WHEN fact rows are updated and deleted, including the current minimum
+    THEN the rollups should still match a full recompute.
+    """
+    conn, cursor = setup_rollup_database
+
+    cursor.execute("UPDATE Affordable_Housing_Data SET housing_units = 500 WHERE area_code = 'A1' AND year = 2020;")
+    cursor.execute("DELETE FROM Area WHERE area_code = 'A2';")
+
+    assert get_total_housing_units_by_year(cursor, 2020) == [(500,)]
+    assert get_housing_units_statistics(cursor) == [(650, 325.0, 150, 500)]
+    assert verify_rollups(cursor) == []
+
+
+def test_verify_reports_and_corrects_drift(setup_rollup_database, capsys):
+    """
+    GIVEN a rollup row that no longer matches its table
+    WHEN an aggregate is requested with verify=True
+    THEN the mismatch should be reported and the recomputed value returned.
+    """
+    conn, cursor = setup_rollup_database
+    cursor.execute("UPDATE Fact_Rollup SET total = 1 "
+                   "WHERE table_name = 'Affordable_Housing_Data' AND scope = 'year' AND scope_key = '2020';")
+
+    assert get_total_housing_units_by_year(cursor, 2020) == [(1,)]
+    assert get_total_housing_units_by_year(cursor, 2020, verify=True) == [(300,)]
+    assert "Rollup mismatch" in capsys.readouterr().out
+    assert [row[:3] for row in verify_rollups(cursor)] == [("Affordable_Housing_Data", "year", "2020")]
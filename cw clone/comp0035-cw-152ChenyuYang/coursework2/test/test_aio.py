@@ -0,0 +1,107 @@
+import asyncio
+import sqlite3
+import threading
+import pytest
+from coursework2 import aio
+from coursework2.aio import QueryReader, fan_out
+from coursework2.section3 import queries_aggregate, queries_select
+
+
+@pytest.fixture(scope="function")
+def db_file(tmp_path):
+    """
+    Create a small file-backed database; reader threads each open their own connection.
+    """
+    path = tmp_path / "aio_test.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+    CREATE TABLE Area (area_code TEXT PRIMARY KEY, area_name TEXT);
+    CREATE TABLE Year (year INTEGER PRIMARY KEY);
+    CREATE TABLE Affordable_Housing_Data (area_code TEXT, year INTEGER, housing_units INTEGER);
+    CREATE TABLE Waiting_List_Data (area_code TEXT, year INTEGER, households_count INTEGER);
+
+    INSERT INTO Area VALUES ('A1', 'Area 1'), ('A2', 'Area 2');
+    INSERT INTO Year VALUES (2020), (2021);
+    INSERT INTO Affordable_Housing_Data VALUES ('A1', 2020, 100), ('A2', 2020, 200);
+    INSERT INTO Waiting_List_Data VALUES ('A1', 2020, 50), ('A2', 2020, 30), ('A1', 2021, 70);
+    """)
+    conn.close()
+    yield path
+    aio.close_readers()
+
+
+def test_fan_out_matches_blocking_calls(db_file):
+    """
+    GIVEN a database file
+    WHEN the dashboard queries are issued together through the async API
+    THEN each result should equal the blocking function's result.
+    """
+    results = asyncio.run(fan_out(
+        areas=aio.get_all_areas(db_path=db_file),
+        years=aio.get_unique_years(db_path=db_file),
+        top=aio.get_top_waiting_lists(k=2, db_path=db_file),
+        pairs=aio.get_filtered_area_and_year(area_name="area 1", db_path=db_file),
+    ))
+
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    assert list(results) == ["areas", "years", "top", "pairs"]
+    assert results["areas"] == queries_select.get_all_areas.uncached(cursor)
+    assert results["years"] == queries_select.get_unique_years.uncached(cursor)
+    assert results["top"] == queries_aggregate.get_top_waiting_lists(cursor, k=2)
+    assert results["pairs"] == [("Area 1", 2020), ("Area 1", 2021)]
+    conn.close()
+
+
+def test_queries_run_in_parallel_on_separate_connections(db_file):
+    """
+    GIVEN a reader with two threads
+    WHEN two queries that each wait for the other are awaited together
+    THEN both should run at once, on different threads and connections.
+    """
+    reader = QueryReader(db_file, threads=2)
+    barrier = threading.Barrier(2, timeout=5)
+
+    def blocking_query(cursor):
+        barrier.wait()
+        return threading.get_ident(), id(cursor.connection)
+
+    async def run_both():
+        return await asyncio.gather(reader.run(blocking_query), reader.run(blocking_query))
+
+    first, second = asyncio.run(run_both())
+    reader.close()
+
+    assert first[0] != second[0], "The queries should run on different threads."
+    assert first[1] != second[1], "Each thread should use its own connection."
+
+
+def test_stream_is_rejected(db_file):
+    """
+    GIVEN the async API
+    WHEN a query is awaited with stream=True
+    THEN a ValueError should be raised, since the iterator cannot leave its thread.
+    """
+    with pytest.raises(ValueError):
+        asyncio.run(aio.get_all_areas(stream=True, db_path=db_file))
+
+
+def test_connection_errors_are_not_hidden(db_file, tmp_path, monkeypatch):
+    """
+    GIVEN a missing database file, and a reader whose threads then fail to connect
+    WHEN creating the reader and awaiting queries on it
+    THEN the sqlite3 error should be raised each time, not BrokenThreadPool.
+    """
+    with pytest.raises(sqlite3.OperationalError):
+        QueryReader(tmp_path / "missing.db")
+
+    reader = QueryReader(db_file, threads=1)
+
+    def locked():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(reader._pool, "acquire", locked)
+    for _ in range(2):
+        with pytest.raises(sqlite3.OperationalError, match="locked"):
+            asyncio.run(reader.run(queries_select.get_unique_years))
+    reader.close()
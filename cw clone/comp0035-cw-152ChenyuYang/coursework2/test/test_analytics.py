@@ -0,0 +1,149 @@
+import pytest
+import sqlite3
+from coursework2.section3.queries_analytics import (
+    get_year_over_year_change,
+    get_rolling_average,
+    get_cumulative_supply,
+    get_borough_ranks,
+    get_trends,
+    get_trend_statement,
+)
+from coursework2 import statements
+
+# Mock database setup
+@pytest.fixture(scope="function")
+def setup_test_database():
+    """
+    Set up an in-memory SQLite database for testing.
+    A1 has no data for 2022, so its rolling window and YoY change skip a year.
+    """
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+
+    cursor.executescript("""
+    CREATE TABLE Affordable_Housing_Data (
+        area_code TEXT,
+        year INTEGER,
+        housing_units INTEGER
+    );
+
+    CREATE TABLE Waiting_List_Data (
+        area_code TEXT,
+        year INTEGER,
+        households_count INTEGER
+    );
+
+    INSERT INTO Affordable_Housing_Data (area_code, year, housing_units) VALUES
+        ('A1', 2020, 100),
+        ('A1', 2021, 150),
+        ('A2', 2020, 200),
+        ('A2', 2021, 250);
+
+    INSERT INTO Waiting_List_Data (area_code, year, households_count) VALUES
+        ('A1', 2020, 50),
+        ('A1', 2021, 60),
+        ('A1', 2023, 90),
+        ('A2', 2020, 30),
+        ('A2', 2021, 80);
+    """)
+
+    yield conn, cursor
+    conn.close()
+
+
+def test_get_year_over_year_change(setup_test_database):
+    """
+    GIVEN waiting list counts for several years
+    WHEN calling `get_year_over_year_change` for A1
+    THEN each row should carry the change from the borough's previous year.
+    """
+    conn, cursor = setup_test_database
+    result = get_year_over_year_change(cursor, area_code="A1")
+
+    assert result["year"].tolist() == [2020, 2021, 2023]
+    assert result["yoy_change"].tolist()[1:] == [10, 30]
+    assert result["yoy_change"].isna().tolist() == [True, False, False], "The first year has no previous value."
+    assert result["yoy_pct"].tolist()[1] == pytest.approx(20.0)
+
+
+def test_get_rolling_average_skips_missing_years(setup_test_database):
+    """
+    GIVEN A1 has no waiting list data for 2022
+    WHEN calling `get_rolling_average` with a 2-year window
+    THEN the 2023 mean should only cover 2023 (2022 is missing).
+    """
+    conn, cursor = setup_test_database
+    result = get_rolling_average(cursor, window=2, area_code="A1")
+
+    assert result["rolling_mean"].tolist() == [50.0, 55.0, 90.0]
+
+
+def test_get_cumulative_supply(setup_test_database):
+    """
+    GIVEN affordable housing supply for two years
+    WHEN calling `get_cumulative_supply`
+    THEN the running total per borough should be returned.
+    """
+    conn, cursor = setup_test_database
+    result = get_cumulative_supply(cursor)
+
+    assert result["cumulative"].tolist() == [100, 250, 200, 450]
+
+
+def test_get_borough_ranks(setup_test_database):
+    """
+    GIVEN waiting list counts for two boroughs in 2021
+    WHEN calling `get_borough_ranks` for 2021
+    THEN the borough with the larger waiting list should rank first.
+    """
+    conn, cursor = setup_test_database
+    result = get_borough_ranks(cursor, year=2021)
+
+    assert list(zip(result["area_code"], result["year_rank"])) == [("A1", 2), ("A2", 1)]
+
+
+def test_get_trends_as_arrays(setup_test_database):
+    """
+    GIVEN the waiting list data
+    WHEN calling `get_trends` with as_arrays=True
+    THEN every trend column should come back as a typed NumPy array.
+    """
+    conn, cursor = setup_test_database
+    result = get_trends(cursor, as_arrays=True)
+
+    assert result["year"].dtype == "int64"
+    assert result["yoy_change"].dtype == "float64", "Columns with gaps should be float arrays with NaN."
+    assert result["area_code"].dtype == "category", "Text columns should be Categorical, as in fetch_arrays."
+    assert len(result["year_rank"]) == 5
+
+
+def test_get_trends_filtered_by_area(setup_test_database):
+    """
+    GIVEN the waiting list data
+    WHEN calling `get_trends` for A1, which reads only A1's rows for the by-area windows
+    THEN the rows should match A1's rows of the unfiltered trends, ranks across boroughs included.
+    """
+    conn, cursor = setup_test_database
+    everything = get_trends(cursor, window=2)
+    result = get_trends(cursor, window=2, area_code="A1")
+
+    expected = everything[everything["area_code"] == "A1"].reset_index(drop=True)
+    assert result["year_rank"].tolist() == [1, 2, 1]
+    assert result.equals(expected)
+
+
+def test_trend_statements_are_registered():
+    """
+    GIVEN rolling means over different windows and filters
+    WHEN looking up their statements
+    THEN they should be registered SQL texts with the window and filters bound as parameters.
+    """
+    sql, params = get_trend_statement("Waiting_List_Data", "rolling", window=2, area_code="A1")
+    other_sql, other_params = get_trend_statement("Waiting_List_Data", "rolling", window=5, area_code="A2")
+
+    assert sql is other_sql
+    assert sql == statements.get("analytics.rolling.Waiting_List_Data.area")
+    assert (params, other_params) == ((1, "A1"), (4, "A2"))
+    for window in (0, 2.5):
+        with pytest.raises(ValueError):
+            get_trend_statement("Waiting_List_Data", "rolling", window=window)
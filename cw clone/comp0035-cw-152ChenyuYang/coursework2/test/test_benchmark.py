@@ -0,0 +1,66 @@
+import sqlite3
+import pytest
+from coursework2.benchmark.runner import CASES, compare_results, run_benchmarks, write_results
+from coursework2.benchmark.synthetic import build_synthetic_database
+
+
+@pytest.fixture(scope="module")
+def synthetic_db(tmp_path_factory):
+    """
+    Build a tiny synthetic database (20 areas x 5 years).
+    """
+    path = tmp_path_factory.mktemp("benchmark") / "synthetic.db"
+    counts = build_synthetic_database(path, areas=20, years=5, density=0.8, seed=1)
+    return path, counts
+
+
+def get_counts(path):
+    conn = sqlite3.connect(path)
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0]
+              for table in ["Area", "Year", "Affordable_Housing_Data", "Waiting_List_Data"]}
+    conn.close()
+    return counts
+
+
+def test_synthetic_database_scale(synthetic_db):
+    """
+    GIVEN 20 areas x 5 years at 80% density
+    WHEN the synthetic database is built
+    THEN it should hold every area and year and some, but not all, of the cells.
+    """
+    path, counts = synthetic_db
+
+    assert (counts["Area"], counts["Year"]) == (20, 5)
+    assert 0 < counts["Waiting_List_Data"] < 100, "Some cells should be left empty."
+
+
+def test_run_benchmarks_times_every_case_and_rolls_back(synthetic_db, tmp_path):
+    """
+    GIVEN the synthetic database
+    WHEN every case is benchmarked and the results written
+    THEN each case should have p50/p95 timings and the writes should leave the data unchanged.
+    """
+    path, counts = synthetic_db
+    summaries = run_benchmarks(path, repeat=2, warmup=0)
+    results = write_results(tmp_path / "results.json", summaries, {"areas": 20, "years": 5}, 2)
+
+    assert set(summaries) == {case.name for case in CASES}
+    assert all(summary["p95_ms"] >= summary["p50_ms"] >= 0 for summary in summaries.values())
+    assert summaries["select.get_unique_years"]["rows"] == 5
+    renamed = summaries["update.update_area_names"]
+    assert renamed["rows"] == 20, "Only the renamed areas count, not the rows the triggers touched."
+    assert renamed["changes"] > renamed["rows"]
+    assert results["meta"]["scale"] == {"areas": 20, "years": 5}
+    assert get_counts(path) == counts, "Benchmarked writes should be rolled back."
+
+
+def test_compare_results_flags_regressions():
+    """
+    GIVEN a baseline and a run where one function got twice as slow
+    WHEN comparing them
+    THEN only that function should be reported.
+    """
+    baseline = {"results": {"a": {"p50_ms": 1.0}, "b": {"p50_ms": 2.0}}}
+    current = {"results": {"a": {"p50_ms": 2.0}, "b": {"p50_ms": 2.1}, "c": {"p50_ms": 5.0}}}
+
+    assert compare_results(baseline, current) == [("a", 1.0, 2.0, 2.0)]
@@ -0,0 +1,80 @@
+import pandas as pd
+import pytest
+from coursework1 import cleaning
+
+
+@pytest.fixture(scope="function")
+def cache(tmp_path, monkeypatch):
+    """
+    Point the cache at a temporary directory and replace the affordable housing cleaner
+    with one that counts its calls.
+    """
+    source = tmp_path / "affordable.xlsx"
+    source.write_bytes(b"first version")
+    calls = []
+
+    def clean(path):
+        calls.append(path)
+        return pd.DataFrame({'Current\nONS code': ['E1', 'E2'], 'Area name': ['A', 'B'], 2020: [5, 7]})
+
+    monkeypatch.setattr(cleaning, "cache_dir", tmp_path / "cache")
+    monkeypatch.setitem(cleaning.DATASETS, 'affordable', (source, clean, 'affordable.xlsx'))
+    return source, calls
+
+
+def test_cache_miss_then_hit(cache):
+    """
+    GIVEN an empty cache
+    WHEN a dataset is loaded twice from the same source file
+    THEN it should be cleaned once, and both loads should return the same frame with string year columns.
+    """
+    source, calls = cache
+    source_hash = cleaning.get_file_hash(source)
+    assert cleaning.read_cache('affordable', source_hash) is None
+
+    first = cleaning.load_cleaned_dataset('affordable')
+    second = cleaning.load_cleaned_dataset('affordable', source_hash)
+
+    assert len(calls) == 1
+    assert list(first.columns) == ['Current\nONS code', 'Area name', '2020']
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_changed_source_or_version_replaces_stale_file(cache, monkeypatch):
+    """
+    GIVEN a cached dataset
+    WHEN the source file changes, and then the cleaning version changes
+    THEN each should be a cache miss, and only the newest cache file should be left.
+    """
+    source, calls = cache
+    cleaning.load_cleaned_dataset('affordable')
+    source.write_bytes(b"second version")
+    cleaning.load_cleaned_dataset('affordable')
+    monkeypatch.setattr(cleaning, "CLEANING_VERSION", cleaning.CLEANING_VERSION + 1)
+    cleaning.load_cleaned_dataset('affordable')
+
+    assert len(calls) == 3
+    assert list(cleaning.cache_dir.iterdir()) == [cleaning.get_cache_path('affordable', cleaning.get_file_hash(source))]
+
+
+def test_cache_is_read_through_a_memory_map(cache, monkeypatch):
+    """
+    GIVEN a cached dataset
+    WHEN it is read back
+    THEN the Arrow file should be opened with memory_map=True.
+    """
+    source, _ = cache
+    source_hash = cleaning.get_file_hash(source)
+    cleaning.load_cleaned_dataset('affordable', source_hash)
+    read_table = cleaning.feather.read_table
+    opened = []
+
+    def spy(path, **kwargs):
+        opened.append((path, kwargs.get('memory_map')))
+        return read_table(path, **kwargs)
+    monkeypatch.setattr(cleaning.feather, "read_table", spy)
+
+    df = cleaning.read_cache('affordable', source_hash)
+
+    assert opened == [(cleaning.get_cache_path('affordable', source_hash), True)]
+    assert df['2020'].tolist() == [5, 7]
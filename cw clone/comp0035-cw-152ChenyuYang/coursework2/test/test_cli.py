@@ -0,0 +1,104 @@
+import csv
+import io
+import json
+import sqlite3
+import pytest
+from coursework2.cli import main
+from coursework2.connection import close_all_pools
+from coursework2.benchmark.synthetic import build_synthetic_database
+
+
+@pytest.fixture(scope="function")
+def cli_db(tmp_path):
+    """
+    Build a small synthetic database with the declared schema.
+    """
+    path = tmp_path / "cli_test.db"
+    build_synthetic_database(path, areas=10, years=3, density=1.0, seed=1)
+    yield path
+    close_all_pools()
+
+
+def run(db, *argv, stdin=""):
+    """Run the CLI against `db`, returning its exit code and output."""
+    out = io.StringIO()
+    code = main(["--db", str(db), *argv], stdin=io.StringIO(stdin), stdout=out)
+    return code, out.getvalue()
+
+
+def test_select_and_aggregate_stream_rows(cli_db):
+    """
+    GIVEN a database with three years of data
+    WHEN running select and aggregate subcommands in csv and json format
+    THEN the rows should be written with a header, or as one JSON object per line.
+    """
+    code, output = run(cli_db, "select", "years")
+    years = [int(row["year"]) for row in csv.DictReader(io.StringIO(output))]
+    assert code == 0 and len(years) == 3
+
+    code, output = run(cli_db, "--format", "json", "aggregate", "top", "2", "--year", str(years[0]))
+    rows = [json.loads(line) for line in output.splitlines()]
+    assert code == 0 and len(rows) >= 2
+    assert {row["year"] for row in rows} == {years[0]}
+
+
+def test_batch_applies_operations_in_one_transaction(cli_db):
+    """
+    GIVEN an NDJSON batch on stdin inserting a year and an area and updating their waiting list
+    WHEN it runs through the batch subcommand
+    THEN all rows should be written and counted per operation.
+    """
+    batch = "\n".join(json.dumps(record) for record in [
+        {"command": "insert", "op": "year", "year": 2099},
+        {"command": "insert", "op": "area", "area_code": "Z0000001", "area_name": "Test Area"},
+        {"command": "insert", "op": "waiting-list", "area_code": "Z0000001", "year": 2099, "households_count": 5},
+        {"command": "update", "op": "waiting-list", "area_code": "Z0000001", "year": 2099, "households_count": 7},
+    ])
+    code, output = run(cli_db, "batch", "-", stdin=batch)
+
+    assert code == 0
+    assert list(csv.reader(io.StringIO(output)))[1:] == [
+        ["insert", "year", "1"], ["insert", "area", "1"], ["insert", "waiting-list", "1"],
+        ["update", "waiting-list", "1"]]
+    conn = sqlite3.connect(cli_db)
+    assert conn.execute("SELECT households_count FROM Waiting_List_Data WHERE area_code = 'Z0000001'").fetchall() \
+        == [(7,)]
+    conn.close()
+
+
+def test_failed_batch_writes_nothing(cli_db, capsys):
+    """
+    GIVEN a batch whose second record breaks a constraint, and a record with a bad value
+    WHEN running them
+    THEN the CLI should exit with 1, report the error on stderr and roll back the whole batch.
+    """
+    batch = '{"command": "insert", "op": "year", "year": 2099}\n{"command": "insert", "op": "year", "year": 2099}\n'
+    assert run(cli_db, "batch", "-", stdin=batch)[0] == 1
+    assert "nothing was written" in capsys.readouterr().err
+
+    assert run(cli_db, "insert", "year", "notayear")[0] == 1
+    assert "must be an integer" in capsys.readouterr().err
+
+    conn = sqlite3.connect(cli_db)
+    assert conn.execute("SELECT COUNT(*) FROM Year WHERE year = 2099").fetchone() == (0,)
+    conn.close()
+
+
+def test_deletes_from_a_file(cli_db, tmp_path):
+    """
+    GIVEN a CSV file of area codes
+    WHEN deleting them through the delete subcommand
+    THEN every area and its fact rows should be deleted, and the areas counted with their rows.
+    """
+    conn = sqlite3.connect(cli_db)
+    codes = [row[0] for row in conn.execute("SELECT area_code FROM Area ORDER BY area_code LIMIT 3")]
+    expected = sum(conn.execute(f"SELECT COUNT(*) FROM {table} WHERE area_code IN (?, ?, ?)", codes).fetchone()[0]
+                   for table in ("Area", "Affordable_Housing_Data", "Waiting_List_Data"))
+    (tmp_path / "areas.csv").write_text("area_code\n" + "".join(f"{code}\n" for code in codes))
+
+    code, output = run(cli_db, "delete", "area", "--file", str(tmp_path / "areas.csv"))
+
+    assert code == 0
+    assert list(csv.reader(io.StringIO(output)))[1:] == [["delete", "area", str(expected)]]
+    assert conn.execute("SELECT COUNT(*) FROM Area").fetchone() == (7,)
+    conn.close()
@@ -0,0 +1,133 @@
+import sqlite3
+import threading
+import pytest
+from coursework2.connection import ConnectionPool, get_db_connection, get_pool, close_all_pools
+
+
+@pytest.fixture(scope="function")
+def db_file(tmp_path):
+    """
+    Create a small SQLite database file for the pool to connect to.
+    """
+    path = tmp_path / "pool_test.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+    CREATE TABLE Area (
+        area_code TEXT PRIMARY KEY,
+        area_name TEXT
+    );
+    INSERT INTO Area VALUES ('A1', 'Area 1');
+    """)
+    conn.close()
+    yield path
+    close_all_pools()
+
+
+def test_connection_is_reused(db_file):
+    """
+    GIVEN a connection pool
+    WHEN a connection is closed and another one is requested
+    THEN the same underlying connection should be handed out again.
+    """
+    pool = ConnectionPool(db_file, size=2)
+    conn = pool.acquire()
+    conn.close()
+    assert pool.acquire() is conn, "A closed pooled connection should go back to the pool"
+    pool.close()
+
+
+def test_write_connection_setup(db_file):
+    """
+    GIVEN a read-write pool
+    WHEN a connection is opened
+    THEN WAL, synchronous=NORMAL, foreign keys and in-memory temp storage should be set.
+    """
+    with ConnectionPool(db_file).connection() as conn:
+        assert conn.execute("PRAGMA journal_mode;").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous;").fetchone()[0] == 1
+        assert conn.execute("PRAGMA foreign_keys;").fetchone()[0] == 1
+        assert conn.execute("PRAGMA temp_store;").fetchone()[0] == 2
+
+
+def test_read_only_connection_rejects_writes(db_file):
+    """
+    GIVEN a read-only pool
+    WHEN a write is attempted
+    THEN SQLite should refuse it, while reads still work.
+    """
+    with ConnectionPool(db_file, read_only=True).connection() as conn:
+        assert conn.execute("SELECT area_name FROM Area;").fetchall() == [("Area 1",)]
+        with pytest.raises(sqlite3.OperationalError, match="readonly"):
+            conn.execute("INSERT INTO Area VALUES ('A2', 'Area 2');")
+
+
+def test_release_rolls_back_uncommitted_changes(db_file):
+    """
+    GIVEN a pooled connection with an uncommitted insert
+    WHEN it is returned to the pool
+    THEN the insert should be rolled back.
+    """
+    pool = ConnectionPool(db_file, size=1)
+    conn = pool.acquire()
+    conn.execute("INSERT INTO Area VALUES ('A2', 'Area 2');")
+    conn.close()
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM Area;").fetchone()[0] == 1
+
+
+def test_pool_never_exceeds_its_size(db_file):
+    """
+    GIVEN a pool of two connections shared by eight threads
+    WHEN every thread repeatedly borrows a connection and queries it
+    THEN no more than two connections should ever be open.
+    """
+    pool = ConnectionPool(db_file, size=2)
+    in_use = set()
+    peak = []
+    lock = threading.Lock()
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(25):
+                with pool.connection() as conn:
+                    with lock:
+                        in_use.add(id(conn))
+                        peak.append(len(in_use))
+                    conn.execute("SELECT COUNT(*) FROM Area;").fetchone()
+                    with lock:
+                        in_use.discard(id(conn))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert max(peak) <= 2
+    assert pool._opened <= 2
+
+
+def test_get_db_connection_shares_one_pool(db_file):
+    """
+    GIVEN the shared pools
+    WHEN get_db_connection is called twice for the same file and mode
+    THEN both connections should come from the same pool.
+    """
+    conn, cursor = get_db_connection(db_file, read_only=True)
+    assert conn.pool is get_pool(db_file, read_only=True)
+    conn.close()
+    other, _ = get_db_connection(db_file, read_only=True)
+    assert other is conn
+
+
+def test_get_db_connection_failure(tmp_path):
+    """
+    GIVEN a database file that does not exist
+    WHEN a read-only connection is requested
+    THEN (None, None) should be returned.
+    """
+    assert get_db_connection(tmp_path / "missing.db", read_only=True) == (None, None)
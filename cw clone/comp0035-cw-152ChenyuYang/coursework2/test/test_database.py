@@ -0,0 +1,153 @@
+import sqlite3
+import pandas as pd
+import pytest
+from coursework1 import database
+from coursework2.benchmark.synthetic import build_synthetic_database
+from coursework2.section3.queries_aggregate import verify_rollups
+
+
+@pytest.fixture(scope="function")
+def built_database(tmp_path, monkeypatch):
+    """
+    Point create_database() at a synthetic database and two placeholder source files.
+    """
+    path = tmp_path / "database_test.db"
+    build_synthetic_database(path, areas=5, years=2, density=1.0, seed=1)
+    sources = []
+    for name in ("affordable.xlsx", "waiting.xlsx"):
+        source = tmp_path / name
+        source.write_bytes(name.encode())
+        sources.append(source)
+    monkeypatch.setattr(database, "db_path", path)
+    monkeypatch.setattr(database, "file1_path", sources[0])
+    monkeypatch.setattr(database, "file2_path", sources[1])
+    return path
+
+
+def use_cleaned_data(monkeypatch, affordable, waiting):
+    """Make create_database() load wide frames of {area_code: {year: value}} instead of the workbooks."""
+    def to_frame(values, code_column):
+        years = sorted({year for row in values.values() for year in row})
+        return pd.DataFrame([{code_column: code, 'Area name': f"Area {code}",
+                              **{str(year): row.get(year) for year in years}} for code, row in values.items()])
+    datasets = {'affordable': to_frame(affordable, 'Current\nONS code'),
+                'waiting_list': to_frame(waiting, 'Current ONS Code')}
+    monkeypatch.setattr(database, "load_cleaned_datasets", lambda *args, **kwargs: datasets)
+
+
+def test_full_build_uses_declared_schema(built_database, monkeypatch, capsys):
+    """
+    GIVEN a database last built with the legacy load
+    WHEN create_database() rebuilds it with the plan report
+    THEN the tables should have their declared keys and covering indexes, and the report
+    should show the hot queries moving from table scans to those indexes.
+    """
+    use_cleaned_data(monkeypatch, {'E1': {2020: 5, 2021: 6}, 'E2': {2020: 7}}, {'E1': {2020: 10}, 'E2': {2021: 20}})
+    database.create_database(indexed=False)
+    database.create_database(plan_report=True)
+
+    output = capsys.readouterr().out
+    conn = sqlite3.connect(built_database)
+    assert database.get_schema_version(conn) == database.SCHEMA_VERSION
+    assert conn.execute("SELECT area_code, year, housing_units FROM Affordable_Housing_Data ORDER BY 1, 2").fetchall() \
+        == [('E1', 2020, 5), ('E1', 2021, 6), ('E2', 2020, 7)]
+    sql = dict(conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'table'").fetchall())
+    assert "PRIMARY KEY (area_code, year)" in sql["Waiting_List_Data"] and "WITHOUT ROWID" in sql["Waiting_List_Data"]
+    assert {"idx_affordable_year_area", "idx_waiting_year_area", "idx_waiting_count"} <= {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    plans = database.get_query_plans(conn)
+    assert "COVERING INDEX idx_affordable_year_area" in plans["total_housing_units_by_year"][0]
+    assert "before: SCAN Affordable_Housing_Data" in output
+    assert "after:  SEARCH Affordable_Housing_Data USING COVERING INDEX idx_affordable_year_area" in output
+    conn.close()
+
+
+def test_failed_full_build_keeps_previous_database(built_database, monkeypatch, capsys):
+    """
+    GIVEN a built database
+    WHEN a full rebuild fails after the tables were recreated and the new rows inserted
+    THEN the whole rebuild should be rolled back, leaving the old rows, schema version and manifest.
+    """
+    conn = sqlite3.connect(built_database)
+    before = conn.execute("SELECT * FROM Affordable_Housing_Data ORDER BY area_code, year").fetchall()
+    manifest = database.get_manifest(conn)
+    use_cleaned_data(monkeypatch, {'E1': {2020: 5}}, {'E1': {2020: 10}})
+
+    def fail(conn):
+        raise sqlite3.OperationalError("disk I/O error")
+    monkeypatch.setattr(database, "build_derived_tables", fail)
+    database.create_database(full_rebuild=True)
+
+    assert "Error while inserting data into the database: disk I/O error" in capsys.readouterr().out
+    assert conn.execute("SELECT * FROM Affordable_Housing_Data ORDER BY area_code, year").fetchall() == before
+    assert database.get_schema_version(conn) == database.SCHEMA_VERSION
+    assert database.get_manifest(conn) == manifest
+    conn.close()
+
+
+def test_refused_load_keeps_existing_tables(built_database, monkeypatch, capsys):
+    """
+    GIVEN a built database and cleaned data with a text value in a numeric column
+    WHEN create_database() rebuilds it
+    THEN the load should be refused before the tables are dropped, leaving the old rows in place.
+    """
+    affordable = pd.DataFrame({'Current\nONS code': ['E1', 'E2'], 'Area name': ['A', 'B'], '2020': [5, 'n/a']})
+    waiting = pd.DataFrame({'Current ONS Code': ['E1', 'E2'], 'Area name': ['A', 'B'], '2020': [10, 20]})
+    monkeypatch.setattr(database, "load_cleaned_datasets",
+                        lambda *args, **kwargs: {'affordable': affordable, 'waiting_list': waiting})
+    conn = sqlite3.connect(built_database)
+    before = conn.execute("SELECT COUNT(*) FROM Affordable_Housing_Data").fetchone()
+
+    database.create_database(full_rebuild=True)
+
+    assert "Refusing to write the database: Affordable_Housing_Data.housing_units" in capsys.readouterr().out
+    assert before[0] > 0
+    assert conn.execute("SELECT COUNT(*) FROM Affordable_Housing_Data").fetchone() == before
+    conn.close()
+
+
+def test_unchanged_sources_write_nothing(built_database, monkeypatch, capsys):
+    """
+    GIVEN a database built from two source files
+    WHEN create_database() runs again on the same files, with the plan report
+    THEN nothing should be loaded or written, and the current plans still printed.
+    """
+    use_cleaned_data(monkeypatch, {'E1': {2020: 5}}, {'E1': {2020: 10}})
+    database.create_database(full_rebuild=True)
+    conn = sqlite3.connect(built_database)
+    data_version = conn.execute("PRAGMA data_version;").fetchone()
+    monkeypatch.setattr(database, "load_cleaned_datasets", None)
+    capsys.readouterr()
+
+    database.create_database(plan_report=True)
+
+    output = capsys.readouterr().out
+    assert "nothing to do" in output
+    assert "after:  SEARCH Affordable_Housing_Data USING COVERING INDEX idx_affordable_year_area" in output
+    assert conn.execute("PRAGMA data_version;").fetchone() == data_version
+    conn.close()
+
+
+def test_incremental_update_writes_only_changed_rows(built_database, monkeypatch, capsys):
+    """
+    GIVEN a database built from two source files
+    WHEN one source changes a value and drops a row, and create_database() runs again
+    THEN the changed row should be upserted and the dropped row deleted, with the rollups
+    still matching the fact tables.
+    """
+    use_cleaned_data(monkeypatch, {'E1': {2020: 5, 2021: 6}, 'E2': {2020: 7}}, {'E1': {2020: 10}})
+    database.create_database(full_rebuild=True)
+    database.file1_path.write_bytes(b"changed")
+    use_cleaned_data(monkeypatch, {'E1': {2020: 5, 2021: 8}}, {'E1': {2020: 10}})
+    capsys.readouterr()
+
+    database.create_database()
+
+    output = capsys.readouterr().out
+    assert "Affordable_Housing_Data: 1 rows upserted, 1 rows deleted" in output
+    assert "Waiting_List_Data: 0 rows upserted, 0 rows deleted" in output
+    conn = sqlite3.connect(built_database)
+    assert conn.execute("SELECT area_code, year, housing_units FROM Affordable_Housing_Data ORDER BY 1, 2"
+                        ).fetchall() == [('E1', 2020, 5), ('E1', 2021, 8)]
+    assert verify_rollups(conn.cursor()) == []
+    conn.close()
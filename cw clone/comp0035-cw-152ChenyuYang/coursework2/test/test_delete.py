@@ -1,121 +1,243 @@
-import pytest
-import sqlite3
-from pathlib import Path
-from coursework2.section3.queries_delete import (
-    delete_area,
-    delete_year,
-    delete_housing_data_by_area,
-    delete_waiting_list_by_year,
-    clear_all_data,
-    get_db_connection,
-)
-
-# Set the test database path
-db_path = Path(":memory:")
-
-
-@pytest.fixture(scope="function")
-def setup_test_database():
-    """
-    Set up an in-memory SQLite database for testing.
-    The database will be fresh for each test.
-    """
-    conn = sqlite3.connect(":memory:")
-    cursor = conn.cursor()
-
-    # Create mock tables and insert mock data
-    cursor.executescript("""
-    CREATE TABLE Area (
-        area_code TEXT PRIMARY KEY,
-        area_name TEXT
-    );
-
-    CREATE TABLE Year (
-        year INTEGER PRIMARY KEY
-    );
-
-    CREATE TABLE Affordable_Housing_Data (
-        area_code TEXT,
-        year INTEGER,
-        housing_units INTEGER,
-        FOREIGN KEY (area_code) REFERENCES Area (area_code)
-    );
-
-    CREATE TABLE Waiting_List_Data (
-        area_code TEXT,
-        year INTEGER,
-        households_count INTEGER,
-        FOREIGN KEY (area_code) REFERENCES Area (area_code)
-    );
-
-    -- Insert mock data
-    INSERT INTO Area VALUES ('A1', 'Area 1'), ('A2', 'Area 2');
-    INSERT INTO Year VALUES (2020), (2021);
-    INSERT INTO Affordable_Housing_Data VALUES ('A1', 2020, 100), ('A2', 2020, 200);
-    INSERT INTO Waiting_List_Data VALUES ('A1', 2020, 50), ('A2', 2020, 60);
-    """)
-
-    yield conn, cursor
-
-    conn.close()
-
-
-def test_delete_area(setup_test_database):
-    conn, cursor = setup_test_database
-    delete_area(cursor, 'A1')
-
-    # Verify the area is deleted
-    cursor.execute("SELECT * FROM Area WHERE area_code = 'A1';")
-    results = cursor.fetchall()
-    assert len(results) == 0, "Area with area_code 'A1' should be deleted."
-
-
-def test_delete_year(setup_test_database):
-    conn, cursor = setup_test_database
-    delete_year(cursor, 2020)
-
-    # Verify the year is deleted
-    cursor.execute("SELECT * FROM Year WHERE year = 2020;")
-    results = cursor.fetchall()
-    assert len(results) == 0, "Year 2020 should be deleted."
-
-
-def test_delete_housing_data_by_area(setup_test_database):
-    conn, cursor = setup_test_database
-    delete_housing_data_by_area(cursor, 'A1')
-
-    # Verify the housing data for the area is deleted
-    cursor.execute("SELECT * FROM Affordable_Housing_Data WHERE area_code = 'A1';")
-    results = cursor.fetchall()
-    assert len(results) == 0, "Housing data for area_code 'A1' should be deleted."
-
-
-def test_delete_waiting_list_by_year(setup_test_database):
-    conn, cursor = setup_test_database
-    delete_waiting_list_by_year(cursor, 2020)
-
-    # Verify the waiting list data for the year is deleted
-    cursor.execute("SELECT * FROM Waiting_List_Data WHERE year = 2020;")
-    results = cursor.fetchall()
-    assert len(results) == 0, "Waiting list data for year 2020 should be deleted."
-
-
-def test_clear_all_data(setup_test_database):
-    conn, cursor = setup_test_database
-    clear_all_data(cursor)
-
-    # Verify all tables are cleared
-    for table in ["Area", "Year", "Affordable_Housing_Data", "Waiting_List_Data"]:
-        cursor.execute(f"SELECT * FROM {table};")
-        results = cursor.fetchall()
-        assert len(results) == 0, f"Table {table} should be cleared."
-
-
-def test_invalid_area_deletion(setup_test_database):
-    conn, cursor = setup_test_database
-    delete_area(cursor, 'A99')  # Area 'A99' does not exist
-
-    # Verify no error occurs and other data remains intact
-    cursor.execute("SELECT COUNT(*) FROM Area;")
-    count = cursor.fetchone()[0]
-    assert count == 2, "Non-existent area deletion should not affect existing data."
+import pytest
+import sqlite3
+from pathlib import Path
+from coursework2.section3.queries_delete import (
+    delete_area,
+    delete_year,
+    delete_housing_data_by_area,
+    delete_waiting_list_by_year,
+    clear_all_data,
+    purge_area,
+    purge_year,
+    purge_areas,
+    purge_years,
+    get_db_connection,
+)
+from coursework1.database import SCHEMA_SQL, INDEX_SQL, MANIFEST_SQL
+
+# Set the test database path
+db_path = Path(":memory:")
+
+
+@pytest.fixture(scope="function")
+def setup_test_database():
+    """
+    Set up an in-memory SQLite database for testing.
+    The database will be fresh for each test.
+    """
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+
+    # Create mock tables and insert mock data
+    cursor.executescript("""
+    CREATE TABLE Area (
+        area_code TEXT PRIMARY KEY,
+        area_name TEXT
+    );
+
+    CREATE TABLE Year (
+        year INTEGER PRIMARY KEY
+    );
+
+    CREATE TABLE Affordable_Housing_Data (
+        area_code TEXT,
+        year INTEGER,
+        housing_units INTEGER,
+        FOREIGN KEY (area_code) REFERENCES Area (area_code)
+    );
+
+    CREATE TABLE Waiting_List_Data (
+        area_code TEXT,
+        year INTEGER,
+        households_count INTEGER,
+        FOREIGN KEY (area_code) REFERENCES Area (area_code)
+    );
+
+    -- Insert mock data
+    INSERT INTO Area VALUES ('A1', 'Area 1'), ('A2', 'Area 2');
+    INSERT INTO Year VALUES (2020), (2021);
+    INSERT INTO Affordable_Housing_Data VALUES ('A1', 2020, 100), ('A2', 2020, 200);
+    INSERT INTO Waiting_List_Data VALUES ('A1', 2020, 50), ('A2', 2020, 60);
+    """)
+
+    yield conn, cursor
+
+    conn.close()
+
+
+def test_delete_area(setup_test_database):
+    conn, cursor = setup_test_database
+    delete_area(cursor, 'A1')
+
+    # Verify the area is deleted
+    cursor.execute("SELECT * FROM Area WHERE area_code = 'A1';")
+    results = cursor.fetchall()
+    assert len(results) == 0, "Area with area_code 'A1' should be deleted."
+
+
+def test_delete_year(setup_test_database):
+    conn, cursor = setup_test_database
+    delete_year(cursor, 2020)
+
+    # Verify the year is deleted
+    cursor.execute("SELECT * FROM Year WHERE year = 2020;")
+    results = cursor.fetchall()
+    assert len(results) == 0, "Year 2020 should be deleted."
+
+
+def test_delete_housing_data_by_area(setup_test_database):
+    conn, cursor = setup_test_database
+    delete_housing_data_by_area(cursor, 'A1')
+
+    # Verify the housing data for the area is deleted
+    cursor.execute("SELECT * FROM Affordable_Housing_Data WHERE area_code = 'A1';")
+    results = cursor.fetchall()
+    assert len(results) == 0, "Housing data for area_code 'A1' should be deleted."
+
+
+def test_delete_waiting_list_by_year(setup_test_database):
+    conn, cursor = setup_test_database
+    delete_waiting_list_by_year(cursor, 2020)
+
+    # Verify the waiting list data for the year is deleted
+    cursor.execute("SELECT * FROM Waiting_List_Data WHERE year = 2020;")
+    results = cursor.fetchall()
+    assert len(results) == 0, "Waiting list data for year 2020 should be deleted."
+
+
+def test_clear_all_data(setup_test_database):
+    conn, cursor = setup_test_database
+    clear_all_data(cursor)
+
+    # Verify all tables are cleared
+    for table in ["Area", "Year", "Affordable_Housing_Data", "Waiting_List_Data"]:
+        cursor.execute(f"SELECT * FROM {table};")
+        results = cursor.fetchall()
+        assert len(results) == 0, f"Table {table} should be cleared."
+
+
+def test_invalid_area_deletion(setup_test_database):
+    conn, cursor = setup_test_database
+    delete_area(cursor, 'A99')  # Area 'A99' does not exist
+
+    # Verify no error occurs and other data remains intact
+    cursor.execute("SELECT COUNT(*) FROM Area;")
+    count = cursor.fetchone()[0]
+    assert count == 2, "Non-existent area deletion should not affect existing data."
+
+
+def test_delete_area_removes_dependent_rows(setup_test_database):
+    """
+    GIVEN an area with housing and waiting list rows
+    WHEN delete_area is called
+    THEN its fact rows should be removed with it, and other areas kept.
+    """
+    conn, cursor = setup_test_database
+    delete_area(cursor, 'A1')
+
+    for table in ["Affordable_Housing_Data", "Waiting_List_Data"]:
+        cursor.execute(f"SELECT area_code FROM {table};")
+        assert cursor.fetchall() == [('A2',)], f"{table} should have no rows left for A1."
+
+
+def test_purge_year_reports_deleted_rows(setup_test_database):
+    """
+    GIVEN two areas with data for 2020
+    WHEN purge_year is called for 2020
+    THEN the number of rows deleted from every table should be returned.
+    """
+    conn, cursor = setup_test_database
+    deleted = purge_year(cursor, 2020)
+
+    assert deleted == {"Affordable_Housing_Data": 2, "Waiting_List_Data": 2, "Year": 1}
+
+
+def test_purge_areas_in_batches(setup_test_database):
+    """
+    GIVEN two areas with data, and one area code that does not exist
+    WHEN purge_areas is called for all three in batches of two
+    THEN both areas and their rows should be deleted in one call and counted per table.
+    """
+    conn, cursor = setup_test_database
+    deleted = purge_areas(cursor, ["A1", "A2", "A9"], batch_size=2)
+
+    assert deleted == {"Affordable_Housing_Data": 2, "Waiting_List_Data": 2, "Area": 2}
+    assert cursor.execute("SELECT COUNT(*) FROM Area").fetchone() == (0,)
+
+
+def test_purge_years_streams_keys_through_a_temp_table(setup_test_database):
+    """
+    GIVEN a generator of years, repeating one and including one that does not exist
+    WHEN purge_years is called with batches of one
+    THEN the keys should be read once, the rows counted per table, and the staging table dropped.
+    """
+    conn, cursor = setup_test_database
+    consumed = []
+
+    def years():
+        for year in (2020, 2020, 1999):
+            consumed.append(year)
+            yield year
+
+    deleted = purge_years(cursor, years(), batch_size=1)
+
+    assert consumed == [2020, 2020, 1999]
+    assert deleted == {"Affordable_Housing_Data": 2, "Waiting_List_Data": 2, "Year": 1}
+    assert cursor.execute("SELECT COUNT(*) FROM Year WHERE year = 2020").fetchone() == (0,)
+    assert cursor.execute("SELECT COUNT(*) FROM temp.sqlite_master").fetchone() == (0,)
+
+
+@pytest.fixture(scope="function")
+def setup_schema_database(tmp_path):
+    """
+    Set up a file-backed database with the coursework1 schema, indexes and ingest manifest.
+    """
+    path = tmp_path / "schema_test.db"
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = ON;")
+    cursor = conn.cursor()
+    cursor.executescript(SCHEMA_SQL + INDEX_SQL + MANIFEST_SQL)
+    cursor.execute("INSERT INTO Area VALUES ('A1', 'Area 1'), ('A2', 'Area 2');")
+    cursor.execute("INSERT INTO Year VALUES (2020);")
+    cursor.executemany("INSERT INTO Waiting_List_Data VALUES (?, 2020, ?);",
+                       [('A1', 50), ('A2', 60)])
+    cursor.execute("INSERT INTO Ingest_Manifest (source_file, sha256) VALUES ('source.xlsx', 'abc');")
+    conn.commit()
+
+    yield conn, cursor, path
+
+    conn.close()
+
+
+def test_schema_cascades_area_delete(setup_schema_database):
+    """
+    GIVEN the coursework1 schema with foreign keys enforced
+    WHEN an Area row is deleted with a plain DELETE
+    THEN its waiting list rows should be deleted by the cascade.
+    """
+    conn, cursor, _ = setup_schema_database
+    cursor.execute("DELETE FROM Area WHERE area_code = 'A1';")
+
+    cursor.execute("SELECT area_code FROM Waiting_List_Data;")
+    assert cursor.fetchall() == [('A2',)]
+
+
+def test_clear_all_data_recreates_tables(setup_schema_database):
+    """
+    GIVEN the coursework1 schema with data and an ingest manifest
+    WHEN clear_all_data is called
+    THEN every table and the manifest should be empty, with the indexes recreated.
+    """
+    conn, cursor, path = setup_schema_database
+    cursor.execute("SELECT type, name FROM sqlite_master ORDER BY name;")
+    objects = cursor.fetchall()
+
+    clear_all_data(cursor)
+
+    cursor.execute("SELECT type, name FROM sqlite_master ORDER BY name;")
+    assert cursor.fetchall() == objects, "Tables and indexes should be recreated as before."
+    for table in ["Area", "Year", "Waiting_List_Data", "Ingest_Manifest"]:
+        cursor.execute(f"SELECT COUNT(*) FROM {table};")
+        assert cursor.fetchone()[0] == 0, f"Table {table} should be cleared."
+    cursor.execute("PRAGMA freelist_count;")
+    assert cursor.fetchone()[0] == 0, "The freed pages should have been vacuumed."
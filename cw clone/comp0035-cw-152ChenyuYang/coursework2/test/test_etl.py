@@ -0,0 +1,78 @@
+import sqlite3
+import pytest
+from coursework1 import cleaning, database, etl
+
+
+def write_csv(path, rows):
+    """Write a long-format affordable housing CSV."""
+    path.write_text("Code,Area,Year,Affordable Housing Supply\n"
+                    + "".join(f"{code},{name},{year},{value}\n" for code, name, year, value in rows))
+    return path
+
+
+def test_overlapping_sources_stream_through_workers(tmp_path):
+    """
+    GIVEN two affordable housing sources repeating one (area_code, year)
+    WHEN the ETL parses them in worker processes, in batches of one row
+    THEN every row should be loaded, with the later source's value for the repeated key.
+    """
+    first = write_csv(tmp_path / "first.csv", [("E1", "Area 1", "2019-20", 10), ("E2", "Area 2", "2019-20", 20)])
+    second = write_csv(tmp_path / "second.csv", [("E2", "Area 2", "2019-20", 25), ("E3", "Area 3", "2020-21", 30)])
+    db = tmp_path / "etl_test.db"
+
+    counts = etl.run_etl(db, [first, second], etl.waiting_list_xlsx_path, chunk_size=1, workers=2)
+
+    conn = sqlite3.connect(db)
+    assert counts["Affordable_Housing_Data"] == 3
+    assert conn.execute("SELECT area_code, year, housing_units FROM Affordable_Housing_Data ORDER BY area_code"
+                        ).fetchall() == [("E1", 2019, 10), ("E2", 2019, 25), ("E3", 2020, 30)]
+    conn.close()
+
+
+def test_worker_error_leaves_database_unchanged(tmp_path):
+    """
+    GIVEN a built database and a second source with a value that is not a whole number
+    WHEN the ETL runs again with worker processes
+    THEN the worker's ValueError should be raised and the previous rows kept.
+    """
+    good = write_csv(tmp_path / "good.csv", [("E1", "Area 1", "2019-20", 10)])
+    bad = write_csv(tmp_path / "bad.csv", [("E2", "Area 2", "2019-20", 10), ("E2", "Area 2", "2020-21", 1.5)])
+    db = tmp_path / "etl_test.db"
+    etl.run_etl(db, [good], etl.waiting_list_xlsx_path, workers=1)
+
+    with pytest.raises(ValueError, match="bad.csv line 3"):
+        etl.run_etl(db, [good, bad], etl.waiting_list_xlsx_path, chunk_size=1, workers=2)
+
+    conn = sqlite3.connect(db)
+    assert conn.execute("SELECT area_code FROM Affordable_Housing_Data").fetchall() == [("E1",)]
+    conn.close()
+
+
+def get_table_profile(db):
+    """Return {table: (row count, {column: sorted SQLite storage classes})} for the four ERD tables."""
+    conn = sqlite3.connect(db)
+    profile = {}
+    for table in database.TABLES:
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table});")]
+        types = {column: sorted(row[0] for row in conn.execute(f"SELECT DISTINCT typeof({column}) FROM {table};"))
+                 for column in columns}
+        profile[table] = (conn.execute(f"SELECT COUNT(*) FROM {table};").fetchone()[0], types)
+    conn.close()
+    return profile
+
+
+def test_etl_matches_create_database_on_shipped_sources(tmp_path, monkeypatch):
+    """
+    GIVEN the source files shipped in coursework1/data
+    WHEN the database is built once by run_etl() and once by create_database()
+    THEN both should have the same row count and column storage classes in every table.
+    """
+    monkeypatch.setattr(cleaning, "cache_dir", tmp_path / "cache")
+    monkeypatch.setattr(database, "db_path", tmp_path / "database.db")
+    database.create_database()
+
+    etl.run_etl(tmp_path / "etl.db", workers=1)
+
+    expected = get_table_profile(tmp_path / "database.db")
+    assert expected["Affordable_Housing_Data"][0] > 0
+    assert get_table_profile(tmp_path / "etl.db") == expected
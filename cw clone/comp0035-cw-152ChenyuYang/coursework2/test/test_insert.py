@@ -1,136 +1,256 @@
-import pytest
-import sqlite3
-from coursework2.section3.queries_insert import (
-    insert_new_area,
-    insert_new_year,
-    insert_housing_data,
-    insert_waiting_list_data,
-)
-
-# Mock database setup
-@pytest.fixture(scope="function")
-def setup_test_database():
-    """
-    Set up an in-memory SQLite database for testing.
-    The database will be fresh for each test.
-    """
-    conn = sqlite3.connect(":memory:")
-    cursor = conn.cursor()
-
-    # Enable foreign key constraints
-    cursor.execute("PRAGMA foreign_keys = ON;")
-
-    # Create mock tables
-    cursor.executescript("""
-    CREATE TABLE Area (
-        area_code TEXT PRIMARY KEY,
-        area_name TEXT
-    );
-
-    CREATE TABLE Year (
-        year INTEGER PRIMARY KEY
-    );
-
-    CREATE TABLE Affordable_Housing_Data (
-        area_code TEXT,
-        year INTEGER,
-        housing_units INTEGER,
-        FOREIGN KEY (area_code) REFERENCES Area (area_code),
-        FOREIGN KEY (year) REFERENCES Year (year)
-    );
-
-    CREATE TABLE Waiting_List_Data (
-        area_code TEXT,
-        year INTEGER,
-        households_count INTEGER,
-        FOREIGN KEY (area_code) REFERENCES Area (area_code),
-        FOREIGN KEY (year) REFERENCES Year (year)
-    );
-    """)
-
-    yield conn, cursor
-    conn.close()
-
-
-def test_insert_new_area(setup_test_database):
-    conn, cursor = setup_test_database
-    area_code = "A1"
-    area_name = "Test Area"
-    result = insert_new_area(cursor, area_code, area_name)
-
-    # Verify the area is inserted
-    cursor.execute("SELECT * FROM Area WHERE area_code = ?;", (area_code,))
-    row = cursor.fetchone()
-    assert row is not None, "The new area should be inserted into the database."
-    assert row[0] == area_code
-    assert row[1] == area_name
-
-    # Test inserting duplicate area
-    with pytest.raises(sqlite3.IntegrityError, match="UNIQUE constraint failed"):
-        insert_new_area(cursor, area_code, area_name)
-
-
-def test_insert_new_year(setup_test_database):
-    conn, cursor = setup_test_database
-    year = 2025
-    result = insert_new_year(cursor, year)
-
-    # Verify the year is inserted
-    cursor.execute("SELECT * FROM Year WHERE year = ?;", (year,))
-    row = cursor.fetchone()
-    assert row is not None, "The new year should be inserted into the database."
-    assert row[0] == year
-
-    # Test inserting duplicate year
-    with pytest.raises(sqlite3.IntegrityError, match="UNIQUE constraint failed"):
-        insert_new_year(cursor, year)
-
-
-def test_insert_housing_data(setup_test_database):
-    conn, cursor = setup_test_database
-
-    # Insert valid area and year
-    insert_new_area(cursor, "A1", "Test Area")
-    insert_new_year(cursor, 2025)
-
-    # Insert valid housing data
-    result = insert_housing_data(cursor, "A1", 2025, 100)
-    cursor.execute("""
-    SELECT * FROM Affordable_Housing_Data WHERE area_code = 'A1' AND year = 2025;
-    """)
-    row = cursor.fetchone()
-    assert row is not None, "The new housing data should be inserted into the database."
-    assert row[0] == "A1"
-    assert row[1] == 2025
-    assert row[2] == 100
-
-    # Test inserting housing data with invalid foreign keys
-    with pytest.raises(sqlite3.IntegrityError, match="FOREIGN KEY constraint failed"):
-        insert_housing_data(cursor, "A99", 2025, 50)  # Invalid area_code
-    with pytest.raises(sqlite3.IntegrityError, match="FOREIGN KEY constraint failed"):
-        insert_housing_data(cursor, "A1", 2030, 50)  # Invalid year
-
-
-def test_insert_waiting_list_data(setup_test_database):
-    conn, cursor = setup_test_database
-
-    # Insert valid area and year
-    insert_new_area(cursor, "A1", "Test Area")
-    insert_new_year(cursor, 2025)
-
-    # Insert valid waiting list data
-    result = insert_waiting_list_data(cursor, "A1", 2025, 50)
-    cursor.execute("""
-    SELECT * FROM Waiting_List_Data WHERE area_code = 'A1' AND year = 2025;
-    """)
-    row = cursor.fetchone()
-    assert row is not None, "The new waiting list data should be inserted into the database."
-    assert row[0] == "A1"
-    assert row[1] == 2025
-    assert row[2] == 50
-
-    # Test inserting waiting list data with invalid foreign keys
-    with pytest.raises(sqlite3.IntegrityError, match="FOREIGN KEY constraint failed"):
-        insert_waiting_list_data(cursor, "A99", 2025, 30)  # Invalid area_code
-    with pytest.raises(sqlite3.IntegrityError, match="FOREIGN KEY constraint failed"):
-        insert_waiting_list_data(cursor, "A1", 2030, 30)  # Invalid year
+import pytest
+import sqlite3
+import pandas as pd
+from coursework2.section3.queries_insert import (
+    insert_new_area,
+    insert_new_year,
+    insert_housing_data,
+    insert_waiting_list_data,
+    insert_new_areas_many,
+    insert_new_years_many,
+    insert_housing_data_many,
+    insert_waiting_list_data_many,
+)
+
+# Mock database setup
+@pytest.fixture(scope="function")
+def setup_test_database():
+    """
+    Set up an in-memory SQLite database for testing.
+    The database will be fresh for each test.
+    """
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+
+    # Enable foreign key constraints
+    cursor.execute("PRAGMA foreign_keys = ON;")
+
+    # Create mock tables
+    cursor.executescript("""
+    CREATE TABLE Area (
+        area_code TEXT PRIMARY KEY,
+        area_name TEXT
+    );
+
+    CREATE TABLE Year (
+        year INTEGER PRIMARY KEY
+    );
+
+    CREATE TABLE Affordable_Housing_Data (
+        area_code TEXT,
+        year INTEGER,
+        housing_units INTEGER,
+        FOREIGN KEY (area_code) REFERENCES Area (area_code),
+        FOREIGN KEY (year) REFERENCES Year (year)
+    );
+
+    CREATE TABLE Waiting_List_Data (
+        area_code TEXT,
+        year INTEGER,
+        households_count INTEGER,
+        FOREIGN KEY (area_code) REFERENCES Area (area_code),
+        FOREIGN KEY (year) REFERENCES Year (year)
+    );
+    """)
+
+    yield conn, cursor
+    conn.close()
+
+
+def test_insert_new_area(setup_test_database):
+    conn, cursor = setup_test_database
+    area_code = "A1"
+    area_name = "Test Area"
+    result = insert_new_area(cursor, area_code, area_name)
+
+    # Verify the area is inserted
+    cursor.execute("SELECT * FROM Area WHERE area_code = ?;", (area_code,))
+    row = cursor.fetchone()
+    assert row is not None, "The new area should be inserted into the database."
+    assert row[0] == area_code
+    assert row[1] == area_name
+
+    # Test inserting duplicate area
+    with pytest.raises(sqlite3.IntegrityError, match="UNIQUE constraint failed"):
+        insert_new_area(cursor, area_code, area_name)
+
+
+def test_insert_new_year(setup_test_database):
+    conn, cursor = setup_test_database
+    year = 2025
+    result = insert_new_year(cursor, year)
+
+    # Verify the year is inserted
+    cursor.execute("SELECT * FROM Year WHERE year = ?;", (year,))
+    row = cursor.fetchone()
+    assert row is not None, "The new year should be inserted into the database."
+    assert row[0] == year
+
+    # Test inserting duplicate year
+    with pytest.raises(sqlite3.IntegrityError, match="UNIQUE constraint failed"):
+        insert_new_year(cursor, year)
+
+
+def test_insert_housing_data(setup_test_database):
+    conn, cursor = setup_test_database
+
+    # Insert valid area and year
+    insert_new_area(cursor, "A1", "Test Area")
+    insert_new_year(cursor, 2025)
+
+    # Insert valid housing data
+    result = insert_housing_data(cursor, "A1", 2025, 100)
+    cursor.execute("""
+    SELECT * FROM Affordable_Housing_Data WHERE area_code = 'A1' AND year = 2025;
+    """)
+    row = cursor.fetchone()
+    assert row is not None, "The new housing data should be inserted into the database."
+    assert row[0] == "A1"
+    assert row[1] == 2025
+    assert row[2] == 100
+
+    # Test inserting housing data with invalid foreign keys
+    with pytest.raises(sqlite3.IntegrityError, match="FOREIGN KEY constraint failed"):
+        insert_housing_data(cursor, "A99", 2025, 50)  # Invalid area_code
+    with pytest.raises(sqlite3.IntegrityError, match="FOREIGN KEY constraint failed"):
+        insert_housing_data(cursor, "A1", 2030, 50)  # Invalid year
+
+
+def test_insert_waiting_list_data(setup_test_database):
+    conn, cursor = setup_test_database
+
+    # Insert valid area and year
+    insert_new_area(cursor, "A1", "Test Area")
+    insert_new_year(cursor, 2025)
+
+    # Insert valid waiting list data
+    result = insert_waiting_list_data(cursor, "A1", 2025, 50)
+    cursor.execute("""
+    SELECT * FROM Waiting_List_Data WHERE area_code = 'A1' AND year = 2025;
+    """)
+    row = cursor.fetchone()
+    assert row is not None, "The new waiting list data should be inserted into the database."
+    assert row[0] == "A1"
+    assert row[1] == 2025
+    assert row[2] == 50
+
+    # Test inserting waiting list data with invalid foreign keys
+    with pytest.raises(sqlite3.IntegrityError, match="FOREIGN KEY constraint failed"):
+        insert_waiting_list_data(cursor, "A99", 2025, 30)  # Invalid area_code
+    with pytest.raises(sqlite3.IntegrityError, match="FOREIGN KEY constraint failed"):
+        insert_waiting_list_data(cursor, "A1", 2030, 30)  # Invalid year
+
+
+@pytest.fixture(scope="function")
+def setup_keyed_database():
+    """
+    Set up an in-memory SQLite database whose fact tables have the declared
+    composite primary keys, which the 'update' conflict mode relies on.
+    """
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA foreign_keys = ON;")
+    cursor.executescript("""
+    CREATE TABLE Area (
+        area_code TEXT PRIMARY KEY,
+        area_name TEXT NOT NULL
+    );
+
+    CREATE TABLE Year (
+        year INTEGER PRIMARY KEY
+    );
+
+    CREATE TABLE Affordable_Housing_Data (
+        area_code TEXT,
+        year INTEGER,
+        housing_units INTEGER NOT NULL,
+        PRIMARY KEY (area_code, year),
+        FOREIGN KEY (area_code) REFERENCES Area (area_code),
+        FOREIGN KEY (year) REFERENCES Year (year)
+    );
+
+    CREATE TABLE Waiting_List_Data (
+        area_code TEXT,
+        year INTEGER,
+        households_count INTEGER NOT NULL,
+        PRIMARY KEY (area_code, year),
+        FOREIGN KEY (area_code) REFERENCES Area (area_code),
+        FOREIGN KEY (year) REFERENCES Year (year)
+    );
+    """)
+
+    yield conn, cursor
+    conn.close()
+
+
+def test_insert_housing_data_many(setup_test_database):
+    conn, cursor = setup_test_database
+
+    insert_new_areas_many(cursor, [("A1", "Area 1"), ("A2", "Area 2"), ("A3", "Area 3")])
+    insert_new_years_many(cursor, [2020, 2021])
+    rows = [("A1", 2020, 10), ("A2", 2020, 20), ("A3", 2020, 30), ("A1", 2021, 11), ("A2", 2021, 21)]
+    counts = insert_housing_data_many(cursor, rows, batch_size=2)
+
+    # One count per batch of two rows
+    assert counts == [2, 2, 1], "Each batch should report how many rows it inserted."
+    cursor.execute("SELECT area_code, year, housing_units FROM Affordable_Housing_Data ORDER BY year, area_code;")
+    assert cursor.fetchall() == rows
+
+
+def test_insert_waiting_list_data_many_from_dataframe(setup_test_database):
+    conn, cursor = setup_test_database
+
+    insert_new_areas_many(cursor, pd.DataFrame({"area_code": ["A1", "A2"], "area_name": ["Area 1", "Area 2"]}))
+    insert_new_years_many(cursor, pd.DataFrame({"year": [2020]}))
+    frame = pd.DataFrame({"area_code": ["A1", "A2"], "year": [2020, 2020], "households_count": [50, 60]})
+    counts = insert_waiting_list_data_many(cursor, frame)
+
+    assert counts == [2]
+    cursor.execute("SELECT area_code, year, households_count FROM Waiting_List_Data ORDER BY area_code;")
+    rows = cursor.fetchall()
+    assert rows == [("A1", 2020, 50), ("A2", 2020, 60)]
+    assert all(isinstance(row[2], int) for row in rows), "NumPy integers should be stored as INTEGER."
+
+
+def test_insert_many_is_all_or_nothing(setup_test_database):
+    conn, cursor = setup_test_database
+
+    insert_new_area(cursor, "A1", "Test Area")
+    insert_new_year(cursor, 2025)
+
+    # The second batch violates the area foreign key
+    rows = [("A1", 2025, 10), ("A99", 2025, 20)]
+    with pytest.raises(sqlite3.IntegrityError, match="FOREIGN KEY constraint failed"):
+        insert_housing_data_many(cursor, rows, batch_size=1)
+
+    cursor.execute("SELECT COUNT(*) FROM Affordable_Housing_Data;")
+    assert cursor.fetchone()[0] == 0, "A failed bulk insert should not leave earlier batches behind."
+
+
+def test_insert_many_conflict_modes(setup_keyed_database):
+    conn, cursor = setup_keyed_database
+
+    insert_new_areas_many(cursor, [("A1", "Area 1")])
+    insert_new_years_many(cursor, [2020, 2021])
+    insert_waiting_list_data_many(cursor, [("A1", 2020, 50)])
+
+    with pytest.raises(sqlite3.IntegrityError, match="UNIQUE constraint failed"):
+        insert_waiting_list_data_many(cursor, [("A1", 2020, 55)])
+
+    # 'ignore' keeps the existing row and only adds the new one
+    counts = insert_waiting_list_data_many(cursor, [("A1", 2020, 55), ("A1", 2021, 70)], on_conflict="ignore")
+    assert counts == [1]
+    cursor.execute("SELECT households_count FROM Waiting_List_Data WHERE year = 2020;")
+    assert cursor.fetchone()[0] == 50
+
+    # 'update' overwrites the value of the existing row
+    insert_waiting_list_data_many(cursor, [("A1", 2020, 55)], on_conflict="update")
+    cursor.execute("SELECT households_count FROM Waiting_List_Data WHERE year = 2020;")
+    assert cursor.fetchone()[0] == 55
+
+    insert_new_areas_many(cursor, [{"area_code": "A1", "area_name": "Renamed"}], on_conflict="update")
+    cursor.execute("SELECT area_name FROM Area WHERE area_code = 'A1';")
+    assert cursor.fetchone()[0] == "Renamed"
+
+    with pytest.raises(ValueError):
+        insert_waiting_list_data_many(cursor, [("A1", 2021, 1)], on_conflict="replace")
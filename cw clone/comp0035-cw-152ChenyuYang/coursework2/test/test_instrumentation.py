@@ -0,0 +1,122 @@
+import sqlite3
+import pytest
+from coursework2 import instrumentation
+from coursework2.instrumentation import fingerprint, export_prometheus, get_metrics, get_slow_queries
+from coursework2.section3.queries_select import get_waiting_list_by_year
+from coursework2.section3.queries_insert import insert_new_year
+from coursework2.section3.queries_aggregate import execute_aggregate_query
+
+# Mock database setup
+@pytest.fixture(scope="function")
+def setup_test_database():
+    """
+    Set up an in-memory SQLite database with empty metrics, and restore the settings afterwards.
+    """
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+
+    cursor.executescript("""
+    CREATE TABLE Year (
+        year INTEGER PRIMARY KEY
+    );
+
+    CREATE TABLE Waiting_List_Data (
+        area_code TEXT,
+        year INTEGER,
+        households_count INTEGER
+    );
+
+    INSERT INTO Year (year) VALUES (2020);
+    INSERT INTO Waiting_List_Data (area_code, year, households_count) VALUES
+        ('A1', 2020, 50),
+        ('A2', 2020, 30);
+    """)
+    instrumentation.reset_metrics()
+    threshold = instrumentation.SLOW_QUERY_SECONDS
+
+    yield conn, cursor
+    instrumentation.set_slow_query_threshold(threshold)
+    instrumentation.reset_metrics()
+    conn.close()
+
+
+def test_fingerprint_normalizes_literals_and_whitespace():
+    """
+    GIVEN two statements differing only in literals, IN-list length and layout
+    WHEN fingerprinting them
+    THEN they should share one fingerprint.
+    """
+    first = fingerprint("SELECT *  FROM Area\n WHERE area_code IN ('A1', 'A2') AND year = 2020; -- note")
+    second = fingerprint("SELECT * FROM Area WHERE area_code IN (?, ?, ?) AND year = ?")
+
+    assert first == second == "SELECT * FROM Area WHERE area_code IN (...) AND year = ?"
+    assert fingerprint("SELECT idx_2 FROM t1") == "SELECT idx_2 FROM t1", "Identifiers keep their digits."
+
+
+def test_hooks_receive_timing_and_rows(setup_test_database):
+    """
+    GIVEN a registered hook
+    WHEN a SELECT and an INSERT run through the helpers
+    THEN the hook should see each statement's kind, rows and timing.
+    """
+    conn, cursor = setup_test_database
+    events = []
+    instrumentation.add_hook(events.append)
+    try:
+        get_waiting_list_by_year(cursor, 2020)
+        insert_new_year(cursor, 2021)
+    finally:
+        instrumentation.remove_hook(events.append)
+
+    assert [(event.kind, event.rows) for event in events] == [("select", 2), ("insert", 1)]
+    assert all(event.seconds >= 0 and event.error is None for event in events)
+
+
+def test_slow_query_logs_plan(setup_test_database, caplog):
+    """
+    GIVEN a slow-query threshold of 0 seconds
+    WHEN a query runs
+    THEN its EXPLAIN QUERY PLAN should be logged and kept.
+    """
+    conn, cursor = setup_test_database
+    instrumentation.set_slow_query_threshold(0)
+
+    with caplog.at_level("WARNING", logger="coursework2.instrumentation"):
+        get_waiting_list_by_year(cursor, 2020)
+
+    slow = get_slow_queries()
+    assert len(slow) == 1
+    assert any("Waiting_List_Data" in line for line in slow[0].plan)
+    assert "Slow select query" in caplog.text
+
+
+def test_errors_are_counted(setup_test_database):
+    """
+    GIVEN a query against a missing table
+    WHEN it runs through `execute_aggregate_query`
+    THEN the helper should still return None and the error be counted.
+    """
+    conn, cursor = setup_test_database
+    assert execute_aggregate_query(cursor, "SELECT COUNT(*) FROM Missing;") is None
+
+    metrics = get_metrics()[("aggregate", "SELECT COUNT(*) FROM Missing")]
+    assert (metrics["count"], metrics["errors"]) == (1, 1)
+
+
+def test_export_prometheus(setup_test_database, tmp_path):
+    """
+    GIVEN two runs of the same statement
+    WHEN the metrics are exported
+    THEN the file should hold the counters and a cumulative latency histogram in Prometheus format.
+    """
+    conn, cursor = setup_test_database
+    get_waiting_list_by_year(cursor, 2020)
+    get_waiting_list_by_year(cursor, 2020)
+
+    text = export_prometheus(tmp_path / "metrics.prom").read_text()
+    labels = 'kind="select",fingerprint="SELECT area_code, households_count FROM Waiting_List_Data'
+    assert "# TYPE housing_query_total counter" in text
+    assert f"housing_query_rows_total{{{labels}" in text
+    assert [line.rsplit(" ", 1)[1] for line in text.splitlines()
+            if line.startswith("housing_query_duration_seconds_bucket") and 'le="+Inf"' in line] == ["2"]
+    assert list(tmp_path.iterdir()) == [tmp_path / "metrics.prom"], "The temporary file should be renamed."
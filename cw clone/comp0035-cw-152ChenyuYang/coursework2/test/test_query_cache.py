@@ -0,0 +1,182 @@
+import sqlite3
+import pytest
+from coursework2 import query_cache
+from coursework2.connection import transaction
+from coursework2.query_cache import QueryCache, cache_info, cache_clear
+from coursework2.section3.queries_select import get_all_areas, get_unique_years
+from coursework2.section3.queries_insert import insert_new_area
+
+
+@pytest.fixture(scope="function")
+def db_file(tmp_path):
+    """
+    Create a small file-backed database; in-memory databases are not cached.
+    """
+    path = tmp_path / "cache_test.db"
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+    CREATE TABLE Area (
+        area_code TEXT PRIMARY KEY,
+        area_name TEXT
+    );
+    CREATE TABLE Year (
+        year INTEGER PRIMARY KEY
+    );
+    INSERT INTO Area VALUES ('A1', 'Area 1');
+    INSERT INTO Year VALUES (2020);
+    """)
+    conn.close()
+    cache_clear()
+    yield path
+    cache_clear()
+
+
+def test_repeated_query_is_a_hit(db_file):
+    """
+    GIVEN a file-backed database
+    WHEN the same SELECT function is called twice with the same arguments
+    THEN the second call should be served from the cache.
+    """
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+
+    assert get_all_areas(cursor) == [("Area 1",)]
+    assert get_all_areas(cursor) == [("Area 1",)]
+
+    info = cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+    conn.close()
+
+
+def test_insert_helper_invalidates_only_its_table(db_file):
+    """
+    GIVEN cached results for Area and Year
+    WHEN insert_new_area writes to Area on the same connection
+    THEN the Area result should be re-queried and the Year result still served from the cache.
+    """
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    get_all_areas(cursor)
+    get_unique_years(cursor)
+
+    insert_new_area(cursor, "A2", "Area 2")
+
+    assert get_all_areas(cursor) == [("Area 1",), ("Area 2",)]
+    assert get_unique_years(cursor) == [(2020,)]
+    assert cache_info().hits == 1, "Only the Year query should be a hit."
+    conn.close()
+
+
+def test_commit_from_other_connection_invalidates(db_file):
+    """
+    GIVEN a cached result
+    WHEN another connection commits a change without going through the helpers
+    THEN PRAGMA data_version should reveal the change and the result be re-queried.
+    """
+    reader = sqlite3.connect(db_file)
+    writer = sqlite3.connect(db_file)
+    get_all_areas(reader.cursor())
+
+    writer.execute("INSERT INTO Area VALUES ('A3', 'Area 3');")
+    writer.commit()
+
+    assert get_all_areas(reader.cursor()) == [("Area 1",), ("Area 3",)]
+    assert cache_info().hits == 0
+    writer.close()
+    reader.close()
+
+
+def test_entries_expire_after_ttl(db_file, monkeypatch):
+    """
+    GIVEN a cache with a 10 second TTL
+    WHEN a result is requested again after the TTL has passed
+    THEN it should be re-queried.
+    """
+    cache = QueryCache(maxsize=8, ttl=10)
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "monotonic", lambda: now[0])
+    query = get_all_areas.uncached
+
+    cache.call(cursor, query, ("Area",), ())
+    cache.call(cursor, query, ("Area",), ())
+    now[0] += 11
+    cache.call(cursor, query, ("Area",), ())
+
+    assert (cache.hits, cache.misses) == (1, 2)
+    conn.close()
+
+
+def test_in_memory_database_is_not_cached():
+    """
+    GIVEN an in-memory database
+    WHEN a SELECT function is called
+    THEN nothing should be cached or counted.
+    """
+    cache_clear()
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE Area (area_code TEXT, area_name TEXT);")
+
+    get_all_areas(conn.cursor())
+    get_all_areas(conn.cursor())
+
+    assert cache_info() == (0, 0, query_cache.CACHE_SIZE, 0)
+    conn.close()
+
+
+def test_result_modes_are_cached_separately(db_file):
+    """
+    GIVEN a cached list result
+    WHEN the same function is called with as_frame=True and the frame is modified
+    THEN the frame should be a separate entry and the cached copy left unchanged.
+    """
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    get_all_areas(cursor)
+
+    frame = get_all_areas(cursor, as_frame=True)
+    frame.loc[0, "area_name"] = None
+
+    assert get_all_areas(cursor, as_frame=True)["area_name"].tolist() == ["Area 1"]
+    assert get_all_areas(cursor) == [("Area 1",)]
+    assert (cache_info().hits, cache_info().misses) == (2, 2)
+    conn.close()
+
+
+def test_raw_write_on_same_connection_invalidates(db_file):
+    """
+    GIVEN a cached result
+    WHEN the same connection writes with a raw cursor.execute, bypassing the helpers
+    THEN conn.total_changes should reveal the change and the result be re-queried.
+    """
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    get_all_areas(cursor)
+
+    cursor.execute("UPDATE Area SET area_name = 'Renamed' WHERE area_code = 'A1';")
+
+    assert get_all_areas(cursor) == [("Renamed",)]
+    assert cache_info().hits == 0
+    conn.close()
+
+
+def test_read_inside_rolled_back_transaction_is_not_cached(db_file):
+    """
+    GIVEN a row inserted inside connection.transaction() and read through a cached SELECT
+    WHEN the transaction is rolled back
+    THEN the SELECT should no longer return the row, on this or another connection.
+    """
+    conn = sqlite3.connect(db_file)
+    cursor = conn.cursor()
+    with pytest.raises(RuntimeError):
+        with transaction(conn):
+            insert_new_area(cursor, "A2", "Area 2")
+            assert get_all_areas(cursor) == [("Area 1",), ("Area 2",)]
+            raise RuntimeError("roll back")
+
+    other = sqlite3.connect(db_file)
+    assert get_all_areas(cursor) == [("Area 1",)]
+    assert get_all_areas(other.cursor()) == [("Area 1",)]
+    other.close()
+    conn.close()
@@ -0,0 +1,142 @@
+import difflib
+import json
+import os
+import re
+import sqlite3
+from pathlib import Path
+
+import pytest
+from coursework2 import connection, instrumentation
+from coursework2.benchmark.runner import CASES, get_sample, time_case
+from coursework2.benchmark.synthetic import build_synthetic_database
+
+# Expected plan of every statement the section3 functions run, regenerated with
+# UPDATE_QUERY_PLANS=1 python -m pytest coursework2/test/test_query_plans.py
+GOLDEN_PLANS = Path(__file__).resolve().parent / "query_plans.json"
+
+FACT_TABLES = {"Affordable_Housing_Data", "Waiting_List_Data", "Area_Year_Facts"}
+
+# Cases allowed to SCAN a fact table, and why the scan is not a regression
+ALLOWED_SCANS = {
+    "aggregate.get_top_waiting_lists": "walks idx_waiting_count in order and stops after k rows",
+    "aggregate.get_max_waiting_list": "walks idx_waiting_count in order and stops after one row",
+    "aggregate.get_min_waiting_list": "walks idx_waiting_count in order and stops after one row",
+    "join.get_filtered_area_and_year[all]": "unfiltered listing of every area and year",
+}
+
+# Cases that run no query through the execute_* helpers
+UNPLANNED = {
+    "aggregate.verify_rollups": "audit recomputing every rollup, reads the whole fact tables by design",
+    "delete.clear_all_data": "drops and recreates the tables, no DML to plan",
+}
+
+
+@pytest.fixture(scope="module")
+def query_plans(tmp_path_factory):
+    """
+    Run every benchmark case once against a tiny synthetic database built with the
+    declared schema, and capture the EXPLAIN QUERY PLAN of each statement it runs.
+    Statements are explained as they run, so temporary staging tables still exist.
+    :return: Dict of case name -> list of {"sql": fingerprint, "plan": lines}
+    """
+    path = tmp_path_factory.mktemp("plans") / "synthetic.db"
+    build_synthetic_database(path, areas=20, years=5, density=0.8, seed=1)
+    pool = connection.ConnectionPool(path, size=1)
+    conn = pool.acquire()
+    statements = []
+
+    def capture(event):
+        placeholders = event.sql.count("?")
+        params = event.params
+        if not isinstance(params, (tuple, list)) or len(params) != placeholders:
+            # executemany batches: the plan does not depend on the values
+            params = (None,) * placeholders
+        plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {event.sql}", params)]
+        statements.append({"sql": event.fingerprint, "plan": plan})
+
+    instrumentation.add_hook(capture)
+    try:
+        sample = get_sample(conn.cursor())
+        plans = {}
+        for case in CASES:
+            statements = []
+            time_case(conn, case, sample)
+            plans[case.name] = statements
+        yield plans
+    finally:
+        instrumentation.remove_hook(capture)
+        conn.close()
+        pool.close()
+
+
+def get_aliases(sql):
+    """Map the `Table AS alias` names of a statement back to their tables."""
+    return {alias: table for table, alias in re.findall(r"\b(\w+)\s+AS\s+(\w+)", sql, re.IGNORECASE)}
+
+
+def get_fact_scans(statements):
+    """Return the plan lines that SCAN a fact table, directly or through an alias."""
+    scans = []
+    for statement in statements:
+        aliases = get_aliases(statement["sql"])
+        for line in statement["plan"]:
+            match = re.match(r"SCAN (\w+)", line)
+            if match and aliases.get(match.group(1), match.group(1)) in FACT_TABLES:
+                scans.append(f"{line}    <- {statement['sql']}")
+    return scans
+
+
+def format_plans(plans):
+    """One line per statement and plan step, so changes read as a diff."""
+    lines = []
+    for name, statements in sorted(plans.items()):
+        lines.append(f"[{name}]")
+        for statement in statements:
+            lines.append(f"  {statement['sql']}")
+            lines += [f"    {line}" for line in statement["plan"]]
+    return lines
+
+
+def test_every_case_is_planned(query_plans):
+    """
+    GIVEN the benchmark cases covering each section3 module
+    WHEN they run with a plan-capturing hook
+    THEN every case should have run and explained at least one statement.
+    """
+    assert set(query_plans) == {case.name for case in CASES}
+    assert [name for name, statements in query_plans.items() if not statements] == list(UNPLANNED), \
+        "Every query helper should be tracked."
+
+
+def test_no_fact_table_scans(query_plans):
+    """
+    GIVEN the plan of every statement the section3 functions run
+    WHEN looking for full scans
+    THEN no fact table should be scanned, apart from the listed bounded or inherent scans.
+    """
+    scans = {name: get_fact_scans(statements) for name, statements in query_plans.items()
+             if name not in ALLOWED_SCANS}
+    scans = {name: lines for name, lines in scans.items() if lines}
+
+    assert not scans, "Fact table scans:\n" + "\n".join(
+        f"{name}:\n  " + "\n  ".join(lines) for name, lines in sorted(scans.items()))
+
+
+def test_plans_match_golden_file(query_plans):
+    """
+    GIVEN the plans recorded in query_plans.json
+    WHEN comparing them with the current plans
+    THEN any change should be reported as a diff (UPDATE_QUERY_PLANS=1 accepts it).
+    """
+    if os.environ.get("UPDATE_QUERY_PLANS"):
+        GOLDEN_PLANS.write_text(json.dumps({"sqlite": sqlite3.sqlite_version, "plans": query_plans},
+                                           indent=2, sort_keys=True) + "\n")
+        pytest.skip(f"Plans written to {GOLDEN_PLANS}")
+
+    golden = json.loads(GOLDEN_PLANS.read_text())
+    if golden["sqlite"] != sqlite3.sqlite_version:
+        pytest.skip(f"Plans were recorded with SQLite {golden['sqlite']}, not {sqlite3.sqlite_version}")
+
+    diff = list(difflib.unified_diff(format_plans(golden["plans"]), format_plans(query_plans),
+                                     "query_plans.json", "current", lineterm=""))
+    assert not diff, "Query plans changed (rerun with UPDATE_QUERY_PLANS=1 if intended):\n" + "\n".join(diff)
@@ -0,0 +1,133 @@
+import pytest
+import sqlite3
+from coursework2.results import fetch_arrays, fetch_result
+from coursework2.section3.queries_select import get_waiting_list_by_year
+from coursework2.section3.queries_aggregate import get_total_housing_units_by_year, get_top_waiting_lists
+from coursework2.section3.queries_join import get_filtered_area_and_year
+
+# Mock database setup
+@pytest.fixture(scope="function")
+def setup_test_database():
+    """
+    Set up an in-memory SQLite database for testing.
+    """
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+
+    cursor.executescript("""
+    CREATE TABLE Area (
+        area_code TEXT PRIMARY KEY,
+        area_name TEXT
+    );
+
+    CREATE TABLE Year (
+        year INTEGER PRIMARY KEY
+    );
+
+    CREATE TABLE Affordable_Housing_Data (
+        area_code TEXT,
+        year INTEGER,
+        housing_units INTEGER
+    );
+
+    CREATE TABLE Waiting_List_Data (
+        area_code TEXT,
+        year INTEGER,
+        households_count INTEGER
+    );
+
+    INSERT INTO Area (area_code, area_name) VALUES
+        ('A1', 'Area 1'),
+        ('A2', 'Area 2');
+
+    INSERT INTO Year (year) VALUES (2020), (2021);
+
+    INSERT INTO Affordable_Housing_Data (area_code, year, housing_units) VALUES
+        ('A1', 2020, 100),
+        ('A2', 2020, 200);
+
+    INSERT INTO Waiting_List_Data (area_code, year, households_count) VALUES
+        ('A1', 2020, 50),
+        ('A2', 2020, 30),
+        ('A1', 2021, 70);
+    """)
+
+    yield conn, cursor
+    conn.close()
+
+
+def test_select_as_arrays_uses_typed_columns(setup_test_database):
+    """
+    GIVEN waiting list data for 2020
+    WHEN calling `get_waiting_list_by_year` with as_arrays=True
+    THEN area codes should be categorical and counts an int64 array.
+    """
+    conn, cursor = setup_test_database
+    result = get_waiting_list_by_year(cursor, 2020, as_arrays=True)
+
+    assert list(result) == ["area_code", "households_count"]
+    assert list(result["area_code"]) == ["A1", "A2"]
+    assert str(result["area_code"].dtype) == "category"
+    assert result["households_count"].dtype == "int64"
+    assert result["households_count"].tolist() == [50, 30]
+
+
+def test_join_as_frame_matches_rows(setup_test_database):
+    """
+    GIVEN the area, year and fact tables
+    WHEN calling `get_filtered_area_and_year` with and without as_frame=True
+    THEN the DataFrame should hold the same rows as the default list result.
+    """
+    conn, cursor = setup_test_database
+    rows = get_filtered_area_and_year(cursor, area_name="Area 1")
+    frame = get_filtered_area_and_year(cursor, area_name="Area 1", as_frame=True)
+
+    assert list(frame.itertuples(index=False, name=None)) == rows
+    assert frame["year"].dtype == "int32"
+
+
+def test_aggregate_as_frame(setup_test_database):
+    """
+    GIVEN waiting list and housing data
+    WHEN calling aggregate functions with as_frame=True
+    THEN typed DataFrames should be returned.
+    """
+    conn, cursor = setup_test_database
+    total = get_total_housing_units_by_year(cursor, 2020, as_frame=True)
+    top = get_top_waiting_lists(cursor, k=2, as_frame=True)
+
+    assert total.iloc[0, 0] == 300
+    assert top["households_count"].tolist() == [70, 50]
+    assert top["year"].dtype == "int32"
+
+
+def test_fetch_arrays_widens_nulls_and_grows(setup_test_database):
+    """
+    GIVEN more rows than one fetch batch, with a NULL in an integer column
+    WHEN reading them with `fetch_arrays`
+    THEN every row should be kept and the column widened to float with NaN.
+    """
+    conn, cursor = setup_test_database
+    cursor.executemany("INSERT INTO Waiting_List_Data VALUES ('A3', ?, ?);",
+                       [(2000 + i, None if i == 5 else i) for i in range(10)])
+    cursor.execute("SELECT year, households_count FROM Waiting_List_Data WHERE area_code = 'A3';")
+    result = fetch_arrays(cursor, arraysize=3)
+
+    assert len(result["year"]) == 10
+    assert result["households_count"].dtype == "float64"
+    assert result["households_count"][4] == 4.0
+    assert result["households_count"][5] != result["households_count"][5], "NULL should become NaN."
+
+
+def test_fetch_result_empty_frame_keeps_columns(setup_test_database):
+    """
+    GIVEN a query matching no rows
+    WHEN reading it with `fetch_result` and as_frame=True
+    THEN an empty DataFrame with the query's columns should be returned.
+    """
+    conn, cursor = setup_test_database
+    cursor.execute("SELECT area_code, year FROM Waiting_List_Data WHERE year = 1999;")
+    frame = fetch_result(cursor, as_frame=True)
+
+    assert frame.empty
+    assert list(frame.columns) == ["area_code", "year"]
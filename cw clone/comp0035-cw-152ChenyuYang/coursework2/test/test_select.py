@@ -1,119 +1,233 @@
-import sys
-from pathlib import Path
-import pytest
-
-
-# Add the parent directory of coursework2 to the module search path
-base_dir = Path(__file__).resolve().parent.parent.parent
-sys.path.append(str(base_dir))
-
-from coursework2.section3.queries_select import (
-    get_all_areas,
-    get_waiting_list_by_year,
-    get_housing_data_by_area,
-    get_area_details_by_year,
-    get_unique_years,
-    get_areas_with_large_waiting_lists,
-    get_db_connection,
-)
-
-# Define the database path
-db_path = base_dir / "coursework1" / "database" / "local_authority_housing.db"
-
-# Check if the database path exists
-assert db_path.exists(), f"Database file not found at: {db_path}"
-
-
-@pytest.fixture(scope="module")
-def db_cursor():
-    """
-    Set up the database connection and cursor, and close the connection after tests.
-    """
-    try:
-        conn, cursor = get_db_connection(db_path)
-        yield cursor
-    except Exception as e:
-        raise RuntimeError(f"Failed to connect to the database: {e}")
-    finally:
-        conn.close()
-
-
-def test_get_all_areas(db_cursor):
-    """
-    GIVEN the database contains area names
-    WHEN calling `get_all_areas`
-    THEN the returned results should not be empty, and all area names should be strings.
-    """
-    results = get_all_areas(db_cursor)
-    assert results is not None, "The result should not be None"
-    assert len(results) > 0, "The area list should not be empty"
-    assert all(isinstance(area[0], str) for area in results), "Each area name should be a string"
-
-
-def test_get_waiting_list_by_year(db_cursor):
-    """
-    GIVEN a specific year exists in the database
-    WHEN calling `get_waiting_list_by_year`
-    THEN the results should include valid area codes and integer waiting list counts.
-    """
-    year = 2020
-    results = get_waiting_list_by_year(db_cursor, year)
-    assert results is not None, "The result should not be None"
-    assert len(results) > 0, f"There should be waiting list data for the year {year}"
-    assert all(isinstance(row[1], int) for row in results), "The waiting list count should be an integer"
-
-
-def test_get_housing_data_by_area(db_cursor):
-    """
-    GIVEN a specific area code exists in the database
-    WHEN calling `get_housing_data_by_area`
-    THEN the results should include years and integer housing unit counts.
-    """
-    area_code = "E09000001"
-    results = get_housing_data_by_area(db_cursor, area_code)
-    assert results is not None, "The result should not be None"
-    assert len(results) > 0, f"There should be housing data for area code {area_code}"
-    assert all(isinstance(row[1], int) for row in results), "The housing unit count should be an integer"
-
-
-def test_get_area_details_by_year(db_cursor):
-    """
-    GIVEN a specific area code and year exist in the database
-    WHEN calling `get_area_details_by_year`
-    THEN the result should include area name, integer housing units, and waiting list counts.
-    """
-    area_code = "E09000001"
-    year = 2020
-    results = get_area_details_by_year(db_cursor, area_code, year)
-    assert results is not None, "The result should not be None"
-    if len(results) == 0:
-        assert results == [], "Results should be an empty list when no data is found"
-    else:
-        assert isinstance(results[0][0], str), "The area name should be a string"
-        assert isinstance(results[0][1], int), "The housing unit count should be an integer"
-        assert isinstance(results[0][2], int), "The waiting list count should be an integer"
-
-
-def test_get_unique_years(db_cursor):
-    """
-    GIVEN the database contains unique years
-    WHEN calling `get_unique_years`
-    THEN the result should include integer years in ascending order.
-    """
-    results = get_unique_years(db_cursor)
-    assert results is not None, "The result should not be None"
-    assert len(results) > 0, "The year list should not be empty"
-    assert all(isinstance(year[0], int) for year in results), "Each year should be an integer"
-
-
-def test_get_areas_with_large_waiting_lists(db_cursor):
-    """
-    GIVEN a minimum household count threshold
-    WHEN calling `get_areas_with_large_waiting_lists`
-    THEN the result should include areas and years with waiting lists above the threshold.
-    """
-    min_households = 500
-    results = get_areas_with_large_waiting_lists(db_cursor, min_households)
-    assert results is not None, "The result should not be None"
-    assert len(results) > 0, f"There should be records with waiting list counts greater than {min_households}"
-    assert all(row[2] > min_households for row in results), "The waiting list count should be greater than the minimum threshold"
+import sqlite3
+import sys
+from pathlib import Path
+import pytest
+
+
+# Add the parent directory of coursework2 to the module search path
+base_dir = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(base_dir))
+
+from coursework2.section3.queries_select import (
+    get_all_areas,
+    get_waiting_list_by_year,
+    get_housing_data_by_area,
+    get_area_details_by_year,
+    get_unique_years,
+    get_areas_with_large_waiting_lists,
+    get_area_comparison_by_year,
+    get_db_connection,
+    iter_pages,
+)
+from coursework2 import query_cache
+from coursework1.database import SCHEMA_SQL, FACTS_SQL, build_area_year_facts
+
+# Define the database path
+db_path = base_dir / "coursework1" / "database" / "local_authority_housing.db"
+
+# Check if the database path exists
+assert db_path.exists(), f"Database file not found at: {db_path}"
+
+
+@pytest.fixture(scope="module")
+def db_cursor():
+    """
+    Set up the database connection and cursor, and close the connection after tests.
+    """
+    try:
+        conn, cursor = get_db_connection(db_path)
+        yield cursor
+    except Exception as e:
+        raise RuntimeError(f"Failed to connect to the database: {e}")
+    finally:
+        conn.close()
+
+
+def test_get_all_areas(db_cursor):
+    """
+    GIVEN the database contains area names
+    WHEN calling `get_all_areas`
+    THEN the returned results should not be empty, and all area names should be strings.
+    """
+    results = get_all_areas(db_cursor)
+    assert results is not None, "The result should not be None"
+    assert len(results) > 0, "The area list should not be empty"
+    assert all(isinstance(area[0], str) for area in results), "Each area name should be a string"
+
+
+def test_get_waiting_list_by_year(db_cursor):
+    """
+    GIVEN a specific year exists in the database
+    WHEN calling `get_waiting_list_by_year`
+    THEN the results should include valid area codes and integer waiting list counts.
+    """
+    year = 2020
+    results = get_waiting_list_by_year(db_cursor, year)
+    assert results is not None, "The result should not be None"
+    assert len(results) > 0, f"There should be waiting list data for the year {year}"
+    assert all(isinstance(row[1], int) for row in results), "The waiting list count should be an integer"
+
+
+def test_get_housing_data_by_area(db_cursor):
+    """
+    GIVEN a specific area code exists in the database
+    WHEN calling `get_housing_data_by_area`
+    THEN the results should include years and integer housing unit counts.
+    """
+    area_code = "E09000001"
+    results = get_housing_data_by_area(db_cursor, area_code)
+    assert results is not None, "The result should not be None"
+    assert len(results) > 0, f"There should be housing data for area code {area_code}"
+    assert all(isinstance(row[1], int) for row in results), "The housing unit count should be an integer"
+
+
+def test_get_area_details_by_year(db_cursor):
+    """
+    GIVEN a specific area code and year exist in the database
+    WHEN calling `get_area_details_by_year`
+    THEN the result should include area name, integer housing units, and waiting list counts.
+    """
+    area_code = "E09000001"
+    year = 2020
+    results = get_area_details_by_year(db_cursor, area_code, year)
+    assert results is not None, "The result should not be None"
+    if len(results) == 0:
+        assert results == [], "Results should be an empty list when no data is found"
+    else:
+        assert isinstance(results[0][0], str), "The area name should be a string"
+        assert isinstance(results[0][1], int), "The housing unit count should be an integer"
+        assert isinstance(results[0][2], int), "The waiting list count should be an integer"
+
+
+def test_get_unique_years(db_cursor):
+    """
+    GIVEN the database contains unique years
+    WHEN calling `get_unique_years`
+    THEN the result should include integer years in ascending order.
+    """
+    results = get_unique_years(db_cursor)
+    assert results is not None, "The result should not be None"
+    assert len(results) > 0, "The year list should not be empty"
+    assert all(isinstance(year[0], int) for year in results), "Each year should be an integer"
+
+
+def test_get_areas_with_large_waiting_lists(db_cursor):
+    """
+    GIVEN a minimum household count threshold
+    WHEN calling `get_areas_with_large_waiting_lists`
+    THEN the result should include areas and years with waiting lists above the threshold.
+    """
+    min_households = 500
+    results = get_areas_with_large_waiting_lists(db_cursor, min_households)
+    assert results is not None, "The result should not be None"
+    assert len(results) > 0, f"There should be records with waiting list counts greater than {min_households}"
+    assert all(row[2] > min_households for row in results), "The waiting list count should be greater than the minimum threshold"
+
+
+def test_get_area_comparison_by_year(db_cursor):
+    """
+    GIVEN the materialized Area_Year_Facts table
+    WHEN calling `get_area_comparison_by_year`
+    THEN every area with data for the year should be returned, highest ratio first.
+    """
+    results = get_area_comparison_by_year(db_cursor, 2020)
+    assert results is not None, "The result should not be None"
+    assert len(results) > 0, "There should be areas with data for 2020"
+    ratios = [row[4] for row in results if row[4] is not None]
+    assert ratios == sorted(ratios, reverse=True), "Areas should be ordered by ratio, highest first"
+
+
+@pytest.fixture(scope="function")
+def facts_cursor():
+    """
+    Set up an in-memory database with the coursework1 schema and Area_Year_Facts.
+    """
+    conn = sqlite3.connect(":memory:")
+    conn.execute("PRAGMA foreign_keys = ON;")
+    cursor = conn.cursor()
+    cursor.executescript(SCHEMA_SQL + FACTS_SQL + """
+    INSERT INTO Area VALUES ('A1', 'Area 1'), ('A2', 'Area 2');
+    INSERT INTO Year VALUES (2020), (2021);
+    INSERT INTO Affordable_Housing_Data VALUES ('A1', 2020, 100), ('A2', 2020, 50);
+    INSERT INTO Waiting_List_Data VALUES ('A1', 2020, 300), ('A2', 2021, 60);
+    """)
+    build_area_year_facts(conn)
+    yield cursor
+    conn.close()
+
+
+def test_area_year_facts_follow_writes(facts_cursor):
+    """
+    GIVEN Area_Year_Facts built from the source tables
+    WHEN the source tables are inserted into, updated and deleted from
+    THEN the triggers should keep the matching facts rows current.
+    """
+    cursor = facts_cursor
+    assert get_area_details_by_year(cursor, "A1", 2020) == [("Area 1", 100, 300)]
+
+    cursor.execute("UPDATE Affordable_Housing_Data SET housing_units = 150 WHERE area_code = 'A1';")
+    cursor.execute("INSERT INTO Waiting_List_Data VALUES ('A2', 2020, 25);")
+    cursor.execute("UPDATE Area SET area_name = 'Renamed' WHERE area_code = 'A2';")
+    cursor.execute("DELETE FROM Year WHERE year = 2021;")
+
+    cursor.execute("SELECT * FROM Area_Year_Facts ORDER BY area_code, year;")
+    assert cursor.fetchall() == [
+        ("A1", 2020, "Area 1", 150, 300, 2.0),
+        ("A2", 2020, "Renamed", 50, 25, 0.5),
+    ]
+
+
+def test_area_details_fall_back_without_facts_table(facts_cursor):
+    """
+    GIVEN a database without Area_Year_Facts
+    WHEN calling `get_area_details_by_year`
+    THEN the result should match the one read from the facts table.
+    """
+    cursor = facts_cursor
+    expected = get_area_details_by_year(cursor, "A1", 2020)
+    cursor.execute("DROP TABLE Area_Year_Facts;")
+    assert get_area_details_by_year(cursor, "A1", 2020) == expected
+
+
+def test_stream_matches_list_and_bypasses_cache(db_cursor):
+    """
+    GIVEN the real database
+    WHEN calling `get_areas_with_large_waiting_lists` with stream=True and a small arraysize
+    THEN the iterator should yield the same rows as the list result, without touching the cache.
+    """
+    rows = get_areas_with_large_waiting_lists(db_cursor, 0)
+    info = query_cache.cache_info()
+
+    stream = get_areas_with_large_waiting_lists(db_cursor, 0, stream=True, arraysize=7)
+    first = next(stream)
+    get_unique_years.uncached(db_cursor)  # Another query on the same cursor must not reset the stream
+
+    assert [first] + list(stream) == rows
+    assert query_cache.cache_info()[:2] == info[:2], "Streamed calls should be neither hits nor misses."
+
+
+def test_keyset_pages_cover_all_rows(db_cursor):
+    """
+    GIVEN the real database
+    WHEN reading `get_areas_with_large_waiting_lists` in keyset pages of 10 rows
+    THEN the pages should join up to the full, uniquely ordered result.
+    """
+    rows = get_areas_with_large_waiting_lists(db_cursor, 0)
+    pages = list(iter_pages(db_cursor, get_areas_with_large_waiting_lists, 0, page_size=10))
+
+    assert all(len(page) == 10 for page in pages[:-1])
+    assert [row for page in pages for row in page] == rows
+    keys = [(row[2], row[0], row[1]) for row in rows]
+    assert keys == sorted(keys, reverse=True), "Rows should be ordered by (households_count, area_code, year) DESC."
+
+
+def test_keyset_page_after_row(db_cursor):
+    """
+    GIVEN the list of years
+    WHEN asking for the page after the first year
+    THEN it should start at the second year.
+    """
+    years = get_unique_years(db_cursor)
+    page = get_unique_years(db_cursor, after=years[0], page_size=2)
+
+    assert page == years[1:3]
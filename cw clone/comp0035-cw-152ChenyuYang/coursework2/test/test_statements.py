@@ -0,0 +1,72 @@
+import sqlite3
+import pytest
+from coursework2 import statements
+from coursework2.connection import ConnectionPool, close_all_pools, get_db_connection
+from coursework2.statements import (DERIVED_TABLES, MANIFEST_TABLES, STATEMENT_CACHE_SIZE, StatementError,
+                                   get_statements, validate)
+from coursework1.database import SCHEMA_SQL, create_schema
+
+
+@pytest.fixture(scope="function")
+def schema_db(tmp_path):
+    """
+    Create a database file with the full coursework1 schema.
+    """
+    path = tmp_path / "statements_test.db"
+    conn = sqlite3.connect(path)
+    create_schema(conn)
+    conn.close()
+    yield path
+    close_all_pools()
+
+
+def test_every_statement_compiles_against_the_schema(schema_db):
+    """
+    GIVEN a database built with the declared schema
+    WHEN the statement registry is validated
+    THEN every statement should compile, and all of them fit in the statement cache.
+    """
+    conn = sqlite3.connect(schema_db)
+    assert validate(conn) == len(get_statements())
+    assert len(get_statements()) <= STATEMENT_CACHE_SIZE
+    assert statements.get_paged("select.unique_years", (2020,)) == statements.get("select.unique_years.after")
+    conn.close()
+
+
+def test_schema_mismatch_fails_the_pool(schema_db):
+    """
+    GIVEN a database whose Waiting_List_Data lost a column the queries use
+    WHEN a pooled connection is opened
+    THEN validation should name the broken statements and the connection should fail.
+    """
+    conn = sqlite3.connect(schema_db)
+    conn.executescript("""
+    DROP TABLE Waiting_List_Data;
+    CREATE TABLE Waiting_List_Data (area_code TEXT, year INTEGER, households INTEGER);
+    """)
+    with pytest.raises(StatementError, match="select.waiting_list_by_year") as error:
+        validate(conn)
+    assert "insert.area" not in str(error.value), "Only the broken statements should be listed."
+    conn.close()
+
+    with pytest.raises(StatementError):
+        ConnectionPool(schema_db, read_only=True).acquire()
+    assert get_db_connection(schema_db, read_only=True) == (None, None)
+
+
+def test_unversioned_and_partial_databases(tmp_path):
+    """
+    GIVEN a scratch database (user_version 0) and a versioned one without the derived tables
+    WHEN validating
+    THEN the scratch one should not be checked, and statements on missing optional tables skipped.
+    """
+    conn = sqlite3.connect(tmp_path / "partial.db")
+    conn.executescript(SCHEMA_SQL)
+    assert validate(conn) == 0
+
+    conn.execute("PRAGMA user_version = 6;")
+    skipped = [statement.name for statement in get_statements().values()
+               if set(statement.requires) & set(DERIVED_TABLES + MANIFEST_TABLES)]
+    assert "select.area_details_by_year" in skipped
+    assert validate(conn) == len(get_statements()) - len(skipped)
+    conn.close()
@@ -0,0 +1,158 @@
+import sqlite3
+import pytest
+from coursework2.connection import transaction, in_transaction_scope
+from coursework2.section3.queries_insert import insert_new_area, insert_housing_data_many
+from coursework2.section3.queries_update import execute_update_query
+from coursework2.section3.queries_delete import delete_area, clear_all_data
+
+
+@pytest.fixture(scope="function")
+def setup_test_database(tmp_path):
+    """
+    Set up a file-backed SQLite database, so a second connection can check
+    what has actually been committed.
+    """
+    path = tmp_path / "transaction_test.db"
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.executescript("""
+    CREATE TABLE Area (
+        area_code TEXT PRIMARY KEY,
+        area_name TEXT
+    );
+
+    CREATE TABLE Year (
+        year INTEGER PRIMARY KEY
+    );
+
+    CREATE TABLE Affordable_Housing_Data (
+        area_code TEXT,
+        year INTEGER,
+        housing_units INTEGER
+    );
+
+    CREATE TABLE Waiting_List_Data (
+        area_code TEXT,
+        year INTEGER,
+        households_count INTEGER
+    );
+
+    INSERT INTO Area VALUES ('A1', 'Area 1'), ('A2', 'Area 2');
+    INSERT INTO Year VALUES (2020);
+    INSERT INTO Affordable_Housing_Data VALUES ('A1', 2020, 100);
+    INSERT INTO Waiting_List_Data VALUES ('A1', 2020, 50);
+    """)
+
+    observer = sqlite3.connect(path)
+    yield conn, cursor, observer
+    observer.close()
+    conn.close()
+
+
+def count_areas(observer):
+    return observer.execute("SELECT COUNT(*) FROM Area;").fetchone()[0]
+
+
+def test_helpers_defer_commit_to_transaction(setup_test_database):
+    """
+    GIVEN an open transaction() block
+    WHEN the insert, update and delete helpers run inside it
+    THEN nothing should be visible to other connections until the block exits.
+    """
+    conn, cursor, observer = setup_test_database
+
+    with transaction(cursor):
+        assert in_transaction_scope(conn)
+        insert_new_area(cursor, "A3", "Area 3")
+        execute_update_query(cursor, "UPDATE Area SET area_name = ? WHERE area_code = ?;", ("Renamed", "A1"))
+        delete_area(cursor, "A2")
+        assert count_areas(observer) == 2, "Changes should not be committed inside the block."
+        assert observer.execute("SELECT area_name FROM Area WHERE area_code = 'A1';").fetchone()[0] == "Area 1"
+
+    assert not in_transaction_scope(conn)
+    rows = observer.execute("SELECT area_code, area_name FROM Area ORDER BY area_code;").fetchall()
+    assert rows == [("A1", "Renamed"), ("A3", "Area 3")]
+
+
+def test_transaction_rolls_back_on_error(setup_test_database):
+    """
+    GIVEN several writes inside a transaction() block
+    WHEN one of them fails
+    THEN all of them should be rolled back.
+    """
+    conn, cursor, observer = setup_test_database
+
+    with pytest.raises(sqlite3.IntegrityError):
+        with transaction(cursor):
+            insert_new_area(cursor, "A3", "Area 3")
+            execute_update_query(cursor, "UPDATE Area SET area_name = ? WHERE area_code = ?;", ("Renamed", "A1"))
+            insert_new_area(cursor, "A1", "Duplicate")
+
+    rows = observer.execute("SELECT area_code, area_name FROM Area ORDER BY area_code;").fetchall()
+    assert rows == [("A1", "Area 1"), ("A2", "Area 2")]
+
+
+def test_update_helper_raises_inside_transaction(setup_test_database):
+    """
+    GIVEN an UPDATE that fails
+    WHEN it runs outside a block it should only print the error,
+    AND WHEN it runs inside a block the error should reach the block.
+    """
+    conn, cursor, observer = setup_test_database
+
+    execute_update_query(cursor, "UPDATE Missing_Table SET x = 1;")
+    with pytest.raises(sqlite3.OperationalError):
+        with transaction(cursor):
+            execute_update_query(cursor, "UPDATE Missing_Table SET x = 1;")
+
+
+def test_nested_transaction_uses_savepoint(setup_test_database):
+    """
+    GIVEN a nested transaction() block that fails
+    WHEN the failure is handled in the outer block
+    THEN only the inner block's work should be undone.
+    """
+    conn, cursor, observer = setup_test_database
+
+    with transaction(cursor):
+        insert_new_area(cursor, "A3", "Area 3")
+        with pytest.raises(sqlite3.IntegrityError):
+            with transaction(cursor):
+                insert_new_area(cursor, "A4", "Area 4")
+                insert_new_area(cursor, "A1", "Duplicate")
+        insert_new_area(cursor, "A5", "Area 5")
+
+    rows = observer.execute("SELECT area_code FROM Area ORDER BY area_code;").fetchall()
+    assert rows == [("A1",), ("A2",), ("A3",), ("A5",)]
+
+
+def test_bulk_insert_joins_outer_transaction(setup_test_database):
+    """
+    GIVEN a bulk insert inside a transaction() block
+    WHEN the block fails after the bulk insert
+    THEN the bulk insert should be rolled back with it.
+    """
+    conn, cursor, observer = setup_test_database
+
+    with pytest.raises(RuntimeError):
+        with transaction(cursor):
+            insert_housing_data_many(cursor, [("A1", 2021, 1), ("A2", 2021, 2)])
+            raise RuntimeError("abort")
+
+    assert observer.execute("SELECT COUNT(*) FROM Affordable_Housing_Data;").fetchone()[0] == 1
+
+
+def test_clear_all_data_commits_once(setup_test_database):
+    """
+    GIVEN clear_all_data running inside an outer block
+    WHEN the outer block is rolled back
+    THEN every table should still hold its data.
+    """
+    conn, cursor, observer = setup_test_database
+
+    with pytest.raises(RuntimeError):
+        with transaction(cursor):
+            clear_all_data(cursor)
+            raise RuntimeError("abort")
+
+    assert count_areas(observer) == 2